@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Precomputed Answer Table
+
+Most /predict calls send only `symptoms` (plus sometimes `animal_type`) and
+leave age, weight, gender and breed at their defaults. For those requests
+the feature row depends on nothing but the animal type and the symptom
+words, and the model only knows a small symptom vocabulary (the
+SYMPTOM_MAPPING keys plus the Symptom_1-4 encoder classes). With at most
+four symptoms that is a finite set of answers, so this build step scores
+all of them once:
+
+    key = animal index, then one base-(V+1) digit per symptom slot
+          (0 = empty slot, i = i-th vocabulary word)
+
+Every key maps to an answer id (uint16/uint32, a dense array indexed by the
+key directly), and every distinct answer is stored once as its top-k class
+indices plus rounded confidence percentages. A lookup is a few dict hits to
+turn the words into digits and one array read; nothing is featurized or
+scored. Severity and recommendation text are rendered from
+severity_mapping.json at request time, so editing the mapping never
+requires a rebuild.
+
+Files (next to the model, memory-mapped when loaded):
+    disease_model_answers/answer_ids.npy   key -> answer id (MISSING for unreachable keys)
+    disease_model_answers/top.npy          answer id -> top-k class indices
+    disease_model_answers/percent.npy      answer id -> confidence percentages
+    disease_model_answers/meta.json        vocabulary, animals, radix, model training date
+
+The table is only used when its training date and feature-engine
+fingerprint match the loaded model; anything else falls back to scoring.
+
+Usage:
+    python3 answer_table.py [model_path]     # build + verify (build step, after lean_predictor.py)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import numpy as np
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from feature_engine import (BINARY_SYMPTOMS, DEFAULT_REQUEST, SYMPTOM_MAPPING, SYMPTOM_SLOTS,
+                            map_symptom_slots)
+from forest_engine import top_k, top_k_rows
+from lean_predictor import LeanArtifactError, load_lean_model
+
+# Requests with more symptoms than slots are always scored
+MAX_SYMPTOMS = len(SYMPTOM_SLOTS)
+
+# Rows scored per forest call while building (bounds the probability matrix)
+BUILD_CHUNK_ROWS = 65536
+
+# Keys outside the table (a filled slot after an empty one) are never produced by lookups
+MISSING = {np.dtype(np.uint16): 0xFFFF, np.dtype(np.uint32): 0xFFFFFFFF}
+
+
+class AnswerTableError(Exception):
+    """The answer table is missing or was built for another model"""
+
+
+def answer_table_path(model_path: str) -> str:
+    """
+    Location of the answer table saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        str: Path to the matching *_answers directory
+    """
+    return os.path.splitext(model_path)[0] + '_answers'
+
+
+def feature_fingerprint(binary_symptoms=BINARY_SYMPTOMS) -> str:
+    """Hash of the request -> feature rules the table bakes in"""
+    rules = [DEFAULT_REQUEST, SYMPTOM_MAPPING, {col: list(t) for col, t in binary_symptoms.items()}]
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def answer_vocabulary(encoder_tables: Dict[str, Dict[str, int]]) -> List[str]:
+    """
+    Normalized symptom words the table covers
+
+    Args:
+        encoder_tables (dict): Column -> {category: code}
+
+    Returns:
+        List[str]: Sorted lowercase words (mapped symptoms plus slot encoder classes)
+    """
+    words = set(SYMPTOM_MAPPING)
+    for col in SYMPTOM_SLOTS:
+        words.update(value.lower() for value in encoder_tables.get(col, {}) if value != 'No')
+    return sorted(words)
+
+
+class AnswerTable:
+    """
+    Key -> top-k answer lookup for default-parameter requests
+    """
+
+    def __init__(self, answer_ids: np.ndarray, top: np.ndarray, percent: np.ndarray,
+                 vocabulary: List[str], animals: List[str]):
+        """
+        Wire loaded (or freshly built) arrays together
+
+        Args:
+            answer_ids (np.ndarray): Dense key -> answer id array
+            top (np.ndarray): (n_answers, k) class indices
+            percent (np.ndarray): (n_answers, k) confidence percentages
+            vocabulary (list): Normalized symptom words, digit i + 1 each
+            animals (list): Animal types, in key order
+        """
+        self.answer_ids = answer_ids
+        self.top = top
+        self.percent = percent
+        self.vocabulary = list(vocabulary)
+        self.animals = list(animals)
+        self.radix = len(self.vocabulary) + 1
+        self.missing = MISSING[answer_ids.dtype]
+
+        self.word_digit = {word: i + 1 for i, word in enumerate(self.vocabulary)}
+        self.animal_index = {animal: i for i, animal in enumerate(self.animals)}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, symptoms, fields: Dict[str, Any]) -> Optional[int]:
+        """
+        Table key for a request, or None if the table cannot answer it
+
+        Args:
+            symptoms (list): Raw symptoms from the request
+            fields (dict): Other request fields (animal_type, age, weight, ...)
+
+        Returns:
+            int: Index into answer_ids, or None
+        """
+        if not isinstance(symptoms, list) or len(symptoms) > MAX_SYMPTOMS:
+            return None
+
+        animal = DEFAULT_REQUEST['animal_type']
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if name == 'animal_type':
+                animal = value
+            elif name not in DEFAULT_REQUEST or value != DEFAULT_REQUEST[name]:
+                return None
+
+        key = self.animal_index.get(animal) if isinstance(animal, str) else None
+        if key is None:
+            return None
+        for symptom in symptoms:
+            digit = self.word_digit.get(symptom.lower().strip()) if isinstance(symptom, str) else None
+            if digit is None:
+                return None
+            key = key * self.radix + digit
+        return key * self.radix ** (MAX_SYMPTOMS - len(symptoms))
+
+    def lookup(self, symptoms, fields: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Precomputed answer for a request
+
+        Args:
+            symptoms (list): Raw symptoms from the request
+            fields (dict): Other request fields
+
+        Returns:
+            tuple: (top-k class indices, confidence percentages) or None on a miss
+        """
+        key = self.key(symptoms, fields)
+        answer = self.missing if key is None else int(self.answer_ids[key])
+        if answer == self.missing:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.top[answer], self.percent[answer]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Table size and per-process hit counters
+
+        Returns:
+            dict: Keys, distinct answers, vocabulary size, hits and misses
+        """
+        return {
+            'keys': int(len(self.answer_ids)),
+            'answers': int(len(self.top)),
+            'vocabulary': len(self.vocabulary),
+            'animals': len(self.animals),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def _enumerate_digits(radix: int) -> np.ndarray:
+    """All (d1, d2, d3, d4) slot digit tuples in key order, shape (radix**4, 4)"""
+    grid = np.indices((radix,) * MAX_SYMPTOMS).reshape(MAX_SYMPTOMS, -1).T
+    return grid.astype(np.int64)
+
+
+def build_answer_table(model, k: int = 3,
+                       throttle: Optional[Callable[[], None]] = None) -> Tuple[AnswerTable, Dict[str, Any]]:
+    """
+    Score every default-parameter request the table covers
+
+    Args:
+        model (LeanModel): Loaded model (feature engine, forest, classes)
+        k (int): Predictions per answer
+        throttle (callable): Called after every scored chunk (background builds yield the CPU there)
+
+    Returns:
+        tuple: (AnswerTable, build statistics)
+    """
+    engine = model.feature_engine
+    tables = model.encoder_tables
+    vocabulary = answer_vocabulary(tables)
+    animals = sorted(tables['Animal_Type'])
+    radix = len(vocabulary) + 1
+    columns = {col: j for j, col, _ in engine.categorical_plan}
+
+    # Per digit (0 = empty slot): encoded value in each slot and the binary flags it sets
+    words = [None] + vocabulary
+    slot_codes = np.zeros((MAX_SYMPTOMS, radix), dtype=np.float64)
+    for s, col in enumerate(SYMPTOM_SLOTS):
+        for d, word in enumerate(words):
+            value = map_symptom_slots([] if word is None else [word])[0]
+            slot_codes[s, d] = tables.get(col, {}).get(value, 0)
+    binary_cols = [col for col in engine.binary_symptoms if col in columns and col in tables]
+    flags = np.array([[word is not None and word in engine.binary_symptoms[col] for col in binary_cols]
+                      for word in words], dtype=bool)
+
+    digits = _enumerate_digits(radix)
+    # A filled slot after an empty one can never come from a symptom list
+    valid = np.ones(len(digits), dtype=bool)
+    for s in range(1, MAX_SYMPTOMS):
+        valid &= (digits[:, s] == 0) | (digits[:, s - 1] != 0)
+    digits = digits[valid]
+
+    # Many digit tuples give the same features (unknown slot values encode to 0,
+    # flags ignore order), so pack slot codes + flags into one integer and dedupe
+    codes = np.stack([slot_codes[s, digits[:, s]] for s in range(MAX_SYMPTOMS)], axis=1).astype(np.int64)
+    present = np.zeros((len(digits), len(binary_cols)), dtype=bool)
+    for s in range(MAX_SYMPTOMS):
+        present |= flags[digits[:, s]]
+    signature = present.astype(np.int64) @ (1 << np.arange(len(binary_cols), dtype=np.int64))
+    for s in range(MAX_SYMPTOMS):
+        signature = (signature << 8) | codes[:, s]
+    _, first, row_of_digits = np.unique(signature, return_index=True, return_inverse=True)
+    row_of_digits = row_of_digits.reshape(-1)
+
+    rows = np.tile(engine.transform([{'symptoms': []}])[0], (len(first), 1))
+    for s, col in enumerate(SYMPTOM_SLOTS):
+        if col in columns:
+            rows[:, columns[col]] = codes[first, s]
+    for b, col in enumerate(binary_cols):
+        yes, no = tables[col].get('Yes', 0), tables[col].get('No', 0)
+        rows[:, columns[col]] = np.where(present[first, b], yes, no)
+
+    # Score every distinct row once per animal type
+    k = min(k, len(model.classes))
+    n_rows = len(rows) * len(animals)
+    top = np.empty((n_rows, k), dtype=np.uint8 if len(model.classes) <= 256 else np.uint16)
+    percent = np.empty((n_rows, k), dtype=np.uint8)
+    for a, animal in enumerate(animals):
+        rows[:, columns['Animal_Type']] = tables['Animal_Type'][animal]
+        for start in range(0, len(rows), BUILD_CHUNK_ROWS):
+            probabilities = model.forest.predict_proba(rows[start:start + BUILD_CHUNK_ROWS])
+            indices = top_k_rows(probabilities, k)
+            at = a * len(rows) + start
+            top[at:at + len(indices)] = indices
+            # Same rounding as f"{p * 100:.0f}" in the API (round half to even on the float)
+            percent[at:at + len(indices)] = np.rint(
+                np.take_along_axis(probabilities, indices, axis=1) * 100)
+            if throttle is not None:
+                throttle()
+
+    # Identical rendered answers are stored once
+    answers, answer_of_row = np.unique(np.hstack([top.astype(np.uint16), percent]), axis=0,
+                                       return_inverse=True)
+    answer_of_row = answer_of_row.reshape(-1)
+    dtype = np.uint16 if len(answers) < MISSING[np.dtype(np.uint16)] else np.uint32
+
+    answer_ids = np.full(len(animals) * radix ** MAX_SYMPTOMS, MISSING[np.dtype(dtype)], dtype=dtype)
+    flat_digits = digits @ (radix ** np.arange(MAX_SYMPTOMS - 1, -1, -1))
+    for a in range(len(animals)):
+        answer_ids[a * radix ** MAX_SYMPTOMS + flat_digits] = answer_of_row[a * len(rows) + row_of_digits]
+
+    table = AnswerTable(answer_ids, np.ascontiguousarray(answers[:, :k]).astype(top.dtype),
+                        np.ascontiguousarray(answers[:, k:]).astype(np.uint8), vocabulary, animals)
+    return table, {'keys': int(len(digits) * len(animals)), 'unique_rows': int(n_rows),
+                   'answers': int(len(answers))}
+
+
+def save_answer_table(model_path: str, table: AnswerTable, training_date: Optional[str],
+                      binary_symptoms=BINARY_SYMPTOMS) -> str:
+    """
+    Save the table next to the model
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        table (AnswerTable): Built table
+        training_date (str): Training date of the model it was built from
+        binary_symptoms (dict): Binary column -> triggering symptoms used when building
+
+    Returns:
+        str: The table directory
+    """
+    path = answer_table_path(model_path)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'answer_ids.npy'), table.answer_ids)
+    np.save(os.path.join(path, 'top.npy'), table.top)
+    np.save(os.path.join(path, 'percent.npy'), table.percent)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'training_date': training_date,
+            'feature_fingerprint': feature_fingerprint(binary_symptoms),
+            'vocabulary': table.vocabulary,
+            'animals': table.animals,
+            'max_symptoms': MAX_SYMPTOMS
+        }, f, indent=2)
+    return path
+
+
+def load_answer_table(model_path: str, training_date: Optional[str],
+                      binary_symptoms=BINARY_SYMPTOMS) -> AnswerTable:
+    """
+    Memory-map the answer table saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        training_date (str): Training date of the loaded model
+        binary_symptoms (dict): Binary column -> triggering symptoms the service uses
+
+    Returns:
+        AnswerTable: Ready-to-query table
+
+    Raises:
+        AnswerTableError: When the table is missing or built for another model
+    """
+    path = answer_table_path(model_path)
+    try:
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(path, name), mmap_mode='r')
+                  for name in ('answer_ids.npy', 'top.npy', 'percent.npy')]
+    except (OSError, ValueError) as e:
+        raise AnswerTableError(f"No answer table: {e}")
+
+    if meta.get('training_date') != training_date:
+        raise AnswerTableError("Answer table was built for another model")
+    if meta.get('feature_fingerprint') != feature_fingerprint(binary_symptoms):
+        raise AnswerTableError("Answer table was built with different request defaults or symptom rules")
+    if meta.get('max_symptoms') != MAX_SYMPTOMS:
+        raise AnswerTableError("Answer table was built for a different number of symptom slots")
+
+    table = AnswerTable(*arrays, meta['vocabulary'], meta['animals'])
+    if len(table.answer_ids) != len(table.animals) * table.radix ** MAX_SYMPTOMS:
+        raise AnswerTableError("Answer table size does not match its vocabulary")
+    return table
+
+
+def verify_answer_table(model, table: AnswerTable, samples: int = 2000, seed: int = 0) -> int:
+    """
+    Compare random table answers with scoring the same request one by one
+
+    Args:
+        model (LeanModel): Loaded model
+        table (AnswerTable): Table to check
+        samples (int): Requests to compare
+        seed (int): Random seed
+
+    Returns:
+        int: Number of mismatching requests
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for _ in range(samples):
+        n = int(rng.integers(0, MAX_SYMPTOMS + 1))
+        symptoms = [table.vocabulary[i].title() for i in rng.integers(0, len(table.vocabulary), n)]
+        animal = table.animals[int(rng.integers(0, len(table.animals)))]
+        answer = table.lookup(symptoms, {'animal_type': animal, 'age': 3, 'weight': 20.0})
+
+        probabilities = model.predict_proba_one({'symptoms': symptoms, 'animal_type': animal})
+        indices = top_k(probabilities, table.top.shape[1])
+        expected = [f"{probabilities[i] * 100:.0f}" for i in indices]
+        if (answer is None or list(answer[0]) != list(indices)
+                or [str(p) for p in answer[1]] != expected):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    """
+    Build the answer table for a model package and verify it against direct scoring
+    """
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'disease_model.pkl'
+
+    print("📇 ANSWER TABLE BUILD")
+    print("=" * 50)
+
+    try:
+        model = load_lean_model(model_path)
+    except LeanArtifactError as e:
+        # Deploys without lean artifacts keep working; the API just scores every request
+        print(f"⚠️  Lean model unavailable ({e}), skipping answer table")
+        return
+
+    start = time.perf_counter()
+    table, stats = build_answer_table(model)
+    path = save_answer_table(model_path, table, model.training_date)
+    size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"✅ {stats['keys']:,} keys, {stats['unique_rows']:,} distinct feature rows, "
+          f"{stats['answers']:,} distinct answers in {time.perf_counter() - start:.1f}s")
+    print(f"✅ Wrote {path} ({size / 1e6:.1f} MB, {len(table.vocabulary)} words x {len(table.animals)} animals)")
+
+    loaded = load_answer_table(model_path, model.training_date)
+    mismatches = verify_answer_table(model, loaded)
+    status = "✅" if mismatches == 0 else "❌"
+    print(f"{status} {mismatches} mismatches in 2000 sampled requests vs direct scoring")
+    if mismatches:
+        # Never serve a table that disagrees with the model; the API scores instead
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"❌ Removed {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,17 @@
 API-only Disease Prediction Script
 
 Clean version for API calls that only outputs JSON without any print statements.
+
+Usage:
+    python3 api_predict.py '{"symptoms": ["fever", "vomiting"]}'    # one request, then exit
+    echo '{"symptoms": ["coughing"]}' | python3 api_predict.py       # same, from stdin
+    python3 api_predict.py --serve                                   # long-lived worker
+
+In --serve mode the model is loaded once and every line on stdin is one JSON
+request; every request gets exactly one JSON line on stdout, in order. An
+"id" field (any JSON value) is echoed back so callers can pipeline many
+requests over one child process and match the answers up. The worker exits
+when stdin is closed.
 """
 
 import sys
@@ -16,8 +27,9 @@ os.environ['PYTHONIOENCODING'] = 'utf-8'
 
 # Import and suppress output
 import joblib
-import pandas as pd
-import numpy as np
+
+from feature_engine import FeatureEngine, load_encoder_tables
+from forest_engine import load_forest, top_k
 
 class APIPredictor:
     def __init__(self):
@@ -26,6 +38,9 @@ class APIPredictor:
         self.label_encoders = self.model_package['label_encoders']
         self.target_encoder = self.model_package['target_encoder']
         self.feature_columns = self.model_package['feature_columns']
+        self.encoder_tables = load_encoder_tables('disease_model.pkl', self.model_package)
+        self.feature_engine = FeatureEngine(self.encoder_tables, self.feature_columns)
+        self.forest = load_forest('disease_model.pkl', self.model_package)
         
         with open('severity_mapping.json', 'r') as f:
             self.severity_data = json.load(f)
@@ -33,102 +48,28 @@ class APIPredictor:
     def preprocess_symptoms(self, symptoms, animal_type='Dog', age=3, weight=20.0, 
                           gender='Male', breed='Mixed', duration='3 days', heart_rate=120, 
                           temperature=39.0):
-        # Create base animal data
-        animal_data = {
-            'Animal_Type': animal_type,
-            'Breed': breed,
-            'Age': age,
-            'Gender': gender,
-            'Weight': weight,
-            'Duration': duration,
-            'Heart_Rate': heart_rate,
-            'Body_Temperature_Numeric': temperature
-        }
-        
-        # Process symptoms
-        symptom_mapping = {
-            'fever': 'Fever',
-            'lethargy': 'Lethargy', 
-            'vomiting': 'Vomiting',
-            'diarrhea': 'Diarrhea',
-            'coughing': 'Coughing',
-            'appetite loss': 'Appetite Loss',
-            'nasal discharge': 'Nasal Discharge',
-            'eye discharge': 'Eye Discharge',
-            'skin lesions': 'Skin Lesions',
-            'lameness': 'Lameness',
-            'labored breathing': 'Labored Breathing',
-            'sneezing': 'Sneezing'
-        }
-        
-        normalized_symptoms = [s.lower().strip() for s in symptoms]
-        
-        # Fill symptom slots
-        mapped_symptoms = []
-        for symptom in normalized_symptoms[:4]:
-            mapped_symptom = symptom_mapping.get(symptom, symptom.title())
-            mapped_symptoms.append(mapped_symptom)
-        
-        while len(mapped_symptoms) < 4:
-            mapped_symptoms.append('No')
-        
-        animal_data['Symptom_1'] = mapped_symptoms[0]
-        animal_data['Symptom_2'] = mapped_symptoms[1] 
-        animal_data['Symptom_3'] = mapped_symptoms[2]
-        animal_data['Symptom_4'] = mapped_symptoms[3]
-        
-        # Set binary indicators
-        binary_symptoms = {
-            'Appetite_Loss': 'appetite loss' in normalized_symptoms or 'lethargy' in normalized_symptoms,
-            'Vomiting': 'vomiting' in normalized_symptoms,
-            'Diarrhea': 'diarrhea' in normalized_symptoms,
-            'Coughing': 'coughing' in normalized_symptoms,
-            'Labored_Breathing': 'labored breathing' in normalized_symptoms,
-            'Lameness': 'lameness' in normalized_symptoms,
-            'Skin_Lesions': 'skin lesions' in normalized_symptoms,
-            'Nasal_Discharge': 'nasal discharge' in normalized_symptoms,
-            'Eye_Discharge': 'eye discharge' in normalized_symptoms
-        }
-        
-        for symptom, present in binary_symptoms.items():
-            animal_data[symptom] = 'Yes' if present else 'No'
-        
-        # Convert to DataFrame
-        df = pd.DataFrame([animal_data])
-        
-        # Encode categorical variables
-        categorical_cols = ['Animal_Type', 'Breed', 'Gender', 'Symptom_1', 'Symptom_2', 
-                           'Symptom_3', 'Symptom_4', 'Duration', 'Appetite_Loss', 'Vomiting',
-                           'Diarrhea', 'Coughing', 'Labored_Breathing', 'Lameness', 
-                           'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
-        
-        for col in categorical_cols:
-            if col in df.columns and col in self.label_encoders:
-                le = self.label_encoders[col]
-                value = str(df[col].iloc[0])
-                try:
-                    if value in le.classes_:
-                        df[col + '_encoded'] = le.transform([value])
-                    else:
-                        df[col + '_encoded'] = 0
-                except:
-                    df[col + '_encoded'] = 0
-        
-        # Create feature vector
-        feature_vector = []
-        for feature in self.feature_columns:
-            if feature in df.columns:
-                feature_vector.append(df[feature].iloc[0])
-            else:
-                feature_vector.append(0)
-        
-        return np.array(feature_vector).reshape(1, -1)
+        return self.preprocess_symptoms_batch([{
+            'symptoms': symptoms,
+            'animal_type': animal_type,
+            'age': age,
+            'weight': weight,
+            'gender': gender,
+            'breed': breed,
+            'duration': duration,
+            'heart_rate': heart_rate,
+            'temperature': temperature
+        }])
+    
+    def preprocess_symptoms_batch(self, requests):
+        # Fill the feature matrix straight from the request dicts (no DataFrame)
+        return self.feature_engine.transform(requests)
     
     def predict(self, symptoms, **kwargs):
         try:
-            X = self.preprocess_symptoms(symptoms, **kwargs)
-            probabilities = self.model.predict_proba(X)[0]
-            top_indices = np.argsort(probabilities)[-3:][::-1]
+            # Single-row fast path: per-thread buffers, no DataFrame or temporary matrix
+            x = self.feature_engine.transform_one(kwargs, symptoms)
+            probabilities = self.forest.predict_proba_row(x)
+            top_indices = top_k(probabilities, 3)
             
             predictions = []
             for idx in top_indices:
@@ -152,7 +93,57 @@ class APIPredictor:
         except Exception as e:
             return {'error': str(e), 'predictions': []}
 
+def predict_request(predictor, input_data):
+    """Run one parsed request through the predictor (same fields for both modes)"""
+    return predictor.predict(
+        symptoms=input_data['symptoms'],
+        animal_type=input_data.get('animal_type', 'Dog'),
+        age=input_data.get('age', 3),
+        weight=input_data.get('weight', 20.0),
+        gender=input_data.get('gender', 'Male'),
+        breed=input_data.get('breed', 'Mixed')
+    )
+
+def handle_line(predictor, line):
+    """Answer one NDJSON request line; never raises"""
+    try:
+        input_data = json.loads(line)
+    except ValueError as e:
+        return {'id': None, 'error': f'Invalid JSON: {e}', 'predictions': []}
+    
+    if not isinstance(input_data, dict):
+        return {'id': None, 'error': 'Request must be a JSON object', 'predictions': []}
+    
+    request_id = input_data.get('id')
+    if 'symptoms' not in input_data:
+        return {'id': request_id, 'error': 'Symptoms are required', 'predictions': []}
+    
+    try:
+        result = predict_request(predictor, input_data)
+    except Exception as e:
+        result = {'error': str(e), 'predictions': []}
+    return dict({'id': request_id}, **result)
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """Keep the model loaded and answer newline-delimited JSON requests until EOF"""
+    try:
+        predictor = APIPredictor()
+    except Exception as e:
+        stdout.write(json.dumps({'id': None, 'error': f'Model failed to load: {e}', 'predictions': []}) + '\n')
+        stdout.flush()
+        return 1
+    
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(json.dumps(handle_line(predictor, line)) + '\n')
+        stdout.flush()
+    return 0
+
 if __name__ == "__main__":
+    if '--serve' in sys.argv[1:]:
+        sys.exit(serve())
+    
     try:
         # Read input from stdin or command line
         if len(sys.argv) > 1:
@@ -161,14 +152,7 @@ if __name__ == "__main__":
             input_data = json.loads(sys.stdin.read())
         
         predictor = APIPredictor()
-        result = predictor.predict(
-            symptoms=input_data['symptoms'],
-            animal_type=input_data.get('animal_type', 'Dog'),
-            age=input_data.get('age', 3),
-            weight=input_data.get('weight', 20.0),
-            gender=input_data.get('gender', 'Male'),
-            breed=input_data.get('breed', 'Mixed')
-        )
+        result = predict_request(predictor, input_data)
         
         print(json.dumps(result))
         
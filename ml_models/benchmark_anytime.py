@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Anytime Forest Evaluation Benchmark
+
+Scores every row of the training CSV with the full forest and with
+FlatForest.predict_proba_anytime() for each margin bound and delta, and
+reports:
+
+    trees       mean / p50 / p99 trees evaluated per row
+    latency     mean scoring time per row, one row per call and the whole CSV in one call
+    top-1       how often the top-1 disease matches the full forest
+    top-3       how often the top-3 set (or its order) differs from the full forest
+    max |dp|    largest absolute change in any reported top-3 probability
+
+Usage:
+    python3 benchmark_anytime.py [trees per chunk] [deltas...] [--numpy]
+
+    --numpy  disable the optional Numba kernels (what production runs without numba)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+import forest_engine
+from feature_engine import encode_dataset, read_encoder_tables
+from forest_engine import ANYTIME_BOUNDS, FlatForest, forest_path, top_k_rows
+
+MODEL_PATH = 'disease_model.pkl'
+CSV_PATH = 'animal_disease_prediction.csv'
+DEFAULT_DELTAS = [0.0, 0.001, 0.01, 0.05]
+REPEATS = 5
+
+
+def time_rows(score, X):
+    """
+    Scoring time per row in microseconds (best of REPEATS passes)
+
+    Args:
+        score (callable): score(feature matrix)
+        X (np.ndarray): Rows to score
+
+    Returns:
+        tuple: (one row per call, all rows in one call)
+    """
+    score(X[:1])
+    single = batch = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for i in range(len(X)):
+            score(X[i:i + 1])
+        single = min(single, time.perf_counter() - start)
+        start = time.perf_counter()
+        score(X)
+        batch = min(batch, time.perf_counter() - start)
+    return single / len(X) * 1e6, batch / len(X) * 1e6
+
+
+def compare(full, approx):
+    """
+    Agreement of anytime probabilities with the full forest
+
+    Args:
+        full (np.ndarray): Full-forest probabilities (n_rows, n_classes)
+        approx (np.ndarray): Anytime probabilities (n_rows, n_classes)
+
+    Returns:
+        tuple: (top-1 agreement, top-3 set changed, top-3 order changed, max top-3 probability change)
+    """
+    top_full = top_k_rows(full, 3)
+    top_approx = top_k_rows(approx, 3)
+    same_top1 = float(np.mean(top_full[:, 0] == top_approx[:, 0]))
+    set_changed = float(np.mean(np.any(np.sort(top_full, axis=1) != np.sort(top_approx, axis=1), axis=1)))
+    order_changed = float(np.mean(np.any(top_full != top_approx, axis=1)))
+    rows = np.arange(len(full))[:, None]
+    max_change = float(np.abs(approx[rows, top_approx] - full[rows, top_approx]).max())
+    return same_top1, set_changed, order_changed, max_change
+
+
+def main():
+    """
+    Run the benchmark and print a comparison table
+    """
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    chunk_trees = int(args[0]) if args else 10
+    deltas = [float(arg) for arg in args[1:]] or DEFAULT_DELTAS
+    if '--numpy' in sys.argv:
+        forest_engine.NUMBA_AVAILABLE = False
+
+    tables = read_encoder_tables(MODEL_PATH)
+    X = encode_dataset(pd.read_csv(CSV_PATH), tables['encoders'], tables['feature_columns'])
+    forest = FlatForest.load(forest_path(MODEL_PATH))
+    full = forest.predict_proba(X)
+    full_single, full_batch = time_rows(forest.predict_proba, X)
+
+    print("🌲 ANYTIME FOREST EVALUATION")
+    print("=" * 104)
+    print(f"Forest kernels: {'Numba' if forest_engine.NUMBA_AVAILABLE else 'NumPy'}, "
+          f"{forest.n_trees} trees, {chunk_trees} trees per chunk, {len(X)} rows")
+    print(f"{'bound':<11}{'delta':>7}{'trees mean/p50/p99':>20}{'µs/row 1-row':>14}{'batch':>8}"
+          f"{'top-1 same':>12}{'top-3 set':>11}{'top-3 order':>13}{'max |dp|':>10}")
+    print("-" * 104)
+    full_trees = f"{forest.n_trees}/{forest.n_trees}/{forest.n_trees}"
+    print(f"{'full':<11}{'-':>7}{full_trees:>20}{full_single:>14.1f}{full_batch:>8.1f}"
+          f"{1.0:>12.2%}{0.0:>11.2%}{0.0:>13.2%}{0.0:>10.3f}")
+
+    for bound in ANYTIME_BOUNDS:
+        for delta in deltas:
+            def score(rows):
+                return forest.predict_proba_anytime(rows, chunk_trees, delta, bound)
+
+            approx, used = score(X)
+            single, batch = time_rows(score, X)
+            same_top1, set_changed, order_changed, max_change = compare(full, approx)
+            trees = f"{used.mean():.1f}/{np.percentile(used, 50):.0f}/{np.percentile(used, 99):.0f}"
+            print(f"{bound:<11}{delta:>7g}{trees:>20}{single:>14.1f}{batch:>8.1f}"
+                  f"{same_top1:>12.2%}{set_changed:>11.2%}{order_changed:>13.2%}{max_change:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
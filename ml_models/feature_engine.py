@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Batch Feature Engine
+
+Turns symptom-checker requests into the model's feature matrix without going
+through pandas. Every predictor (flask_api.py, api_predict.py, predict.py)
+used to build a one-row DataFrame per request; this module fills a
+preallocated NumPy matrix straight from the request dicts instead, producing
+exactly the columns listed in ``feature_columns`` of the saved model package.
+
+Categorical values are encoded through plain dict lookup tables
+(category -> code) that are built once from the LabelEncoders and saved next
+to the model as ``disease_model_encoders.json``, so encoding a request is a
+handful of dict hits and loading the tables never touches sklearn.
+
+Usage:
+    from feature_engine import FeatureEngine, load_encoder_tables
+    tables = load_encoder_tables('disease_model.pkl', model_package)
+    engine = FeatureEngine(tables, feature_columns)
+    X = engine.transform([{'symptoms': ['fever', 'vomiting']}])
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import os
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+# Defaults applied when a request leaves a field out (same as preprocess_symptoms)
+DEFAULT_REQUEST = {
+    'animal_type': 'Dog',
+    'age': 3,
+    'weight': 20.0,
+    'gender': 'Male',
+    'breed': 'Mixed',
+    'duration': '3 days',
+    'heart_rate': 120,
+    'temperature': 39.0
+}
+
+# Categorical columns encoded with the saved LabelEncoders (training order)
+CATEGORICAL_COLUMNS = ['Animal_Type', 'Breed', 'Gender', 'Symptom_1', 'Symptom_2',
+                       'Symptom_3', 'Symptom_4', 'Duration', 'Appetite_Loss', 'Vomiting',
+                       'Diarrhea', 'Coughing', 'Labored_Breathing', 'Lameness',
+                       'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
+
+# Model columns filled directly from request fields
+NUMERICAL_FIELDS = {
+    'Age': 'age',
+    'Weight': 'weight',
+    'Heart_Rate': 'heart_rate',
+    'Body_Temperature_Numeric': 'temperature'
+}
+
+CATEGORICAL_FIELDS = {
+    'Animal_Type': 'animal_type',
+    'Breed': 'breed',
+    'Gender': 'gender',
+    'Duration': 'duration'
+}
+
+SYMPTOM_SLOTS = ['Symptom_1', 'Symptom_2', 'Symptom_3', 'Symptom_4']
+
+# Lowercase symptom -> value used in the Symptom_1-4 slots
+SYMPTOM_MAPPING = {
+    'fever': 'Fever',
+    'lethargy': 'Lethargy',
+    'vomiting': 'Vomiting',
+    'diarrhea': 'Diarrhea',
+    'coughing': 'Coughing',
+    'appetite loss': 'Appetite Loss',
+    'nasal discharge': 'Nasal Discharge',
+    'eye discharge': 'Eye Discharge',
+    'skin lesions': 'Skin Lesions',
+    'lameness': 'Lameness',
+    'labored breathing': 'Labored Breathing',
+    'sneezing': 'Sneezing'
+}
+
+# Binary indicator column -> symptoms that switch it to 'Yes'
+BINARY_SYMPTOMS = {
+    'Appetite_Loss': ('appetite loss', 'lethargy'),
+    'Vomiting': ('vomiting',),
+    'Diarrhea': ('diarrhea',),
+    'Coughing': ('coughing',),
+    'Labored_Breathing': ('labored breathing',),
+    'Lameness': ('lameness',),
+    'Skin_Lesions': ('skin lesions',),
+    'Nasal_Discharge': ('nasal discharge',),
+    'Eye_Discharge': ('eye discharge',)
+}
+
+# predict.py also accepts a few everyday synonyms for the binary indicators
+EXTENDED_BINARY_SYMPTOMS = {
+    'Appetite_Loss': ('appetite loss', 'lethargy'),
+    'Vomiting': ('vomiting',),
+    'Diarrhea': ('diarrhea',),
+    'Coughing': ('coughing',),
+    'Labored_Breathing': ('labored breathing', 'breathing difficulty'),
+    'Lameness': ('lameness', 'limping'),
+    'Skin_Lesions': ('skin lesions', 'rash'),
+    'Nasal_Discharge': ('nasal discharge', 'runny nose'),
+    'Eye_Discharge': ('eye discharge', 'watery eyes')
+}
+
+
+def normalize_symptoms(symptoms: List[str]) -> List[str]:
+    """
+    Lowercase and strip symptoms the same way the predictors always have
+
+    Args:
+        symptoms (List[str]): Raw symptoms from the request
+
+    Returns:
+        List[str]: Normalized symptoms
+    """
+    return [s.lower().strip() for s in symptoms]
+
+
+def map_symptom_slots(normalized_symptoms: List[str]) -> List[str]:
+    """
+    Map the first four symptoms onto the Symptom_1-4 slots, padding with 'No'
+
+    Args:
+        normalized_symptoms (List[str]): Output of normalize_symptoms
+
+    Returns:
+        List[str]: Exactly four slot values
+    """
+    slots = [SYMPTOM_MAPPING.get(s, s.title()) for s in normalized_symptoms[:4]]
+    slots.extend(['No'] * (4 - len(slots)))
+    return slots
+
+
+def encoder_tables_path(model_path: str) -> str:
+    """
+    Location of the lookup tables saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        str: Path to the matching *_encoders.json file
+    """
+    return os.path.splitext(model_path)[0] + '_encoders.json'
+
+
+def build_encoder_tables(label_encoders) -> Dict[str, Dict[str, int]]:
+    """
+    Convert fitted LabelEncoders into category -> code dicts
+
+    Args:
+        label_encoders (dict): Column -> fitted LabelEncoder
+
+    Returns:
+        dict: Column -> {category: code}
+    """
+    return {
+        col: {str(value): code for code, value in enumerate(le.classes_)}
+        for col, le in label_encoders.items()
+    }
+
+
+def save_encoder_tables(model_path: str, tables: Dict[str, Dict[str, int]],
+                        feature_columns: List[str], training_date: Optional[str] = None,
+                        fill_values: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Save lookup tables next to the model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        tables (dict): Output of build_encoder_tables
+        feature_columns (list): Feature column order the tables belong to
+        training_date (str): Training date of the model package (staleness check)
+        fill_values (dict): Raw column -> value training filled missing cells with
+
+    Returns:
+        str: Path of the written JSON file
+    """
+    path = encoder_tables_path(model_path)
+    payload = {
+        'training_date': training_date,
+        'feature_columns': list(feature_columns),
+        'encoders': tables,
+        'fill_values': fill_values or {}
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_encoder_tables(model_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Read saved lookup tables without importing sklearn
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        dict: Saved payload (training_date, feature_columns, encoders, fill_values) or None
+    """
+    try:
+        with open(encoder_tables_path(model_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_encoder_tables(model_path: str, model_package: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """
+    Load the saved lookup tables, rebuilding them when missing or stale
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        model_package (dict): Loaded model package (label_encoders, feature_columns)
+
+    Returns:
+        dict: Column -> {category: code}
+    """
+    training_date = model_package.get('training_date')
+    feature_columns = model_package['feature_columns']
+
+    saved = read_encoder_tables(model_path)
+    if (saved is not None and saved.get('training_date') == training_date
+            and saved.get('feature_columns') == list(feature_columns)):
+        return saved['encoders']
+
+    tables = build_encoder_tables(model_package['label_encoders'])
+    try:
+        save_encoder_tables(model_path, tables, feature_columns, training_date,
+                            model_package.get('fill_values'))
+    except OSError:
+        pass  # Read-only deploys still work, they just rebuild on every load
+    return tables
+
+
+class FeatureEngine:
+    """
+    Vectorized request -> feature matrix transformer
+    """
+
+    def __init__(self, encoder_tables, feature_columns, binary_symptoms=BINARY_SYMPTOMS):
+        """
+        Precompute where every raw field lands in the feature matrix
+
+        Args:
+            encoder_tables (dict): Column -> {category: code} from load_encoder_tables
+            feature_columns (list): Feature column order from the model package
+            binary_symptoms (dict): Binary column -> triggering symptoms
+        """
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        self.binary_symptoms = binary_symptoms
+
+        positions = {col: j for j, col in enumerate(self.feature_columns)}
+
+        # (matrix column, request field) for the numeric features
+        self.numeric_plan = [(positions[col], field) for col, field in NUMERICAL_FIELDS.items()
+                             if col in positions]
+
+        # (matrix column, raw column, lookup table) for the encoded features;
+        # columns without an encoder stay 0 like the DataFrame path
+        self.categorical_plan = [(positions[col + '_encoded'], col, encoder_tables[col])
+                                 for col in CATEGORICAL_COLUMNS
+                                 if col + '_encoded' in positions and col in encoder_tables]
+
+        # The same plan split by kind and pre-encoded, so fill_row writes codes
+        # straight from the request without building lists, dicts or strings
+        encoded = {col: (j, table) for j, col, table in self.categorical_plan}
+
+        # (matrix column, request field, table, code of the default value)
+        self.field_plan = [(encoded[col][0], field, encoded[col][1],
+                            encoded[col][1].get(str(DEFAULT_REQUEST[field]), 0))
+                           for col, field in CATEGORICAL_FIELDS.items() if col in encoded]
+
+        # Per Symptom_1-4 slot: (matrix column, table, code per known symptom, code of 'No'), or None
+        self.slot_plan = [(encoded[col][0], encoded[col][1],
+                           {s: encoded[col][1].get(value, 0) for s, value in SYMPTOM_MAPPING.items()},
+                           encoded[col][1].get('No', 0)) if col in encoded else None
+                          for col in SYMPTOM_SLOTS]
+
+        # Binary indicators start at 'No'; each triggering symptom switches its columns to 'Yes'
+        self.binary_no = [(encoded[col][0], encoded[col][1].get('No', 0))
+                          for col in binary_symptoms if col in encoded]
+        binary_yes = {}
+        for col, triggers in binary_symptoms.items():
+            if col in encoded:
+                for trigger in triggers:
+                    binary_yes.setdefault(trigger, []).append((encoded[col][0], encoded[col][1].get('Yes', 0)))
+        self.binary_yes = {trigger: tuple(plan) for trigger, plan in binary_yes.items()}
+
+        # Per-thread row buffer for the single-request fast path
+        self._buffers = threading.local()
+
+    def raw_categorical_values(self, request: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Resolve the string value of every categorical column for one request
+
+        Args:
+            request (dict): Request with 'symptoms' plus optional animal fields
+
+        Returns:
+            dict: Raw column -> string value (before encoding)
+        """
+        normalized = normalize_symptoms(request['symptoms'])
+
+        values = {}
+        for col, field in CATEGORICAL_FIELDS.items():
+            value = request.get(field)
+            values[col] = str(DEFAULT_REQUEST[field] if value is None else value)
+
+        for col, value in zip(SYMPTOM_SLOTS, map_symptom_slots(normalized)):
+            values[col] = value
+
+        for col, triggers in self.binary_symptoms.items():
+            present = any(t in normalized for t in triggers)
+            values[col] = 'Yes' if present else 'No'
+
+        return values
+
+    def transform(self, requests: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Build the feature matrix for a list of requests
+
+        Args:
+            requests (List[dict]): Requests with 'symptoms' and optional animal_type,
+                age, weight, gender, breed, duration, heart_rate, temperature
+
+        Returns:
+            np.ndarray: Feature matrix of shape (len(requests), n_features)
+        """
+        X = np.zeros((len(requests), self.n_features), dtype=np.float64)
+
+        for i, request in enumerate(requests):
+            self.fill_row(request, X[i])
+
+        return X
+
+    def fill_row(self, request: Dict[str, Any], out: np.ndarray,
+                 symptoms: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Write one request's features into an existing row buffer
+
+        Gives the same codes as encoding raw_categorical_values(), but looks
+        every value up directly, so the only objects created per request are
+        the lowercased symptom strings. Columns outside the numeric/categorical
+        plans are never written, so a zero-initialized buffer can be reused
+        across requests.
+
+        Args:
+            request (dict): Request with optional animal fields (and 'symptoms'
+                unless they are passed separately)
+            out (np.ndarray): Row of length n_features to fill in place
+            symptoms (List[str]): Symptoms, instead of request['symptoms']
+
+        Returns:
+            np.ndarray: The filled row (same object as out)
+        """
+        if symptoms is None:
+            symptoms = request['symptoms']
+
+        for j, field in self.numeric_plan:
+            value = request.get(field)
+            out[j] = DEFAULT_REQUEST[field] if value is None else value
+
+        # Unknown categories fall back to 0 like the original preprocessing
+        for j, field, table, default in self.field_plan:
+            value = request.get(field)
+            out[j] = default if value is None else table.get(str(value), 0)
+
+        for j, code in self.binary_no:
+            out[j] = code
+
+        slot = 0
+        for symptom in symptoms:
+            normalized = symptom.lower().strip()
+            if slot < 4:
+                plan = self.slot_plan[slot]
+                if plan is not None:
+                    j, table, known, _ = plan
+                    code = known.get(normalized)
+                    out[j] = table.get(normalized.title(), 0) if code is None else code
+                slot += 1
+            for j, code in self.binary_yes.get(normalized, ()):
+                out[j] = code
+
+        while slot < 4:
+            plan = self.slot_plan[slot]
+            if plan is not None:
+                out[plan[0]] = plan[3]
+            slot += 1
+
+        return out
+
+    def transform_one(self, request: Dict[str, Any], symptoms: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Featurize a single request into this thread's reusable row buffer
+
+        The returned array is overwritten by the next call on the same thread,
+        so callers must finish with it (e.g. score it) before featurizing again.
+        Passing the symptoms separately lets callers hand over their keyword
+        arguments as the request without copying them.
+
+        Args:
+            request (dict): Request with optional animal fields (and 'symptoms'
+                unless they are passed separately)
+            symptoms (List[str]): Symptoms, instead of request['symptoms']
+
+        Returns:
+            np.ndarray: Feature row of length n_features
+        """
+        row = getattr(self._buffers, 'row', None)
+        if row is None:
+            row = self._buffers.row = np.zeros(self.n_features, dtype=np.float64)
+        return self.fill_row(request, row, symptoms)
+
+
+def encode_dataset(df, encoder_tables: Dict[str, Dict[str, int]], feature_columns: List[str],
+                   fill_values: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Encode a DataFrame shaped like animal_disease_prediction.csv into a feature matrix
+
+    Used by offline tools (verification, bulk scoring) that start from CSV rows
+    rather than symptom-checker requests. Missing cells are filled with
+    fill_values first, as preprocess_data() filled them before encoding.
+
+    Args:
+        df (pd.DataFrame): Rows with the raw training columns
+        encoder_tables (dict): Column -> {category: code}
+        feature_columns (list): Feature column order from the model package
+        fill_values (dict): Raw column -> training fill value (None leaves gaps as they are)
+
+    Returns:
+        np.ndarray: Feature matrix of shape (len(df), len(feature_columns))
+
+    Raises:
+        ValueError: When a numeric column holds text that is not a number
+    """
+    if fill_values:
+        df = df.fillna({col: value for col, value in fill_values.items() if col in df.columns})
+
+    X = np.zeros((len(df), len(feature_columns)), dtype=np.float64)
+
+    for j, feature in enumerate(feature_columns):
+        if feature.endswith('_encoded'):
+            col = feature[:-len('_encoded')]
+            table = encoder_tables.get(col)
+            if table is not None and col in df.columns:
+                X[:, j] = [table.get(str(value), 0) for value in df[col]]
+        elif feature in df.columns:
+            X[:, j] = df[feature].to_numpy(dtype=np.float64)
+        elif feature == 'Body_Temperature_Numeric' and 'Body_Temperature' in df.columns:
+            X[:, j] = df['Body_Temperature'].astype(str).str.extract(r'(\d+\.?\d*)')[0].astype(float)
+
+    return X
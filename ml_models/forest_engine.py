@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+"""
+Flattened Forest Inference Engine
+
+Exports the trained RandomForestClassifier into contiguous NumPy arrays and
+scores batches of rows by walking all trees in lockstep. This skips sklearn's
+per-call input validation and joblib thread dispatch, which cost more than
+the tree walks themselves for the one-row requests the API serves.
+
+Exported arrays (saved as raw .npy files in disease_model_forest/ next to the
+model, so every gunicorn worker memory-maps the same read-only pages):
+    roots       (n_trees,)            first node of every tree
+    feature     (n_nodes,)            split feature per node
+    threshold   (n_nodes,)            split threshold per node
+    left, right (n_nodes,)            child node indices (leaves point at themselves)
+    leaf_id     (n_nodes,)            row in leaf_value for leaves, -1 otherwise
+    leaf_value  (n_leaves, n_classes) normalized class distribution per leaf
+
+predict_proba_anytime() evaluates the trees in chunks and stops early for
+rows whose top-1 class is already settled (see ANYTIME_BOUNDS); it returns
+how many trees each row used. The Numba kernel saves time on any batch; the
+NumPy path pays a per-depth-level cost for every chunk of trees, so it only
+pays off for batches and is slower than predict_proba() for a single row.
+
+Usage:
+    python3 forest_engine.py [disease_model.pkl] [animal_disease_prediction.csv]
+
+    Or programmatically:
+    from forest_engine import load_forest
+    forest = load_forest('disease_model.pkl', model_package)
+    probabilities = forest.predict_proba(X)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import math
+import os
+import shutil
+import sys
+import threading
+import time
+import numpy as np
+from statistics import NormalDist
+from typing import Dict, Any, Optional, Tuple
+import warnings
+warnings.filterwarnings('ignore')
+
+# Optional: Numba-compiled traversal for large batches
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+# Rows scored per NumPy chunk (bounds the (rows, trees, classes) gather)
+DEFAULT_CHUNK_SIZE = 256
+
+# Margin bounds for predict_proba_anytime. After t of N trees a row stops when
+# the mean top-1/top-2 gap d_t (per-tree gaps lie in [-1, 1]) exceeds:
+#   'hoeffding'  sqrt(2 ln(1/delta) (1 - (t-1)/N) / t)   distribution-free (Hoeffding-Serfling)
+#   'normal'     z_delta * s_t / sqrt(t) * sqrt((N-t)/(N-1))   uses the per-tree gap spread s_t
+# Either way a row also stops once (N - t) / t < d_t: then even if every remaining
+# tree voted against it, the top-1 class could not change.
+ANYTIME_BOUNDS = ('hoeffding', 'normal')
+
+if NUMBA_AVAILABLE:
+    @numba.njit(nogil=True, cache=True)
+    def _walk_forest_numba(X, roots, feature, threshold, left, right, leaf_id, leaf_value, out):
+        n_rows = X.shape[0]
+        n_trees = roots.shape[0]
+        n_classes = leaf_value.shape[1]
+        for i in range(n_rows):
+            for t in range(n_trees):
+                node = roots[t]
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                leaf = leaf_id[node]
+                for c in range(n_classes):
+                    out[i, c] += leaf_value[leaf, c]
+            for c in range(n_classes):
+                out[i, c] /= n_trees
+        return out
+
+    @numba.njit(nogil=True, cache=True)
+    def _walk_forest_anytime_numba(X, roots, feature, threshold, left, right, leaf_id, leaf_value,
+                                   chunk, margin, spread_scale, out, used):
+        n_rows = X.shape[0]
+        n_trees = roots.shape[0]
+        n_classes = leaf_value.shape[1]
+        leaves = np.empty(n_trees, dtype=np.intp)
+        for i in range(n_rows):
+            t = 0
+            while t < n_trees:
+                stop = min(t + chunk, n_trees)
+                for tt in range(t, stop):
+                    node = roots[tt]
+                    while left[node] != node:
+                        if X[i, feature[node]] <= threshold[node]:
+                            node = left[node]
+                        else:
+                            node = right[node]
+                    leaf = leaf_id[node]
+                    leaves[tt] = leaf
+                    for c in range(n_classes):
+                        out[i, c] += leaf_value[leaf, c]
+                t = stop
+                if t == n_trees:
+                    break
+
+                # Top-1 / top-2 of the running sums
+                first = 0
+                second = 1
+                if out[i, 1] > out[i, 0]:
+                    first = 1
+                    second = 0
+                for c in range(2, n_classes):
+                    if out[i, c] > out[i, first]:
+                        second = first
+                        first = c
+                    elif out[i, c] > out[i, second]:
+                        second = c
+                gap = (out[i, first] - out[i, second]) / t
+                if gap > margin[t]:
+                    break
+                if spread_scale[t] > 0.0 and t > 1:
+                    ss = 0.0
+                    for tt in range(t):
+                        d = leaf_value[leaves[tt], first] - leaf_value[leaves[tt], second] - gap
+                        ss += d * d
+                    if gap > spread_scale[t] * math.sqrt(ss / (t - 1)):
+                        break
+            for c in range(n_classes):
+                out[i, c] /= t
+            used[i] = t
+        return out
+
+
+class FlatForest:
+    """
+    RandomForestClassifier flattened into contiguous arrays
+    """
+
+    ARRAY_NAMES = ['roots', 'feature', 'threshold', 'left', 'right', 'leaf_id', 'leaf_value']
+
+    def __init__(self, roots, feature, threshold, left, right, leaf_id, leaf_value,
+                 max_depth, classes=None, training_date=None):
+        """
+        Wrap already-flattened forest arrays
+
+        Args:
+            roots, feature, threshold, left, right, leaf_id, leaf_value: Forest arrays
+            max_depth (int): Deepest tree depth (lockstep iteration count)
+            classes (list): Disease names in probability column order
+            training_date (str): Training date of the source model package
+        """
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.leaf_id = np.ascontiguousarray(leaf_id, dtype=np.intp)
+        self.leaf_value = np.ascontiguousarray(leaf_value, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.classes = list(classes) if classes is not None else None
+        self.training_date = training_date
+
+        self.n_trees = len(self.roots)
+        self.n_classes = self.leaf_value.shape[1]
+
+        # Per-thread scratch buffers for predict_proba_row
+        self._scratch = threading.local()
+        # (delta, bound) -> anytime_thresholds() result
+        self._anytime_thresholds = {}
+        # n_trees -> subset() forest
+        self._subsets = {}
+
+    @classmethod
+    def from_sklearn(cls, model, classes=None, training_date=None):
+        """
+        Flatten a fitted RandomForestClassifier
+
+        Args:
+            model: Fitted RandomForestClassifier (single output)
+            classes (list): Disease names in probability column order
+            training_date (str): Training date of the source model package
+
+        Returns:
+            FlatForest: Flattened forest
+        """
+        roots, features, thresholds, lefts, rights, leaf_ids, leaf_values = [], [], [], [], [], [], []
+        offset = 0
+        n_leaves = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so extra lockstep iterations are no-ops
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Per-tree predict_proba normalizes the leaf value by its total
+            values = tree.value[is_leaf, 0, :model.n_classes_].astype(np.float64)
+            totals = values.sum(axis=1, keepdims=True)
+            totals[totals == 0.0] = 1.0
+
+            leaf_id = np.full(n_nodes, -1, dtype=np.intp)
+            leaf_id[is_leaf] = np.arange(n_leaves, n_leaves + is_leaf.sum())
+
+            roots.append(offset)
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            leaf_ids.append(leaf_id)
+            leaf_values.append(values / totals)
+
+            offset += n_nodes
+            n_leaves += int(is_leaf.sum())
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.array(roots), np.concatenate(features), np.concatenate(thresholds),
+                   np.concatenate(lefts), np.concatenate(rights), np.concatenate(leaf_ids),
+                   np.concatenate(leaf_values), max_depth, classes, training_date)
+
+    def save(self, path: str) -> str:
+        """
+        Save the flattened arrays as a directory of raw .npy files plus meta.json
+
+        The directory is written under a temporary name and swapped into
+        place, so readers never see a half-written forest. Processes that
+        already memory-mapped the old files keep their (unlinked) pages.
+
+        Args:
+            path (str): Destination directory
+
+        Returns:
+            str: Path of the written directory
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(tmp_path, name + '.npy'), getattr(self, name))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta(), f, ensure_ascii=False)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.isdir(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> 'FlatForest':
+        """
+        Load a forest saved with save()
+
+        Args:
+            path (str): Forest directory
+            mmap_mode (str): np.load mmap mode ('r' shares pages between processes,
+                None reads private copies)
+
+        Returns:
+            FlatForest: Loaded forest
+        """
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode,
+                                allow_pickle=False)
+                  for name in cls.ARRAY_NAMES}
+        return cls.from_arrays(arrays, meta)
+
+    def meta(self) -> Dict[str, Any]:
+        """Non-array attributes written to meta.json by save()"""
+        return {'max_depth': self.max_depth, 'classes': self.classes, 'training_date': self.training_date}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> 'FlatForest':
+        """Rebuild a forest from its ARRAY_NAMES arrays and meta() (used by load())"""
+        return cls(max_depth=meta['max_depth'], classes=meta.get('classes'),
+                   training_date=meta.get('training_date'), **arrays)
+
+    def subset(self, n_trees: int) -> 'FlatForest':
+        """
+        The forest made of the first n_trees trees (shares all node arrays)
+
+        Random forest trees are independent draws, so a prefix is a smaller
+        forest of the same model: same classes, noisier probabilities.
+
+        Args:
+            n_trees (int): Trees to keep (clamped to 1..n_trees)
+
+        Returns:
+            FlatForest: self when n_trees covers the whole forest
+        """
+        n_trees = min(max(int(n_trees), 1), self.n_trees)
+        if n_trees == self.n_trees:
+            return self
+        forest = self._subsets.get(n_trees)
+        if forest is None:
+            forest = self._subsets[n_trees] = FlatForest(
+                self.roots[:n_trees], self.feature, self.threshold, self.left, self.right,
+                self.leaf_id, self.leaf_value, self.max_depth, self.classes, self.training_date)
+        return forest
+
+    def apply(self, X: np.ndarray, roots: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Find the leaf every row lands in for every tree (lockstep over trees)
+
+        Args:
+            X (np.ndarray): Feature matrix (n_rows, n_features)
+            roots (np.ndarray): Roots of the trees to walk (default: all trees)
+
+        Returns:
+            np.ndarray: Global leaf node indices of shape (n_rows, n_trees)
+        """
+        # sklearn compares float32 features against float64 thresholds
+        X32 = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X32.shape[0])[:, None]
+        nodes = np.repeat((self.roots if roots is None else roots)[None, :], X32.shape[0], axis=0)
+
+        for _ in range(self.max_depth):
+            go_left = X32[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def leaf_distributions(self, leaves: np.ndarray) -> np.ndarray:
+        """
+        Class distributions of the given leaves
+
+        Args:
+            leaves (np.ndarray): Leaf indices (rows of leaf_value), any shape
+
+        Returns:
+            np.ndarray: Array of shape leaves.shape + (n_classes,)
+        """
+        return self.leaf_value[leaves]
+
+    def predict_proba(self, X: np.ndarray, use_numba: Optional[bool] = None,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """
+        Average the leaf class distributions over all trees
+
+        Args:
+            X (np.ndarray): Feature matrix (n_rows, n_features)
+            use_numba (bool): Force the Numba path on/off (default: use it if installed)
+            chunk_size (int): Rows per NumPy chunk
+
+        Returns:
+            np.ndarray: Class probabilities of shape (n_rows, n_classes)
+        """
+        X = np.atleast_2d(X)
+        proba = np.zeros((X.shape[0], self.n_classes), dtype=np.float64)
+
+        if use_numba is None:
+            use_numba = NUMBA_AVAILABLE
+        if use_numba:
+            X32 = np.ascontiguousarray(X, dtype=np.float32)
+            return _walk_forest_numba(X32, self.roots, self.feature, self.threshold,
+                                      self.left, self.right, self.leaf_id, self.leaf_value, proba)
+
+        for start in range(0, X.shape[0], chunk_size):
+            stop = start + chunk_size
+            leaves = self.leaf_id[self.apply(X[start:stop])]
+            proba[start:stop] = self.leaf_distributions(leaves).sum(axis=1)
+
+        proba /= self.n_trees
+        return proba
+
+    def anytime_thresholds(self, delta: float, bound: str = 'hoeffding') -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per tree count t, the gap that settles a row and the scale of the spread test
+
+        Args:
+            delta (float): Allowed probability that a stopped row's top-1 differs from the
+                full forest under the bound's assumptions (0 = only stop when it cannot differ)
+            bound (str): One of ANYTIME_BOUNDS
+
+        Returns:
+            tuple: (margin, spread_scale), arrays of length n_trees + 1; spread_scale[t] <= 0
+                disables the spread test
+        """
+        if bound not in ANYTIME_BOUNDS:
+            raise ValueError(f"Unknown anytime bound {bound!r} (expected one of {ANYTIME_BOUNDS})")
+        cached = self._anytime_thresholds.get((delta, bound))
+        if cached is not None:
+            return cached
+
+        n = self.n_trees
+        t = np.arange(n + 1, dtype=np.float64)
+        t[0] = 1.0
+
+        # Remaining trees cannot overturn the leader: gap * t > n - t
+        margin = (n - t) / t
+        spread_scale = np.zeros(n + 1, dtype=np.float64)
+        if delta > 0 and bound == 'hoeffding':
+            margin = np.minimum(margin, np.sqrt(2.0 * math.log(1.0 / delta) * (1.0 - (t - 1.0) / n) / t))
+        elif delta > 0 and n > 1:
+            z = NormalDist().inv_cdf(1.0 - delta)
+            spread_scale = z / np.sqrt(t) * np.sqrt(np.maximum(n - t, 0.0) / (n - 1))
+        margin[0] = np.inf
+        self._anytime_thresholds[(delta, bound)] = (np.ascontiguousarray(margin), np.ascontiguousarray(spread_scale))
+        return self._anytime_thresholds[(delta, bound)]
+
+    def predict_proba_anytime(self, X: np.ndarray, chunk_trees: int = 10, delta: float = 0.05,
+                              bound: str = 'hoeffding', use_numba: Optional[bool] = None
+                              ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Average leaf distributions over as few trees as it takes to settle the top-1 class
+
+        Trees are evaluated chunk_trees at a time; after each chunk, rows whose
+        top-1/top-2 gap clears the margin bound (see ANYTIME_BOUNDS) stop and are
+        averaged over the trees evaluated so far. Both paths give the same result;
+        without Numba only the rows still undecided walk each further chunk.
+
+        Args:
+            X (np.ndarray): Feature matrix (n_rows, n_features)
+            chunk_trees (int): Trees evaluated between checks
+            delta (float): Margin bound confidence (see anytime_thresholds)
+            bound (str): 'hoeffding' or 'normal'
+            use_numba (bool): Force the Numba path on/off (default: use it if installed)
+
+        Returns:
+            tuple: (probabilities (n_rows, n_classes), trees used per row (n_rows,))
+        """
+        X = np.atleast_2d(X)
+        chunk_trees = max(int(chunk_trees), 1)
+        margin, spread_scale = self.anytime_thresholds(delta, bound)
+        proba = np.zeros((X.shape[0], self.n_classes), dtype=np.float64)
+        used = np.full(X.shape[0], self.n_trees, dtype=np.intp)
+
+        if use_numba is None:
+            use_numba = NUMBA_AVAILABLE
+        if use_numba:
+            X32 = np.ascontiguousarray(X, dtype=np.float32)
+            _walk_forest_anytime_numba(X32, self.roots, self.feature, self.threshold, self.left,
+                                       self.right, self.leaf_id, self.leaf_value, chunk_trees,
+                                       margin, spread_scale, proba, used)
+            return proba, used
+
+        # NumPy path: walk one chunk of trees at a time for the rows still undecided,
+        # so settled rows really skip the remaining trees
+        keep_history = bool(spread_scale.any())
+        for start in range(0, X.shape[0], DEFAULT_CHUNK_SIZE):
+            stop = min(start + DEFAULT_CHUNK_SIZE, X.shape[0])
+            block = X[start:stop]
+            sums = proba[start:stop]
+            block_used = used[start:stop]
+            active = np.arange(stop - start)
+            # Leaf distributions of the trees seen so far, for the spread test: (active rows, t, classes)
+            history = np.empty((len(active), 0, self.n_classes), dtype=np.float64)
+
+            for first_tree in range(0, self.n_trees, chunk_trees):
+                t = min(first_tree + chunk_trees, self.n_trees)
+                values = self.leaf_value[self.leaf_id[self.apply(block[active], self.roots[first_tree:t])]]
+                sums[active] += values.sum(axis=1)
+                if t == self.n_trees:
+                    break
+
+                # Top-1/top-2 of the running sums and their mean gap
+                totals = sums[active]
+                rows = np.arange(len(active))
+                first = totals.argmax(axis=1)
+                top = totals[rows, first]
+                totals[rows, first] = -np.inf
+                second = totals.argmax(axis=1)
+                gap = (top - totals[rows, second]) / t
+                settled = gap > margin[t]
+
+                if keep_history:
+                    history = np.concatenate((history, values), axis=1)
+                    if spread_scale[t] > 0 and t > 1:
+                        tree_gaps = history[rows, :, first] - history[rows, :, second]
+                        ss = ((tree_gaps - gap[:, None]) ** 2).sum(axis=1)
+                        settled |= gap > spread_scale[t] * np.sqrt(ss / (t - 1))
+                    history = history[~settled]
+
+                block_used[active[settled]] = t
+                active = active[~settled]
+                if not len(active):
+                    break
+
+            sums /= block_used[:, None]
+        return proba, used
+
+    def _row_scratch(self, n_features: int) -> '_RowScratch':
+        """Get (or lazily create) this thread's single-row scratch buffers"""
+        scratch = getattr(self._scratch, 'buffers', None)
+        if scratch is None or scratch.x.shape[0] != n_features:
+            scratch = self._scratch.buffers = _RowScratch(self, n_features)
+        return scratch
+
+    def predict_proba_row(self, x: np.ndarray, use_numba: Optional[bool] = None) -> np.ndarray:
+        """
+        Score one feature row without allocating per-call arrays
+
+        Every intermediate lives in preallocated per-thread buffers. The
+        returned probabilities are one of those buffers, so they are
+        overwritten by the next call on the same thread.
+
+        Args:
+            x (np.ndarray): Feature row of length n_features
+            use_numba (bool): Force the Numba path on/off (default: use it if installed)
+
+        Returns:
+            np.ndarray: Class probabilities of length n_classes (reused buffer)
+        """
+        s = self._row_scratch(x.shape[-1])
+
+        # Round through float32 exactly like sklearn's tree input conversion
+        np.copyto(s.x32, x, casting='unsafe')
+        np.copyto(s.x, s.x32)
+
+        if use_numba is None:
+            use_numba = NUMBA_AVAILABLE
+        if use_numba:
+            s.proba_2d.fill(0.0)
+            _walk_forest_numba(s.x32_2d, self.roots, self.feature, self.threshold,
+                               self.left, self.right, self.leaf_id, self.leaf_value, s.proba_2d)
+            return s.proba
+
+        # ndarray.take with out= and mode='clip' neither allocates nor buffers
+        np.copyto(s.nodes, self.roots)
+        for _ in range(self.max_depth):
+            self.feature.take(s.nodes, out=s.index, mode='clip')
+            s.x.take(s.index, out=s.values, mode='clip')
+            self.threshold.take(s.nodes, out=s.thresholds, mode='clip')
+            np.less_equal(s.values, s.thresholds, out=s.go_left)
+            self.right.take(s.nodes, out=s.children, mode='clip')
+            self.left.take(s.nodes, out=s.index, mode='clip')
+            np.copyto(s.children, s.index, where=s.go_left)
+            s.nodes, s.children = s.children, s.nodes
+
+        # Sum the leaf rows with a dot product; np.sum(axis=0, out=) still
+        # allocates a temporary of the full (n_trees, n_classes) block
+        self.leaf_id.take(s.nodes, out=s.index, mode='clip')
+        self.leaf_value.take(s.index, axis=0, out=s.leaf_rows, mode='clip')
+        np.dot(s.ones, s.leaf_rows, out=s.proba)
+        np.divide(s.proba, self.n_trees, out=s.proba)
+        return s.proba
+
+
+class _RowScratch:
+    """
+    Preallocated buffers for FlatForest.predict_proba_row (one set per thread)
+    """
+
+    def __init__(self, forest: FlatForest, n_features: int):
+        self.x32 = np.zeros(n_features, dtype=np.float32)
+        self.x = np.zeros(n_features, dtype=np.float64)
+        self.nodes = np.zeros(forest.n_trees, dtype=np.intp)
+        self.children = np.zeros(forest.n_trees, dtype=np.intp)
+        self.index = np.zeros(forest.n_trees, dtype=np.intp)
+        self.values = np.zeros(forest.n_trees, dtype=np.float64)
+        self.thresholds = np.zeros(forest.n_trees, dtype=np.float64)
+        self.go_left = np.zeros(forest.n_trees, dtype=bool)
+        self.leaf_rows = np.zeros((forest.n_trees, forest.n_classes), dtype=np.float64)
+        self.proba = np.zeros(forest.n_classes, dtype=np.float64)
+        self.ones = np.ones(forest.n_trees, dtype=np.float64)
+
+        # 2-D views for the Numba kernel, created once
+        self.x32_2d = self.x32.reshape(1, -1)
+        self.proba_2d = self.proba.reshape(1, -1)
+
+
+def top_k(probabilities: np.ndarray, k: int = 3) -> np.ndarray:
+    """
+    Indices of the k most likely classes, highest first
+
+    Uses argpartition (O(n)) instead of a full argsort. Ties are ordered by
+    the higher class index first, like np.argsort(p)[-k:][::-1] with a
+    stable sort.
+
+    Args:
+        probabilities (np.ndarray): Class probabilities for one row
+        k (int): Number of classes to return
+
+    Returns:
+        np.ndarray: Class indices of length min(k, n_classes)
+    """
+    k = min(k, probabilities.shape[-1])
+    candidates = probabilities.argpartition(-k)[-k:]
+    candidates.sort()
+    order = np.argsort(probabilities[candidates], kind='stable')[::-1]
+    return candidates[order]
+
+
+def top_k_rows(probabilities: np.ndarray, k: int = 3) -> np.ndarray:
+    """
+    Row-wise top_k for a whole probability matrix with a single argpartition
+
+    Each row is ordered exactly like top_k(probabilities[i], k).
+
+    Args:
+        probabilities (np.ndarray): Class probabilities of shape (n_rows, n_classes)
+        k (int): Number of classes to return per row
+
+    Returns:
+        np.ndarray: Class indices of shape (n_rows, min(k, n_classes))
+    """
+    k = min(k, probabilities.shape[-1])
+    candidates = probabilities.argpartition(-k, axis=1)[:, -k:]
+    candidates.sort(axis=1)
+    values = np.take_along_axis(probabilities, candidates, axis=1)
+    order = np.argsort(values, axis=1, kind='stable')[:, ::-1]
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def forest_path(model_path: str) -> str:
+    """
+    Location of the flattened forest saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        str: Path to the matching *_forest directory
+    """
+    return os.path.splitext(model_path)[0] + '_forest'
+
+
+def export_forest(model_path: str, model_package: Dict[str, Any]) -> FlatForest:
+    """
+    Flatten the package's forest and save it next to the model
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        model_package (dict): Loaded model package
+
+    Returns:
+        FlatForest: The exported forest, memory-mapped from disk
+    """
+    forest = FlatForest.from_sklearn(model_package['model'],
+                                     classes=model_package.get('classes'),
+                                     training_date=model_package.get('training_date'))
+    return FlatForest.load(forest.save(forest_path(model_path)))
+
+
+def load_forest(model_path: str, model_package: Dict[str, Any]) -> FlatForest:
+    """
+    Load the flattened forest (memory-mapped), re-exporting it when missing or stale
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        model_package (dict): Loaded model package
+
+    Returns:
+        FlatForest: Forest matching the package's training date
+    """
+    path = forest_path(model_path)
+    try:
+        forest = FlatForest.load(path)
+        if forest.training_date == model_package.get('training_date'):
+            return forest
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        return export_forest(model_path, model_package)
+    except OSError:
+        # Read-only deploys still work, they just flatten on every load
+        return FlatForest.from_sklearn(model_package['model'],
+                                       classes=model_package.get('classes'),
+                                       training_date=model_package.get('training_date'))
+
+
+def main():
+    """
+    Export the forest and verify it against sklearn on the training CSV
+    """
+    import joblib
+    import pandas as pd
+    from feature_engine import encode_dataset, load_encoder_tables
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'disease_model.pkl'
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else 'animal_disease_prediction.csv'
+
+    print("🌲 FLATTENED FOREST EXPORT")
+    print("=" * 50)
+
+    model_package = joblib.load(model_path)
+    forest = export_forest(model_path, model_package)
+    print(f"✅ Exported {forest.n_trees} trees ({len(forest.feature)} nodes, "
+          f"{len(forest.leaf_value)} leaves) to {forest_path(model_path)}")
+
+    tables = load_encoder_tables(model_path, model_package)
+    X = encode_dataset(pd.read_csv(csv_path), tables, model_package['feature_columns'])
+
+    expected = model_package['model'].predict_proba(X)
+    paths = [('numpy', False)] + ([('numba', True)] if NUMBA_AVAILABLE else [])
+    for name, use_numba in paths:
+        actual = FlatForest.load(forest_path(model_path)).predict_proba(X, use_numba=use_numba)
+        max_diff = float(np.abs(actual - expected).max())
+        status = "✅" if max_diff <= 1e-9 else "❌"
+        print(f"{status} {name}: max |p - p_sklearn| = {max_diff:.3e} over {len(X)} rows")
+
+    # Single-row latency is what the API pays per request
+    row = X[:1]
+    for name, score in [('sklearn', lambda: model_package['model'].predict_proba(row)),
+                        ('flat numpy', lambda: forest.predict_proba(row, use_numba=False))]:
+        score()
+        start = time.perf_counter()
+        for _ in range(200):
+            score()
+        elapsed = (time.perf_counter() - start) / 200
+        print(f"⏱️  {name}: {elapsed * 1e3:.3f} ms per single-row call")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,29 +18,37 @@ Date: October 2025
 
 import joblib
 import json
-import pandas as pd
 import numpy as np
 from typing import List, Dict, Any
 import warnings
 warnings.filterwarnings('ignore')
 
+from feature_engine import FeatureEngine, EXTENDED_BINARY_SYMPTOMS, load_encoder_tables
+from forest_engine import load_forest, top_k
+from prediction_cache import data_fingerprint
+from shared_cache import cache_from_env
+
 class DiseasePredictor:
     """
     Streamlined disease predictor for symptom-based predictions
     """
     
-    def __init__(self, model_path='disease_model.pkl', severity_path='severity_mapping.json'):
+    def __init__(self, model_path='disease_model.pkl', severity_path='severity_mapping.json',
+                 cache=None):
         """
         Initialize the predictor
         
         Args:
             model_path (str): Path to trained model
             severity_path (str): Path to severity mapping JSON
+            cache: Optional PredictionCache/TieredPredictionCache in front of predict_diseases
         """
         self.model_path = model_path
         self.severity_path = severity_path
         self.model_package = None
         self.severity_data = {}
+        self.cache = cache
+        self.cache_version = None
         
         self.load_model()
         self.load_severity_mapping()
@@ -53,6 +61,11 @@ class DiseasePredictor:
             self.label_encoders = self.model_package['label_encoders']
             self.target_encoder = self.model_package['target_encoder']
             self.feature_columns = self.model_package['feature_columns']
+            self.encoder_tables = load_encoder_tables(self.model_path, self.model_package)
+            self.feature_engine = FeatureEngine(self.encoder_tables, self.feature_columns,
+                                                binary_symptoms=EXTENDED_BINARY_SYMPTOMS)
+            self.forest = load_forest(self.model_path, self.model_package)
+            self.cache_version = data_fingerprint(self.model_package, self.severity_data)
             # Suppress print statements when called from API
             if not hasattr(self, '_suppress_output'):
                 print(f"✅ Model loaded successfully from {self.model_path}")
@@ -66,6 +79,7 @@ class DiseasePredictor:
         try:
             with open(self.severity_path, 'r', encoding='utf-8') as f:
                 self.severity_data = json.load(f)
+            self.cache_version = data_fingerprint(self.model_package, self.severity_data)
             # Suppress print statements when called from API
             if not hasattr(self, '_suppress_output'):
                 print(f"✅ Severity mapping loaded: {len(self.severity_data)} diseases")
@@ -94,105 +108,51 @@ class DiseasePredictor:
         Returns:
             np.ndarray: Preprocessed feature vector
         """
-        # Create base animal data
-        animal_data = {
-            'Animal_Type': animal_type,
-            'Breed': breed,
-            'Age': age,
-            'Gender': gender,
-            'Weight': weight,
-            'Duration': duration,
-            'Heart_Rate': heart_rate,
-            'Body_Temperature_Numeric': temperature
-        }
-        
-        # Process symptoms - map to symptom slots and binary indicators
-        symptom_mapping = {
-            'fever': 'Fever',
-            'lethargy': 'Lethargy', 
-            'vomiting': 'Vomiting',
-            'diarrhea': 'Diarrhea',
-            'coughing': 'Coughing',
-            'appetite loss': 'Appetite Loss',
-            'nasal discharge': 'Nasal Discharge',
-            'eye discharge': 'Eye Discharge',
-            'skin lesions': 'Skin Lesions',
-            'lameness': 'Lameness',
-            'labored breathing': 'Labored Breathing',
-            'sneezing': 'Sneezing'
-        }
-        
-        # Normalize symptoms to lowercase for matching
-        normalized_symptoms = [s.lower().strip() for s in symptoms]
-        
-        # Fill symptom slots (1-4)
-        mapped_symptoms = []
-        for symptom in normalized_symptoms[:4]:  # Take first 4 symptoms
-            mapped_symptom = symptom_mapping.get(symptom, symptom.title())
-            mapped_symptoms.append(mapped_symptom)
-        
-        # Pad with 'No' if less than 4 symptoms
-        while len(mapped_symptoms) < 4:
-            mapped_symptoms.append('No')
-        
-        # Assign to symptom slots
-        animal_data['Symptom_1'] = mapped_symptoms[0]
-        animal_data['Symptom_2'] = mapped_symptoms[1] 
-        animal_data['Symptom_3'] = mapped_symptoms[2]
-        animal_data['Symptom_4'] = mapped_symptoms[3]
-        
-        # Set binary indicators based on symptoms
-        binary_symptoms = {
-            'Appetite_Loss': 'appetite loss' in normalized_symptoms or 'lethargy' in normalized_symptoms,
-            'Vomiting': 'vomiting' in normalized_symptoms,
-            'Diarrhea': 'diarrhea' in normalized_symptoms,
-            'Coughing': 'coughing' in normalized_symptoms,
-            'Labored_Breathing': 'labored breathing' in normalized_symptoms or 'breathing difficulty' in normalized_symptoms,
-            'Lameness': 'lameness' in normalized_symptoms or 'limping' in normalized_symptoms,
-            'Skin_Lesions': 'skin lesions' in normalized_symptoms or 'rash' in normalized_symptoms,
-            'Nasal_Discharge': 'nasal discharge' in normalized_symptoms or 'runny nose' in normalized_symptoms,
-            'Eye_Discharge': 'eye discharge' in normalized_symptoms or 'watery eyes' in normalized_symptoms
-        }
-        
-        for symptom, present in binary_symptoms.items():
-            animal_data[symptom] = 'Yes' if present else 'No'
-        
-        # Convert to DataFrame for processing
-        df = pd.DataFrame([animal_data])
-        
-        # Encode categorical variables using saved encoders
-        categorical_cols = ['Animal_Type', 'Breed', 'Gender', 'Symptom_1', 'Symptom_2', 
-                           'Symptom_3', 'Symptom_4', 'Duration', 'Appetite_Loss', 'Vomiting',
-                           'Diarrhea', 'Coughing', 'Labored_Breathing', 'Lameness', 
-                           'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
-        
-        for col in categorical_cols:
-            if col in df.columns and col in self.label_encoders:
-                le = self.label_encoders[col]
-                value = str(df[col].iloc[0])
-                try:
-                    if value in le.classes_:
-                        df[col + '_encoded'] = le.transform([value])
-                    else:
-                        # Use most common class (usually index 0) for unknown values
-                        df[col + '_encoded'] = 0
-                except:
-                    df[col + '_encoded'] = 0
-        
-        # Create feature vector matching training format
-        feature_vector = []
-        for feature in self.feature_columns:
-            if feature in df.columns:
-                feature_vector.append(df[feature].iloc[0])
-            else:
-                feature_vector.append(0)  # Default for missing features
+        return self.preprocess_symptoms_batch([{
+            'symptoms': symptoms,
+            'animal_type': animal_type,
+            'age': age,
+            'weight': weight,
+            'gender': gender,
+            'breed': breed,
+            'duration': duration,
+            'heart_rate': heart_rate,
+            'temperature': temperature
+        }])
+    
+    def preprocess_symptoms_batch(self, requests: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Preprocess many requests into one feature matrix without pandas
         
-        return np.array(feature_vector).reshape(1, -1)
+        Args:
+            requests (List[Dict]): Dicts with 'symptoms' and optional animal_type,
+                age, weight, gender, breed, duration, heart_rate, temperature
+            
+        Returns:
+            np.ndarray: Feature matrix of shape (len(requests), len(feature_columns))
+        """
+        return self.feature_engine.transform(requests)
     
     def predict_diseases(self, symptoms: List[str], **kwargs) -> Dict[str, Any]:
         """
         Predict diseases from symptoms and return structured JSON
         
+        Args:
+            symptoms (List[str]): List of symptoms
+            **kwargs: Additional animal parameters
+            
+        Returns:
+            Dict: JSON response with top 3 predictions
+        """
+        if self.cache is None:
+            return self.predict_diseases_uncached(symptoms, **kwargs)
+        return self.cache.get_or_compute(self.cache_version, self.predict_diseases_uncached,
+                                         symptoms, **kwargs)
+    
+    def predict_diseases_uncached(self, symptoms: List[str], **kwargs) -> Dict[str, Any]:
+        """
+        Predict diseases without consulting the response cache
+        
         Args:
             symptoms (List[str]): List of symptoms
             **kwargs: Additional animal parameters
@@ -201,14 +161,14 @@ class DiseasePredictor:
             Dict: JSON response with top 3 predictions
         """
         try:
-            # Preprocess symptoms
-            X = self.preprocess_symptoms(symptoms, **kwargs)
+            # Featurize into this thread's reusable row buffer
+            x = self.feature_engine.transform_one(kwargs, symptoms)
             
-            # Get predictions and probabilities
-            probabilities = self.model.predict_proba(X)[0]
+            # Score the single row with preallocated per-thread buffers
+            probabilities = self.forest.predict_proba_row(x)
             
-            # Get top 3 predictions
-            top_indices = np.argsort(probabilities)[-3:][::-1]
+            # Get top 3 predictions (argpartition, no full sort)
+            top_indices = top_k(probabilities, 3)
             
             predictions = []
             for idx in top_indices:
@@ -242,10 +202,10 @@ class DiseasePredictor:
 _predictor = None
 
 def get_predictor():
-    """Get or create predictor instance"""
+    """Get or create predictor instance (with the cache stack from cache_from_env)"""
     global _predictor
     if _predictor is None:
-        _predictor = DiseasePredictor()
+        _predictor = DiseasePredictor(cache=cache_from_env())
     return _predictor
 
 def predict_diseases(symptoms: List[str], **kwargs) -> Dict[str, Any]:
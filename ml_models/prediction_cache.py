@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+In-Process Prediction Cache
+
+Bounded LRU/TTL cache that sits in front of the predictors. The symptom
+checker UI sends the same handful of symptom combinations over and over, so
+rendered responses are cached under a canonical form of the request:
+normalized symptoms plus every animal field that reaches the model.
+
+Entries are tagged with a fingerprint of the model package and severity
+mapping; when either changes (e.g. a reload), the cache clears itself.
+
+Configuration (environment variables, read by PredictionCache.from_env):
+    PREDICTION_CACHE_ENTRIES    maximum cached responses (default 2048, 0 disables)
+    PREDICTION_CACHE_MAX_BYTES  maximum approximate size in bytes (default 8 MB)
+    PREDICTION_CACHE_TTL        seconds before an entry expires (default 3600, 0 = never)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from feature_engine import DEFAULT_REQUEST, normalize_symptoms
+
+# Request fields that are parsed as numbers by the feature engine
+NUMERIC_FIELDS = ('age', 'weight', 'heart_rate', 'temperature')
+
+
+def _canonical_number(value):
+    """Numbers compare by value (3 == 3.0 == '3'); anything else by its string"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def canonical_request_key(symptoms: List[str], **fields) -> Tuple:
+    """
+    Build a hashable key that is identical for requests the model cannot tell apart
+
+    The first four symptoms fill the ordered Symptom_1-4 slots, so their order
+    is kept; the remaining symptoms only drive the binary indicators, so they
+    are deduplicated and sorted.
+
+    Args:
+        symptoms (List[str]): Raw symptoms from the request
+        **fields: animal_type, age, weight, gender, breed, duration, heart_rate, temperature
+
+    Returns:
+        tuple: Canonical cache key
+    """
+    normalized = normalize_symptoms(symptoms)
+    key = [tuple(normalized[:4]), tuple(sorted(set(normalized[4:])))]
+
+    for field, default in DEFAULT_REQUEST.items():
+        value = fields.get(field)
+        if value is None:
+            value = default
+        key.append(_canonical_number(value) if field in NUMERIC_FIELDS else str(value))
+
+    return tuple(key)
+
+
+def data_fingerprint(model_package: Optional[Dict[str, Any]], severity_data: Dict[str, Any]) -> str:
+    """
+    Fingerprint of everything a cached response depends on besides the request
+
+    Args:
+        model_package (dict): Loaded model package (may be None before loading)
+        severity_data (dict): Loaded severity mapping
+
+    Returns:
+        str: Hex digest that changes when the model or severity mapping changes
+    """
+    digest = hashlib.sha1()
+    if model_package is not None:
+        digest.update(str(model_package.get('training_date')).encode('utf-8'))
+        digest.update(json.dumps(list(model_package.get('feature_columns', []))).encode('utf-8'))
+        digest.update(json.dumps(list(model_package.get('classes', []))).encode('utf-8'))
+    digest.update(json.dumps(severity_data, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached response deep enough that callers can edit it safely"""
+    copied = dict(result)
+    copied['predictions'] = [dict(p) for p in result.get('predictions', [])]
+    return copied
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache with TTL, entry and byte limits
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=8 * 1024 * 1024, ttl_seconds=3600.0):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_entries (int): Maximum number of cached responses
+            max_bytes (int): Maximum approximate total size of cached responses
+            ttl_seconds (float): Entry lifetime in seconds (0 or None = no expiry)
+        """
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds) if ttl_seconds else None
+
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self.version = None
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> Optional['PredictionCache']:
+        """
+        Create a cache from PREDICTION_CACHE_* environment variables
+
+        Returns:
+            PredictionCache: Configured cache, or None when disabled (0 entries)
+        """
+        max_entries = int(os.environ.get('PREDICTION_CACHE_ENTRIES', 2048))
+        if max_entries <= 0:
+            return None
+        return cls(max_entries=max_entries,
+                   max_bytes=int(os.environ.get('PREDICTION_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+                   ttl_seconds=float(os.environ.get('PREDICTION_CACHE_TTL', 3600)))
+
+    def _check_version(self, version):
+        """Clear everything when the model/severity fingerprint changed (lock held)"""
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.current_bytes = 0
+            self.version = version
+
+    def get(self, key, version=None) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Canonical request key
+            version: Current data fingerprint (entries from another version are dropped)
+
+        Returns:
+            dict: Cached response or None on a miss
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.current_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: Dict[str, Any], version=None) -> bool:
+        """
+        Store a response, evicting least recently used entries to stay in bounds
+
+        Args:
+            key: Canonical request key
+            value (dict): JSON-serializable response
+            version: Data fingerprint the response was computed with
+
+        Returns:
+            bool: True if stored (responses larger than max_bytes are skipped)
+        """
+        size = len(json.dumps(value, ensure_ascii=False)) + len(repr(key))
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            self._check_version(version)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def get_or_compute(self, version, compute, symptoms, store=True, **fields) -> Dict[str, Any]:
+        """
+        Serve a prediction from the cache, computing and storing it on a miss
+
+        Error responses are never cached.
+
+        Args:
+            version: Current data fingerprint
+            compute (callable): compute(symptoms, **fields) -> response dict
+            symptoms (List[str]): Raw symptoms from the request
+            store (bool): Keep a computed response (False: only read the cache)
+            **fields: Animal fields forwarded to compute
+
+        Returns:
+            dict: Response (a copy when served from the cache)
+        """
+        try:
+            key = canonical_request_key(symptoms, **fields)
+        except (TypeError, AttributeError):
+            return compute(symptoms, **fields)  # Malformed input: let the predictor report it
+
+        cached = self.get(key, version)
+        if cached is not None:
+            return copy_result(cached)
+
+        result = compute(symptoms, **fields)
+        if store and 'error' not in result:
+            self.put(key, copy_result(result), version)
+        return result
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of cache counters
+
+        Returns:
+            dict: Sizes, limits and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Cross-Worker Shared Prediction Cache
+
+Second cache tier shared by every gunicorn worker on the host. Each worker
+keeps its private in-process PredictionCache; on a private miss it checks a
+local SQLite file (WAL mode) that all workers read and write, so adding
+workers no longer means adding cold caches.
+
+Writes are single SQLite transactions (atomic across processes), the file is
+capped by entry count and approximate bytes with least-recently-used
+eviction, and lookups never wait long on a busy database: contention is
+treated as a miss.
+
+Configuration (environment variables, read by cache_from_env):
+    PREDICTION_SHARED_CACHE_PATH       SQLite file for the shared tier (unset = private tier only)
+    PREDICTION_SHARED_CACHE_ENTRIES    maximum shared entries (default 20000)
+    PREDICTION_SHARED_CACHE_MAX_BYTES  maximum approximate size in bytes (default 64 MB)
+    PREDICTION_SHARED_CACHE_TTL        seconds before an entry expires (default: PREDICTION_CACHE_TTL)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from prediction_cache import PredictionCache, canonical_request_key, copy_result
+
+# Hits refresh last_access at most this often, so hot keys do not turn reads into writes
+ACCESS_REFRESH_SECONDS = 30.0
+
+# How long a lookup or write may wait for another worker's transaction
+BUSY_TIMEOUT_SECONDS = 0.05
+
+
+class SharedPredictionCache:
+    """
+    SQLite-backed LRU/TTL cache shared between processes
+    """
+
+    def __init__(self, path, max_entries=20000, max_bytes=64 * 1024 * 1024, ttl_seconds=3600.0):
+        """
+        Open (or create) the shared cache file
+
+        Args:
+            path (str): SQLite database path
+            max_entries (int): Maximum number of shared entries
+            max_bytes (int): Maximum approximate total size of stored responses
+            ttl_seconds (float): Entry lifetime in seconds (0 or None = no expiry)
+        """
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = float(ttl_seconds) if ttl_seconds else None
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._purged_version = None
+
+        # Per-process counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread, per-process connection (reopened after a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS predictions (
+                            key TEXT PRIMARY KEY,
+                            version TEXT NOT NULL,
+                            value TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            expires_at REAL,
+                            last_access REAL NOT NULL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _hash_key(key) -> str:
+        """Stable text key for a canonical request tuple"""
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _purge_other_versions(self, conn, version):
+        """Drop entries from older models once per process and version"""
+        if self._purged_version == version:
+            return
+        with conn:
+            conn.execute('DELETE FROM predictions WHERE version != ?', (version,))
+        self._purged_version = version
+
+    def get(self, key, version) -> Optional[Dict[str, Any]]:
+        """
+        Look up a response stored by any worker
+
+        Args:
+            key: Canonical request key
+            version (str): Current data fingerprint
+
+        Returns:
+            dict: Cached response or None on a miss (including lock contention)
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT version, value, expires_at, last_access FROM predictions WHERE key = ?',
+                               (self._hash_key(key),)).fetchone()
+            if (row is None or row[0] != version
+                    or (row[2] is not None and row[2] <= now)):
+                self._count('misses')
+                return None
+
+            if now - row[3] > ACCESS_REFRESH_SECONDS:
+                conn.execute('UPDATE predictions SET last_access = ? WHERE key = ?',
+                             (now, self._hash_key(key)))
+
+            self._count('hits')
+            return json.loads(row[1])
+        except sqlite3.Error:
+            self._count('errors')
+            self._count('misses')
+            return None
+
+    def put(self, key, value: Dict[str, Any], version) -> bool:
+        """
+        Store a response atomically, evicting least recently used entries
+
+        Args:
+            key: Canonical request key
+            value (dict): JSON-serializable response
+            version (str): Data fingerprint the response was computed with
+
+        Returns:
+            bool: True if stored
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload)
+        if size > self.max_bytes:
+            return False
+
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else None
+
+        try:
+            conn = self._connection()
+            self._purge_other_versions(conn, version)
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)',
+                             (self._hash_key(key), version, payload, size, expires_at, now))
+                evicted = self._evict(conn, now)
+            self._count('writes')
+            if evicted:
+                self._count('evictions', evicted)
+            return True
+        except sqlite3.Error:
+            self._count('errors')
+            return False
+
+    def _evict(self, conn, now) -> int:
+        """Remove expired entries, then LRU entries until within limits (inside a transaction)"""
+        evicted = conn.execute('DELETE FROM predictions WHERE expires_at IS NOT NULL AND expires_at <= ?',
+                               (now,)).rowcount
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions').fetchone()
+
+        while count > self.max_entries or total > self.max_bytes:
+            # Drop roughly the oldest 10% (at least enough to get under the entry cap)
+            batch = max(count - self.max_entries, count // 10, 1)
+            rows = conn.execute('SELECT key, size FROM predictions ORDER BY last_access LIMIT ?',
+                                (batch,)).fetchall()
+            if not rows:
+                break
+            conn.executemany('DELETE FROM predictions WHERE key = ?', [(k,) for k, _ in rows])
+            evicted += len(rows)
+            count -= len(rows)
+            total -= sum(size for _, size in rows)
+
+        return evicted
+
+    def clear(self):
+        """Drop every shared entry (affects all workers)"""
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM predictions')
+        except sqlite3.Error:
+            self._count('errors')
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Shared-tier size plus this process's counters
+
+        Returns:
+            dict: Entries, bytes, limits and hit/miss/write/eviction/error counters
+        """
+        entries, total = None, None
+        try:
+            entries, total = self._connection().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions').fetchone()
+        except sqlite3.Error:
+            self._count('errors')
+
+        with self._lock:
+            return {
+                'path': self.path,
+                'entries': entries,
+                'bytes': total,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+
+
+class TieredPredictionCache:
+    """
+    Private in-process cache backed by the shared cross-worker tier
+    """
+
+    def __init__(self, private: PredictionCache, shared: SharedPredictionCache):
+        """
+        Combine the two tiers
+
+        Args:
+            private (PredictionCache): This worker's in-process cache
+            shared (SharedPredictionCache): Host-wide SQLite cache
+        """
+        self.private = private
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.served = {'private': 0, 'shared': 0, 'computed': 0}
+
+    def _served(self, tier):
+        with self._lock:
+            self.served[tier] += 1
+
+    def get_or_compute(self, version, compute, symptoms, store=True, **fields) -> Dict[str, Any]:
+        """
+        Serve from the private tier, then the shared tier, then compute
+
+        Args:
+            version: Current data fingerprint
+            compute (callable): compute(symptoms, **fields) -> response dict
+            symptoms (List[str]): Raw symptoms from the request
+            store (bool): Keep a computed response (False: only read the cache)
+            **fields: Animal fields forwarded to compute
+
+        Returns:
+            dict: Response
+        """
+        try:
+            key = canonical_request_key(symptoms, **fields)
+        except (TypeError, AttributeError):
+            return compute(symptoms, **fields)
+
+        cached = self.private.get(key, version)
+        if cached is not None:
+            self._served('private')
+            return copy_result(cached)
+
+        cached = self.shared.get(key, version)
+        if cached is not None:
+            self.private.put(key, cached, version)
+            self._served('shared')
+            return copy_result(cached)
+
+        result = compute(symptoms, **fields)
+        self._served('computed')
+        if store and 'error' not in result:
+            stored = copy_result(result)
+            self.private.put(key, stored, version)
+            self.shared.put(key, stored, version)
+        return result
+
+    def clear(self):
+        """Clear both tiers"""
+        self.private.clear()
+        self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-tier stats plus which tier served each request
+
+        Returns:
+            dict: {'served_by': {...}, 'private': {...}, 'shared': {...}}
+        """
+        with self._lock:
+            served = dict(self.served)
+        return {'served_by': served, 'private': self.private.stats(), 'shared': self.shared.stats()}
+
+
+def cache_from_env():
+    """
+    Build the configured cache stack from environment variables
+
+    Returns:
+        PredictionCache or TieredPredictionCache or None: None when caching is disabled
+    """
+    private = PredictionCache.from_env()
+    path = os.environ.get('PREDICTION_SHARED_CACHE_PATH')
+    if private is None or not path:
+        return private
+
+    try:
+        shared = SharedPredictionCache(
+            path,
+            max_entries=int(os.environ.get('PREDICTION_SHARED_CACHE_ENTRIES', 20000)),
+            max_bytes=int(os.environ.get('PREDICTION_SHARED_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            ttl_seconds=float(os.environ.get('PREDICTION_SHARED_CACHE_TTL',
+                                             os.environ.get('PREDICTION_CACHE_TTL', 3600))))
+    except sqlite3.Error as e:
+        print(f"⚠️  Shared prediction cache disabled ({path}): {e}")
+        return private
+
+    return TieredPredictionCache(private, shared)
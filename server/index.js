@@ -8,7 +8,7 @@ const pathOriginal = require('path');
 const axios = require('axios');
 
 // Firestore setup (replacing SQLite)
-const { db: firestoreDb, realtimeDb } = require('./config/firebaseAdmin');
+const { db: firestoreDb, realtimeDb, auth: firebaseAuth } = require('./config/firebaseAdmin');
 const NotificationService = require('./services/notificationService');
 const {
   UserService,
@@ -1737,7 +1737,10 @@ app.post('/api/predict-disease', async (req, res) => {
         response = await axios.post(`${mlApiUrl}/predict`, inputData, {
           timeout: 45000, // 45 second timeout (increased for cold starts)
           headers: {
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            // Lets an overloaded ML API answer with fewer trees instead of timing out
+            'X-Request-Deadline-Ms': '45000',
+            'X-Request-Start': `t=${Date.now()}`
           }
         });
         
@@ -1768,7 +1771,8 @@ app.post('/api/predict-disease', async (req, res) => {
       return res.status(500).json(predictionResult);
     }
 
-    // Save prediction to Firestore
+    // Save prediction to Firestore (its id is what a vet confirms the diagnosis against)
+    let predictionId = null;
     try {
       const predictionData = {
         userId: userId.toString(),
@@ -1777,10 +1781,13 @@ app.post('/api/predict-disease', async (req, res) => {
         animalType: animal_type,
         age,
         weight,
+        gender,
+        breed,
         timestamp: new Date().toISOString()
       };
       
-      await firestoreDb.collection('disease_predictions').add(predictionData);
+      const saved = await firestoreDb.collection('disease_predictions').add(predictionData);
+      predictionId = saved.id;
       console.log('Disease prediction saved to Firestore');
     } catch (dbError) {
       console.error('Error saving prediction to Firestore:', dbError.message);
@@ -1791,6 +1798,7 @@ app.post('/api/predict-disease', async (req, res) => {
     res.json({
       ...predictionResult,
       saved: true,
+      prediction_id: predictionId,
       timestamp: new Date().toISOString()
     });
 
@@ -1815,6 +1823,109 @@ app.post('/api/predict-disease', async (req, res) => {
   }
 });
 
+// Confirmed diagnoses become training data, so only clinic accounts (service providers) and admins may send them
+const CONFIRMING_ROLES = ['serviceProvider', 'provider', 'admin'];
+
+// Verify the Firebase ID token the frontend sends and require a clinic account
+const requireClinicUser = async (req, res, next) => {
+  const header = req.headers.authorization || '';
+  const token = header.startsWith('Bearer ') ? header.slice(7) : null;
+  if (!token) {
+    return res.status(401).json({ error: 'Sign in to confirm a diagnosis' });
+  }
+  
+  try {
+    const decoded = await firebaseAuth.verifyIdToken(token);
+    const user = await UserService.getUserById(decoded.uid);
+    if (!user || !(CONFIRMING_ROLES.includes(user.role) || CONFIRMING_ROLES.includes(user.accountType))) {
+      return res.status(403).json({ error: 'Only vets and clinics can confirm a diagnosis' });
+    }
+    req.user = { id: decoded.uid, name: user.name || null, role: user.role || user.accountType };
+    next();
+  } catch (error) {
+    console.error('Error verifying ID token:', error.message);
+    res.status(401).json({ error: 'Invalid or expired sign-in' });
+  }
+};
+
+// One confirmation per prediction per window (a correction can follow once the window has passed)
+const CONFIRM_WINDOW_MS = parseInt(process.env.CONFIRM_WINDOW_SECONDS || '600', 10) * 1000;
+const lastConfirmation = new Map();
+
+// Record a vet-confirmed diagnosis for a saved prediction and send it to the ML API for online learning
+app.post('/api/disease-predictions/:predictionId/confirm', requireClinicUser, async (req, res) => {
+  const { predictionId } = req.params;
+  const { diagnosis } = req.body;
+  
+  if (!diagnosis || typeof diagnosis !== 'string') {
+    return res.status(400).json({ error: 'diagnosis is required' });
+  }
+  
+  const now = Date.now();
+  if (now - (lastConfirmation.get(predictionId) || 0) < CONFIRM_WINDOW_MS) {
+    return res.status(429).json({ error: 'This prediction was confirmed recently, try again later' });
+  }
+  lastConfirmation.set(predictionId, now);
+  for (const [id, at] of lastConfirmation) {
+    if (now - at >= CONFIRM_WINDOW_MS) lastConfirmation.delete(id);
+  }
+  
+  try {
+    const ref = firestoreDb.collection('disease_predictions').doc(predictionId);
+    const doc = await ref.get();
+    if (!doc.exists) {
+      lastConfirmation.delete(predictionId);
+      return res.status(404).json({ error: 'Prediction not found' });
+    }
+    
+    const prediction = doc.data();
+    await ref.update({
+      confirmedDiagnosis: diagnosis,
+      confirmedBy: req.user.id,
+      confirmedByName: req.user.name,
+      confirmedAt: new Date().toISOString()
+    });
+    
+    // The same fields the prediction was made from, plus the outcome
+    const feedbackCase = {
+      symptoms: prediction.symptoms,
+      animal_type: prediction.animalType || 'Dog',
+      age: prediction.age || 3,
+      weight: prediction.weight || 20.0,
+      gender: prediction.gender || 'Male',
+      breed: prediction.breed || 'Mixed',
+      diagnosis,
+      prediction_id: predictionId,
+      confirmed_by: req.user.id
+    };
+    
+    const mlApiUrl = process.env.ML_API_URL || 'http://localhost:5002';
+    let feedback = null;
+    try {
+      // The ML API only takes feedback from this server (shared FEEDBACK_API_TOKEN)
+      const response = await axios.post(`${mlApiUrl}/feedback`, feedbackCase, {
+        timeout: 15000,
+        headers: { Authorization: `Bearer ${process.env.FEEDBACK_API_TOKEN || ''}` }
+      });
+      feedback = response.data;
+    } catch (err) {
+      // The confirmation is kept in Firestore even if the ML API is unreachable
+      console.error('Error sending feedback to ML API:', err.message);
+    }
+    
+    res.json({
+      prediction_id: predictionId,
+      diagnosis,
+      feedback_accepted: Boolean(feedback && feedback.accepted),
+      unknown_disease: Boolean(feedback && feedback.unknown_disease && feedback.unknown_disease.length)
+    });
+    
+  } catch (error) {
+    console.error('Error confirming diagnosis:', error.message);
+    res.status(500).json({ error: 'Failed to confirm diagnosis', details: error.message });
+  }
+});
+
 // Get user's disease prediction history
 app.get('/api/disease-predictions/:userId', (req, res) => {
   const userId = req.params.userId;
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Inference Pool Scaling Benchmark
+
+Scores the training CSV from several front-end threads, first in-process
+(every thread competes for the GIL) and then through InferencePool with 1,
+2, 4 and 8 inference processes, and reports rows/second.
+
+A heartbeat thread sleeps 1 ms in a loop meanwhile; how late it wakes up
+(p99 oversleep) shows how long other connections in the same worker would
+be stalled behind forest scoring.
+
+Usage:
+    python3 benchmark_pool.py [seconds per run] [rows per call] [process counts...]
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import os
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from feature_engine import encode_dataset, read_encoder_tables
+from forest_engine import FlatForest, forest_path
+from inference_pool import InferencePool
+
+MODEL_PATH = 'disease_model.pkl'
+CSV_PATH = 'animal_disease_prediction.csv'
+FRONT_END_THREADS = 8
+
+
+def run(score, X, seconds, rows_per_call):
+    """
+    Score from FRONT_END_THREADS threads for a fixed time
+
+    Args:
+        score (callable): score(X_chunk) -> probabilities
+        X (np.ndarray): Feature matrix to cycle through
+        seconds (float): Duration of the run
+        rows_per_call (int): Rows per score() call
+
+    Returns:
+        tuple: (rows per second, heartbeat p99 oversleep in ms)
+    """
+    stop = time.perf_counter() + seconds
+    counts = [0] * FRONT_END_THREADS
+    oversleep = []
+
+    def front_end(t):
+        start = (t * rows_per_call) % len(X)
+        while time.perf_counter() < stop:
+            chunk = X[start:start + rows_per_call]
+            score(chunk)
+            counts[t] += len(chunk)
+            start = (start + rows_per_call) % (len(X) - rows_per_call)
+
+    def heartbeat():
+        while time.perf_counter() < stop:
+            before = time.perf_counter()
+            time.sleep(0.001)
+            oversleep.append(time.perf_counter() - before - 0.001)
+
+    threads = [threading.Thread(target=front_end, args=(t,)) for t in range(FRONT_END_THREADS)]
+    threads.append(threading.Thread(target=heartbeat))
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts) / (time.perf_counter() - begin), float(np.percentile(oversleep, 99)) * 1e3
+
+
+def main():
+    """
+    Compare in-process scoring with the inference pool
+    """
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    rows_per_call = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    counts = [int(arg) for arg in sys.argv[3:]] or [1, 2, 4, 8]
+
+    tables = read_encoder_tables(MODEL_PATH)
+    X = encode_dataset(pd.read_csv(CSV_PATH), tables['encoders'], tables['feature_columns'])
+    forest = FlatForest.load(forest_path(MODEL_PATH))
+
+    print("🏭 INFERENCE POOL SCALING")
+    print("=" * 66)
+    print(f"CPUs: {os.cpu_count()}, front-end threads: {FRONT_END_THREADS}, rows per call: {rows_per_call}")
+    print(f"{'scoring':<22}{'rows/s':>14}{'speedup':>10}{'heartbeat p99 (ms)':>20}")
+    print("-" * 66)
+
+    baseline, stall = run(forest.predict_proba, X, seconds, rows_per_call)
+    print(f"{'in-process':<22}{baseline:>14.0f}{1.0:>9.2f}x{stall:>20.2f}")
+
+    for processes in counts:
+        pool = InferencePool(forest_path(MODEL_PATH), X.shape[1], forest.n_classes, processes=processes)
+        try:
+            pool.start()
+            pool.predict_proba(X[:1])  # Wait until the processes have loaded the forest
+            rate, stall = run(pool.predict_proba, X, seconds, rows_per_call)
+        finally:
+            pool.close()
+        print(f"{f'pool x{processes}':<22}{rate:>14.0f}{rate / baseline:>9.2f}x{stall:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
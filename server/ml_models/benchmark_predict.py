@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Single-Request Prediction Microbenchmark
+
+Compares the per-request cost of the ways to score one /predict request:
+
+    original   the APIPredictor.predict() this service started with: a one-row
+               DataFrame, LabelEncoder.transform per column, sklearn
+               predict_proba() and np.argsort, then the JSON-ready predictions
+    batch      preprocess_symptoms() + flattened forest predict_proba() + np.argsort
+    fast path  APIPredictor.predict(): per-thread buffers + predict_proba_row() + top_k
+               (scoring only, and the whole predict() with its response)
+
+For each it reports p50/p99 latency and the peak memory allocated per request
+as measured by tracemalloc.
+
+Usage:
+    python3 benchmark_predict.py [iterations] [--numpy]
+
+    --numpy  disable the optional Numba kernels (what production runs without numba)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import warnings
+warnings.filterwarnings('ignore')
+
+from api_predict import APIPredictor
+from feature_engine import CATEGORICAL_COLUMNS, SYMPTOM_MAPPING
+import forest_engine
+from forest_engine import top_k
+
+# Typical symptom-checker requests from the Node /api/predict-disease handler
+REQUESTS = [
+    {'symptoms': ['fever', 'vomiting', 'lethargy']},
+    {'symptoms': ['coughing', 'nasal discharge'], 'animal_type': 'Cat', 'age': 3, 'weight': 4.5, 'breed': 'Persian'},
+    {'symptoms': ['fever', 'vomiting', 'diarrhea', 'appetite loss'], 'age': 1, 'weight': 15.0},
+    {'symptoms': ['coughing', 'labored breathing', 'fever'], 'animal_type': 'Horse', 'age': 8, 'weight': 500.0}
+]
+
+
+def original_predict(predictor, symptoms, animal_type='Dog', age=3, weight=20.0, gender='Male',
+                     breed='Mixed', duration='3 days', heart_rate=120, temperature=39.0):
+    """
+    APIPredictor.predict() as it was before the feature engine and flattened forest
+
+    Args:
+        predictor (APIPredictor): Loaded predictor (its sklearn model and LabelEncoders are used)
+        symptoms (List[str]): Symptoms from the request
+        animal_type, age, weight, gender, breed, duration, heart_rate, temperature: Request fields
+
+    Returns:
+        dict: {'predictions': [...]} like APIPredictor.predict()
+    """
+    animal_data = {
+        'Animal_Type': animal_type,
+        'Breed': breed,
+        'Age': age,
+        'Gender': gender,
+        'Weight': weight,
+        'Duration': duration,
+        'Heart_Rate': heart_rate,
+        'Body_Temperature_Numeric': temperature
+    }
+
+    normalized_symptoms = [s.lower().strip() for s in symptoms]
+    mapped_symptoms = [SYMPTOM_MAPPING.get(s, s.title()) for s in normalized_symptoms[:4]]
+    while len(mapped_symptoms) < 4:
+        mapped_symptoms.append('No')
+    for i, mapped in enumerate(mapped_symptoms):
+        animal_data[f'Symptom_{i + 1}'] = mapped
+
+    binary_symptoms = {
+        'Appetite_Loss': 'appetite loss' in normalized_symptoms or 'lethargy' in normalized_symptoms,
+        'Vomiting': 'vomiting' in normalized_symptoms,
+        'Diarrhea': 'diarrhea' in normalized_symptoms,
+        'Coughing': 'coughing' in normalized_symptoms,
+        'Labored_Breathing': 'labored breathing' in normalized_symptoms,
+        'Lameness': 'lameness' in normalized_symptoms,
+        'Skin_Lesions': 'skin lesions' in normalized_symptoms,
+        'Nasal_Discharge': 'nasal discharge' in normalized_symptoms,
+        'Eye_Discharge': 'eye discharge' in normalized_symptoms
+    }
+    for symptom, present in binary_symptoms.items():
+        animal_data[symptom] = 'Yes' if present else 'No'
+
+    df = pd.DataFrame([animal_data])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and col in predictor.label_encoders:
+            le = predictor.label_encoders[col]
+            value = str(df[col].iloc[0])
+            df[col + '_encoded'] = le.transform([value]) if value in le.classes_ else 0
+
+    feature_vector = [df[feature].iloc[0] if feature in df.columns else 0 for feature in predictor.feature_columns]
+    X = np.array(feature_vector).reshape(1, -1)
+
+    probabilities = predictor.model.predict_proba(X)[0]
+    predictions = []
+    for idx in np.argsort(probabilities)[-3:][::-1]:
+        disease = predictor.target_encoder.classes_[idx]
+        severity_info = predictor.severity_data.get(disease, {})
+        predictions.append({
+            'disease': disease,
+            'confidence': f"{probabilities[idx]*100:.0f}%",
+            'severity': severity_info.get('severity', 'Unknown'),
+            'recommendation': severity_info.get('recommendation',
+                'Consult with a veterinarian for proper diagnosis and treatment.')
+        })
+    return {'predictions': predictions}
+
+
+def make_paths(predictor):
+    """
+    Build the callables being compared
+
+    Args:
+        predictor (APIPredictor): Loaded predictor
+
+    Returns:
+        list: (name, callable(request)) pairs
+    """
+    def original_path(request):
+        kwargs = dict(request)
+        return original_predict(predictor, kwargs.pop('symptoms'), **kwargs)
+
+    def batch_path(request):
+        kwargs = dict(request)
+        X = predictor.preprocess_symptoms(kwargs.pop('symptoms'), **kwargs)
+        probabilities = predictor.forest.predict_proba(X)[0]
+        return np.argsort(probabilities)[-3:][::-1]
+
+    def fast_path(request):
+        x = predictor.feature_engine.transform_one(request)
+        return top_k(predictor.forest.predict_proba_row(x), 3)
+
+    def fast_predict(request):
+        kwargs = dict(request)
+        return predictor.predict(kwargs.pop('symptoms'), **kwargs)
+
+    return [
+        ('original', original_path),
+        ('batch', batch_path),
+        ('fast path (scoring)', fast_path),
+        ('fast path (predict)', fast_predict)
+    ]
+
+
+def measure_latency(fn, iterations):
+    """
+    Per-call latency percentiles in microseconds
+
+    Args:
+        fn (callable): Function taking one request
+        iterations (int): Number of timed calls
+
+    Returns:
+        tuple: (p50, p99)
+    """
+    for request in REQUESTS:
+        fn(request)
+
+    timings = np.empty(iterations)
+    for i in range(iterations):
+        request = REQUESTS[i % len(REQUESTS)]
+        start = time.perf_counter_ns()
+        fn(request)
+        timings[i] = time.perf_counter_ns() - start
+
+    return np.percentile(timings, 50) / 1e3, np.percentile(timings, 99) / 1e3
+
+
+def measure_allocations(fn, iterations):
+    """
+    Average peak bytes allocated per call (tracemalloc)
+
+    Args:
+        fn (callable): Function taking one request
+        iterations (int): Number of traced calls
+
+    Returns:
+        float: Mean peak bytes per request
+    """
+    for request in REQUESTS:
+        fn(request)
+
+    tracemalloc.start()
+    peaks = []
+    for i in range(iterations):
+        request = REQUESTS[i % len(REQUESTS)]
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        fn(request)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+    tracemalloc.stop()
+
+    return float(np.mean(peaks))
+
+
+def main():
+    """
+    Run the benchmark and print a comparison table
+    """
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    iterations = int(args[0]) if args else 2000
+    if '--numpy' in sys.argv:
+        forest_engine.NUMBA_AVAILABLE = False
+
+    print("⏱️  SINGLE-REQUEST PREDICTION BENCHMARK")
+    print("=" * 72)
+    print(f"Forest kernels: {'Numba' if forest_engine.NUMBA_AVAILABLE else 'NumPy'}")
+
+    predictor = APIPredictor()
+    results = []
+    for name, fn in make_paths(predictor):
+        p50, p99 = measure_latency(fn, iterations)
+        peak = measure_allocations(fn, max(iterations // 10, 50))
+        results.append((name, p50, p99, peak))
+
+    print(f"{'path':<22}{'p50 (µs)':>12}{'p99 (µs)':>12}{'peak alloc/request':>22}")
+    print("-" * 72)
+    for name, p50, p99, peak in results:
+        print(f"{name:<22}{p50:>12.1f}{p99:>12.1f}{peak / 1024:>19.1f} KiB")
+
+    baseline = results[0]
+    for name, p50, p99, peak in results[1:]:
+        print(f"📈 {name}: {baseline[1] / p50:.1f}x faster p50, "
+              f"{baseline[2] / p99:.1f}x faster p99, "
+              f"{peak / baseline[3]:.2f}x the per-request allocation of {baseline[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+API Cold-Start Benchmark
+
+Measures how long a fresh flask_api.py process takes to import, load the
+model and answer its first prediction, with the model loaded from:
+
+    full   disease_model.pkl via joblib (imports sklearn, unpickles the forest)
+    lean   lean_predictor artifacts (flattened forest + encoder tables, NumPy only)
+
+Each run is a new interpreter started with -X importtime, so the report
+also shows where import time goes and whether pandas/sklearn were loaded.
+Run `python3 lean_predictor.py` first so the lean artifacts exist.
+
+Usage:
+    python3 benchmark_startup.py [runs] [--numpy]
+
+    --numpy  block the optional numba import (production does not install numba)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the child interpreter; prints one JSON line of timings
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import flask_api
+imported = time.perf_counter()
+predictor = flask_api.get_predictor()
+loaded = time.perf_counter()
+predictor.predict_uncached(['coughing', 'fever'], animal_type='Cat')
+first = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'load': loaded - imported,
+    'first_predict': first - loaded,
+    'load_mode': predictor.load_mode,
+    'pandas': 'pandas' in sys.modules,
+    'sklearn': 'sklearn' in sys.modules
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Total import time and the slowest top-level imports from -X importtime output
+
+    Args:
+        stderr (str): Child stderr
+
+    Returns:
+        tuple: (total seconds, {top-level module: cumulative seconds})
+    """
+    total_us = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        # Top-level imports have a single space of indentation
+        if name.startswith(' ') and not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative_us) / 1e6
+    return total_us / 1e6, top_level
+
+
+def run_once(mode, block_numba=False):
+    """
+    Start one cold API process
+
+    Args:
+        mode (str): 'full' or 'lean'
+        block_numba (bool): Make `import numba` fail in the child
+
+    Returns:
+        dict: Timings from the child plus process wall clock and import totals
+    """
+    env = dict(os.environ, MODEL_EAGER_LOAD='0', MODEL_LEAN_LOAD='1' if mode == 'lean' else '0',
+               PREDICTION_CACHE_ENTRIES='0')
+    start = time.perf_counter()
+    script = ("import sys; sys.modules['numba'] = None\n" if block_numba else '') + CHILD_SCRIPT
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                          cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['wall'] = wall
+    result['import_total'], result['top_level'] = parse_importtime(proc.stderr)
+    if result['load_mode'] != mode:
+        raise RuntimeError(f"Asked for a {mode} load but the API loaded {result['load_mode']}")
+    return result
+
+
+def main():
+    """
+    Compare full and lean cold starts and print the medians
+    """
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    runs = int(args[0]) if args else 5
+    block_numba = '--numpy' in sys.argv
+
+    print("🥶 API COLD-START BENCHMARK")
+    print("=" * 90)
+    print(f"Forest kernels: {'NumPy' if block_numba else 'Numba if installed'}")
+
+    results = {}
+    for mode in ('full', 'lean'):
+        run_once(mode, block_numba)  # Prime the OS page cache so both modes read warm files
+        results[mode] = [run_once(mode, block_numba) for _ in range(runs)]
+
+    columns = ['import', 'load', 'first_predict', 'import_total', 'wall']
+    print(f"{'mode':<6}" + ''.join(f"{c + ' (s)':>18}" for c in columns) + f"{'pandas/sklearn':>17}")
+    print("-" * 90)
+    medians = {}
+    for mode, rows in results.items():
+        medians[mode] = {c: float(np.median([r[c] for r in rows])) for c in columns}
+        heavy = f"{rows[0]['pandas']}/{rows[0]['sklearn']}"
+        print(f"{mode:<6}" + ''.join(f"{medians[mode][c]:>18.3f}" for c in columns) + f"{heavy:>17}")
+
+    for mode, rows in results.items():
+        slowest = sorted(rows[0]['top_level'].items(), key=lambda item: -item[1])[:6]
+        print(f"\n📦 {mode}: slowest top-level imports")
+        for name, seconds in slowest:
+            print(f"   {name:<30}{seconds * 1e3:>10.1f} ms")
+
+    full, lean = medians['full'], medians['lean']
+    print(f"\n📉 Process wall clock {full['wall']:.2f}s -> {lean['wall']:.2f}s "
+          f"({(1 - lean['wall'] / full['wall']) * 100:.0f}% faster cold start), "
+          f"import + load {full['import'] + full['load']:.2f}s -> {lean['import'] + lean['load']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Gunicorn Worker Memory Benchmark
+
+Starts the API under gunicorn with 1, 2, 4 and 8 workers in two modes and
+reports the memory of the whole process tree (master + workers):
+
+    per-worker  every worker imports the app and loads disease_model.pkl itself
+                (today's behaviour once each worker has served a request)
+    shared      gunicorn.conf.py: preload in the master, gc.freeze(), fork;
+                forest arrays memory-mapped from disease_model_forest/
+
+RSS counts shared pages once per process, so the table also shows PSS
+(shared pages split between the processes that map them), which is what
+actually adds up on the host, and USS (pages private to each process).
+Reads /proc/<pid>/smaps_rollup, so it needs Linux.
+
+Usage:
+    python3 benchmark_workers.py [worker counts...]
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Each worker loads the model itself right after it boots
+PER_WORKER_CONFIG = '''
+import os
+bind = f"127.0.0.1:{os.environ['PORT']}"
+workers = int(os.environ['WEB_CONCURRENCY'])
+preload_app = False
+
+def post_worker_init(worker):
+    import flask_api
+    flask_api.get_predictor()
+    worker.log.info("Worker model loaded")
+'''
+
+
+def free_port():
+    """Pick an unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def memory_kb(pid):
+    """
+    Rss/Pss/USS of one process in kB
+
+    Args:
+        pid (int): Process id
+
+    Returns:
+        dict: {'rss', 'pss', 'uss'}
+    """
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':'):
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def children(pid):
+    """Direct child pids of a process"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_for_log(log_path, text, count, timeout=120):
+    """Wait until text appears count times in the gunicorn log"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with open(log_path) as f:
+            if f.read().count(text) >= count:
+                return True
+        time.sleep(0.2)
+    return False
+
+
+def measure(mode, n_workers):
+    """
+    Run gunicorn in one mode and return the summed memory of master + workers
+
+    Args:
+        mode (str): 'per-worker' or 'shared'
+        n_workers (int): Worker count
+
+    Returns:
+        dict: Totals in MB plus the process count
+    """
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(n_workers))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == 'shared':
+            config = os.path.join(HERE, 'gunicorn.conf.py')
+            ready_text, ready_count = 'Booting worker', n_workers
+        else:
+            config = os.path.join(tmp, 'per_worker.conf.py')
+            with open(config, 'w') as f:
+                f.write(PER_WORKER_CONFIG)
+            ready_text, ready_count = 'Worker model loaded', n_workers
+
+        log_path = os.path.join(tmp, 'gunicorn.log')
+        with open(log_path, 'w') as log:
+            proc = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', config, '-b', f'127.0.0.1:{port}',
+                 '--error-logfile', '-', 'flask_api:app'],
+                cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+        try:
+            if not wait_for_log(log_path, ready_text, ready_count):
+                raise RuntimeError(f"gunicorn did not become ready ({mode}, {n_workers} workers)")
+            time.sleep(1.0)
+
+            # Exercise every worker a little so scoring pages are touched
+            body = json.dumps({'symptoms': ['fever', 'vomiting', 'lethargy']}).encode('utf-8')
+            for _ in range(4 * n_workers):
+                req = urllib.request.Request(f'http://127.0.0.1:{port}/predict', data=body,
+                                             headers={'Content-Type': 'application/json'})
+                urllib.request.urlopen(req, timeout=30).read()
+
+            pids = [proc.pid] + children(proc.pid)
+            totals = {'rss': 0, 'pss': 0, 'uss': 0}
+            for pid in pids:
+                for key, value in memory_kb(pid).items():
+                    totals[key] += value
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    result = {key: value / 1024 for key, value in totals.items()}
+    result['processes'] = len(pids)
+    return result
+
+
+def main():
+    """
+    Measure both modes for each worker count and print a comparison
+    """
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]
+
+    print("🧠 GUNICORN WORKER MEMORY (master + workers)")
+    print("=" * 78)
+    print(f"{'workers':>7}  {'mode':<11}{'RSS (MB)':>12}{'PSS (MB)':>12}{'USS (MB)':>12}{'PSS/worker':>14}")
+    print("-" * 78)
+
+    for n_workers in counts:
+        rows = {}
+        for mode in ('per-worker', 'shared'):
+            rows[mode] = measure(mode, n_workers)
+            r = rows[mode]
+            print(f"{n_workers:>7}  {mode:<11}{r['rss']:>12.1f}{r['pss']:>12.1f}{r['uss']:>12.1f}"
+                  f"{r['pss'] / n_workers:>14.1f}")
+        saved = rows['per-worker']['pss'] - rows['shared']['pss']
+        print(f"{'':>7}  📉 shared saves {saved:.1f} MB PSS "
+              f"({saved / rows['per-worker']['pss'] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+Offline Bulk Scoring
+
+Scores large files of historical cases with the disease model: the input is
+read in fixed-size chunks, the chunks are fanned out over a process pool,
+and the top-k predictions (disease, probability, severity, urgency) are
+written to CSV or Parquet in input order.
+
+Two input shapes are recognized from the column names:
+
+    training rows   columns of animal_disease_prediction.csv (Symptom_1-4,
+                    Appetite_Loss, ...), encoded like the training set
+    request rows    a 'symptoms' column (JSON list or comma-separated) plus
+                    optional animal_type/animalType, age, weight, gender,
+                    breed, ... as exported from disease_predictions
+
+The model is loaded once in the parent before the pool is forked, so the
+workers share it (the flattened forest is memory-mapped, so its pages are
+shared through the page cache in any case). Only the lean artifacts are
+needed; without them the pickle is loaded instead.
+
+After every chunk the output is flushed and a checkpoint
+(<output>.checkpoint.json) records how far the file got. Running the same
+command again resumes from there; --restart starts over. Ctrl-C stops after
+the chunks in flight are written (press it again to abort immediately). Parquet output is
+written as one part file per chunk next to the output and combined at the
+end, so an interrupted run never leaves a half-written Parquet file.
+
+Empty cells in training rows are filled with the values the model was
+trained with. A row that still cannot be featurized (e.g. age 'abc') is
+written without predictions and with the reason in the error column.
+
+Usage:
+    python3 bulk_score.py cases.csv predictions.csv
+    python3 bulk_score.py cases.parquet predictions.parquet --processes 4 --top-k 3
+    python3 bulk_score.py cases.csv predictions.csv --keep id,Disease_Prediction
+
+Parquet input/output needs pyarrow (pip install pyarrow).
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import (encode_dataset, load_encoder_tables, CATEGORICAL_FIELDS, DEFAULT_REQUEST,
+                            NUMERICAL_FIELDS)
+from forest_engine import top_k_rows, load_forest
+from lean_predictor import LeanArtifactError, LeanModel, load_lean_model
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(HERE, 'disease_model.pkl')
+DEFAULT_SEVERITY_PATH = os.path.join(HERE, 'severity_mapping.json')
+
+# Request-row column -> FeatureEngine request field
+REQUEST_COLUMNS = {
+    'animal_type': 'animal_type', 'animalType': 'animal_type',
+    'age': 'age', 'weight': 'weight', 'gender': 'gender', 'breed': 'breed',
+    'duration': 'duration', 'heart_rate': 'heart_rate', 'heartRate': 'heart_rate',
+    'temperature': 'temperature'
+}
+
+# Bump when the checkpoint or output layout changes
+CHECKPOINT_VERSION = 2
+
+# Set in the parent before the pool forks (or by _init_worker under spawn)
+_MODEL = None
+_SEVERITY = None
+
+
+def load_scoring_model(model_path: str) -> LeanModel:
+    """
+    Load the model from the lean artifacts, falling back to the pickle
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        LeanModel: Model with feature engine, forest and class list
+    """
+    try:
+        return load_lean_model(model_path)
+    except LeanArtifactError as e:
+        print(f"⚠️  Lean model unavailable ({e}), loading {os.path.basename(model_path)}")
+
+    import joblib
+
+    package = joblib.load(model_path)
+    forest = load_forest(model_path, package)
+    tables = load_encoder_tables(model_path, package)
+    model = LeanModel(forest, tables, package['feature_columns'], package.get('training_date'),
+                      fill_values=package.get('fill_values'))
+    model.classes = [str(c) for c in package['target_encoder'].classes_]
+    return model
+
+
+def training_fill_values(model: LeanModel) -> Dict[str, Any]:
+    """
+    Values for empty cells in training-shaped rows
+
+    Models saved before fill values were recorded fall back to the API
+    defaults for requests that leave a field out.
+
+    Args:
+        model (LeanModel): Loaded scoring model
+
+    Returns:
+        dict: Raw column -> fill value
+    """
+    if model.fill_values:
+        return model.fill_values
+    fill_values = {col: DEFAULT_REQUEST[field] for col, field in CATEGORICAL_FIELDS.items()}
+    fill_values.update({col: DEFAULT_REQUEST[field] for col, field in NUMERICAL_FIELDS.items()
+                        if col in model.feature_columns and col != 'Body_Temperature_Numeric'})
+    return fill_values
+
+
+def _init_worker(model_path: str, severity_path: str):
+    """Load the model and severity mapping unless inherited from the parent"""
+    global _MODEL, _SEVERITY
+    if _MODEL is None:
+        _MODEL = load_scoring_model(model_path)
+        if not _MODEL.fill_values:
+            print("⚠️  Model has no saved training fill values; empty cells use the API defaults")
+    if _SEVERITY is None:
+        with open(severity_path, 'r', encoding='utf-8') as f:
+            _SEVERITY = json.load(f)
+
+
+def _init_pool_worker(model_path: str, severity_path: str):
+    """Pool initializer: Ctrl-C is handled by the parent, which drains the pool cleanly"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(model_path, severity_path)
+
+
+def parse_symptoms(value) -> List[str]:
+    """
+    Symptom list from an exported cell: JSON list, comma-separated string or list
+
+    Args:
+        value: Raw cell value
+
+    Returns:
+        List[str]: Symptoms (empty when the cell is empty)
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(s) for s in value]
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return []
+    text = str(value).strip()
+    if text.startswith('['):
+        try:
+            return [str(s) for s in json.loads(text)]
+        except ValueError:
+            pass
+    return [s for s in (part.strip() for part in text.strip('[]').split(',')) if s]
+
+
+def request_rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Turn request-shaped rows into FeatureEngine requests
+
+    Args:
+        df (pd.DataFrame): Chunk with a 'symptoms' column
+
+    Returns:
+        List[dict]: One request per row (missing values use the API defaults)
+    """
+    columns = [(col, field) for col, field in REQUEST_COLUMNS.items() if col in df.columns]
+    requests = []
+    for record in df.to_dict('records'):
+        request = {'symptoms': parse_symptoms(record['symptoms'])}
+        for col, field in columns:
+            value = record[col]
+            if value is not None and not (isinstance(value, float) and math.isnan(value)):
+                request[field] = value
+        requests.append(request)
+    return requests
+
+
+def input_kind(columns) -> str:
+    """
+    Detect the input shape from its column names
+
+    Args:
+        columns: Column names of the first chunk
+
+    Returns:
+        str: 'training' or 'request'
+
+    Raises:
+        ValueError: When neither shape matches
+    """
+    if 'Symptom_1' in columns:
+        return 'training'
+    if 'symptoms' in columns:
+        return 'request'
+    raise ValueError("Input needs either the training columns (Symptom_1, ...) or a 'symptoms' column")
+
+
+def featurize(df: pd.DataFrame, kind: str, model: LeanModel):
+    """
+    Feature matrix for a chunk, with a message for every row that could not be featurized
+
+    Args:
+        df (pd.DataFrame): Chunk of input rows
+        kind (str): 'training' or 'request'
+        model (LeanModel): Loaded scoring model
+
+    Returns:
+        tuple: (feature matrix, per-row error message or None); failed rows are all zeros
+    """
+    errors = [None] * len(df)
+
+    if kind == 'request':
+        X = np.zeros((len(df), model.feature_engine.n_features), dtype=np.float64)
+        for i, request in enumerate(request_rows(df)):
+            try:
+                model.feature_engine.fill_row(request, X[i])
+            except (ValueError, TypeError) as e:
+                X[i] = 0.0
+                errors[i] = str(e)
+        return X, errors
+
+    fill_values = training_fill_values(model)
+    try:
+        return encode_dataset(df, model.encoder_tables, model.feature_columns, fill_values), errors
+    except (ValueError, TypeError):
+        pass
+
+    # Some cell in the chunk is unusable: encode row by row to find out which
+    X = np.zeros((len(df), len(model.feature_columns)), dtype=np.float64)
+    for i in range(len(df)):
+        try:
+            X[i] = encode_dataset(df.iloc[i:i + 1], model.encoder_tables, model.feature_columns, fill_values)[0]
+        except (ValueError, TypeError) as e:
+            errors[i] = str(e)
+    return X, errors
+
+
+def score_chunk(task) -> pd.DataFrame:
+    """
+    Score one chunk of input rows (runs in a pool worker)
+
+    Rows that cannot be featurized (e.g. age 'abc') get empty predictions and
+    the reason in the error column; the rest of the chunk is scored as usual.
+
+    Args:
+        task (tuple): (first row number, chunk DataFrame, input kind, top_k, columns to keep)
+
+    Returns:
+        pd.DataFrame: row, kept columns, disease/probability/severity/urgency per rank, then error
+    """
+    start, df, kind, k, keep = task
+    model = _MODEL
+
+    X, errors = featurize(df, kind, model)
+    failed = np.array([error is not None for error in errors], dtype=bool)
+    probabilities = model.forest.predict_proba(X)
+    top = top_k_rows(probabilities, k)
+
+    classes = np.array(model.classes, dtype=object)
+    severity = np.array([_SEVERITY.get(c, {}).get('severity', 'Unknown') for c in model.classes], dtype=object)
+    urgency = np.array([_SEVERITY.get(c, {}).get('urgency', 'Unknown') for c in model.classes], dtype=object)
+
+    out = {'row': np.arange(start, start + len(df))}
+    for col in keep:
+        out[col] = df[col].to_numpy()
+    for rank in range(top.shape[1]):
+        idx = top[:, rank]
+        out[f'disease_{rank + 1}'] = np.where(failed, None, classes[idx])
+        out[f'probability_{rank + 1}'] = np.where(failed, np.nan,
+                                                  np.round(probabilities[np.arange(len(idx)), idx], 4))
+        out[f'severity_{rank + 1}'] = np.where(failed, None, severity[idx])
+        out[f'urgency_{rank + 1}'] = np.where(failed, None, urgency[idx])
+    out['error'] = np.array(errors, dtype=object)
+    return pd.DataFrame(out)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ Parquet files need pyarrow: pip install pyarrow")
+    return pq
+
+
+def file_format(path: str, override: Optional[str] = None) -> str:
+    """
+    'csv' or 'parquet' from an explicit choice or the file extension
+
+    Args:
+        path (str): File path
+        override (str): Explicit format, if given
+
+    Returns:
+        str: File format
+    """
+    if override:
+        return override
+    return 'parquet' if path.lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def read_chunks(path: str, fmt: str, chunk_size: int, skip_chunks: int, rows_done: int):
+    """
+    Yield input chunks as DataFrames, skipping the ones already scored
+
+    Args:
+        path (str): Input file
+        fmt (str): 'csv' or 'parquet'
+        chunk_size (int): Rows per chunk
+        skip_chunks (int): Chunks finished by an earlier run
+        rows_done (int): Rows in those chunks
+
+    Yields:
+        pd.DataFrame: Next chunk
+    """
+    if fmt == 'parquet':
+        pq = _require_pyarrow()
+        # Batch boundaries are deterministic for a given batch size, so skip by count
+        for i, batch in enumerate(pq.ParquetFile(path).iter_batches(batch_size=chunk_size)):
+            if i >= skip_chunks:
+                yield batch.to_pandas()
+        return
+
+    skiprows = (lambda i: 0 < i <= rows_done) if rows_done else None
+    yield from pd.read_csv(path, chunksize=chunk_size, skiprows=skiprows)
+
+
+def checkpoint_path(output: str) -> str:
+    return output + '.checkpoint.json'
+
+
+def parts_dir(output: str) -> str:
+    return output + '.parts'
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    """Write the checkpoint atomically so a crash never leaves it half-written"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def run_identity(args, model: LeanModel, in_fmt: str, out_fmt: str) -> Dict[str, Any]:
+    """Everything a checkpoint must match for a run to resume from it"""
+    stat = os.stat(args.input)
+    return {
+        'version': CHECKPOINT_VERSION,
+        'input': os.path.abspath(args.input),
+        'input_size': stat.st_size,
+        'input_mtime': stat.st_mtime,
+        'input_format': in_fmt,
+        'output_format': out_fmt,
+        'training_date': model.training_date,
+        'chunk_size': args.chunk_size,
+        'top_k': args.top_k,
+        'keep': args.keep
+    }
+
+
+class OutputWriter:
+    """
+    Appends scored chunks to CSV or Parquet output and reports the resume position
+    """
+
+    def __init__(self, output: str, fmt: str, resume: Optional[Dict[str, Any]]):
+        self.output = output
+        self.fmt = fmt
+        if fmt == 'parquet':
+            _require_pyarrow()
+            os.makedirs(parts_dir(output), exist_ok=True)
+            self.file = None
+        else:
+            if resume and not os.path.exists(output):
+                raise SystemExit(f"❌ {output} is missing; rerun with --restart to start over")
+            # Drop anything written after the last checkpoint
+            offset = resume['output_bytes'] if resume else 0
+            self.file = open(output, 'r+b' if resume else 'wb')
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write(self, index: int, df: pd.DataFrame) -> int:
+        """
+        Durably write chunk number `index`
+
+        Returns:
+            int: Bytes of CSV output so far (0 for Parquet)
+        """
+        if self.fmt == 'parquet':
+            part = os.path.join(parts_dir(self.output), f'part-{index:06d}.parquet')
+            df.to_parquet(part + '.tmp', index=False)
+            os.replace(part + '.tmp', part)
+            return 0
+
+        self.file.write(df.to_csv(index=False, header=self.file.tell() == 0).encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def finish(self, n_chunks: int):
+        """Close the CSV, or combine the Parquet parts into the output file"""
+        if self.fmt != 'parquet':
+            self.file.close()
+            return
+
+        import pyarrow.parquet as pq
+
+        parts = [os.path.join(parts_dir(self.output), f'part-{i:06d}.parquet') for i in range(n_chunks)]
+        writer = None
+        try:
+            for part in parts:
+                table = pq.read_table(part)
+                if writer is None:
+                    writer = pq.ParquetWriter(self.output + '.tmp', table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            os.replace(self.output + '.tmp', self.output)
+        shutil.rmtree(parts_dir(self.output), ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of cases with the disease model")
+    parser.add_argument('input', help="CSV or Parquet file of cases")
+    parser.add_argument('output', help="CSV or Parquet file for the predictions")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Path to disease_model.pkl")
+    parser.add_argument('--severity', default=DEFAULT_SEVERITY_PATH, help="Path to severity_mapping.json")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes (default: all cores; 1 scores in this process)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per chunk (default 10000)")
+    parser.add_argument('--top-k', type=int, default=3, help="Predictions per row (default 3)")
+    parser.add_argument('--keep', default='', help="Comma-separated input columns to copy to the output")
+    parser.add_argument('--input-format', choices=['csv', 'parquet'], help="Override the input extension")
+    parser.add_argument('--output-format', choices=['csv', 'parquet'], help="Override the output extension")
+    parser.add_argument('--restart', action='store_true', help="Ignore any checkpoint and start over")
+    args = parser.parse_args(argv)
+    args.keep = [col.strip() for col in args.keep.split(',') if col.strip()]
+    args.chunk_size = max(args.chunk_size, 1)
+    args.processes = max(args.processes, 1)
+    return args
+
+
+def main(argv=None):
+    """
+    Score an input file chunk by chunk, resuming from a checkpoint when one matches
+    """
+    global _MODEL, _SEVERITY
+    args = parse_args(argv)
+    in_fmt = file_format(args.input, args.input_format)
+    out_fmt = file_format(args.output, args.output_format)
+
+    print("📦 BULK DISEASE SCORING")
+    print("=" * 50)
+
+    _init_worker(args.model, args.severity)
+    identity = run_identity(args, _MODEL, in_fmt, out_fmt)
+
+    ckpt_path = checkpoint_path(args.output)
+    resume = None
+    if os.path.exists(ckpt_path) and not args.restart:
+        with open(ckpt_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if {key: saved.get(key) for key in identity} != identity:
+            raise SystemExit(f"❌ {ckpt_path} belongs to a different input, model or settings; "
+                             f"rerun with --restart to start over")
+        resume = saved
+        print(f"↩️  Resuming after {saved['chunks_done']} chunks ({saved['rows_done']:,} rows)")
+    elif args.restart:
+        shutil.rmtree(parts_dir(args.output), ignore_errors=True)
+
+    state = dict(identity, chunks_done=0, rows_done=0, output_bytes=0)
+    if resume:
+        state.update(chunks_done=resume['chunks_done'], rows_done=resume['rows_done'],
+                     output_bytes=resume.get('output_bytes', 0))
+
+    print(f"Input:  {args.input} ({in_fmt})")
+    print(f"Output: {args.output} ({out_fmt}), top {args.top_k}")
+    print(f"Chunks of {args.chunk_size:,} rows on {args.processes} process(es)")
+
+    writer = OutputWriter(args.output, out_fmt, resume)
+    chunks = read_chunks(args.input, in_fmt, args.chunk_size, state['chunks_done'], state['rows_done'])
+
+    pool = None
+    if args.processes > 1:
+        # Fork shares the already-loaded model; spawn platforms load it in _init_worker
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        pool = ctx.Pool(args.processes, initializer=_init_pool_worker, initargs=(args.model, args.severity))
+
+    started = time.perf_counter()
+    scored = 0
+    failed = 0
+    last_report = started
+    kind = None
+    next_row = state['rows_done']
+    pending = deque()
+    stopping = []
+
+    def request_stop(signum, frame):
+        if stopping:
+            raise KeyboardInterrupt
+        stopping.append(signum)
+        print("\n⏸️  Stopping after the chunks in flight (Ctrl-C again to abort)")
+
+    def commit(result):
+        nonlocal scored, failed, last_report
+        state['output_bytes'] = writer.write(state['chunks_done'], result)
+        state['chunks_done'] += 1
+        state['rows_done'] += len(result)
+        save_checkpoint(ckpt_path, state)
+
+        scored += len(result)
+        failed += int(result['error'].notna().sum())
+        now = time.perf_counter()
+        if now - last_report >= 5:
+            print(f"   {state['rows_done']:>12,} rows  {scored / (now - started):>10,.0f} rows/s")
+            last_report = now
+
+    signal.signal(signal.SIGINT, request_stop)
+    try:
+        for df in chunks:
+            if stopping:
+                break
+            if kind is None:
+                kind = input_kind(df.columns)
+                missing = [col for col in args.keep if col not in df.columns]
+                if missing:
+                    raise SystemExit(f"❌ --keep columns not in input: {', '.join(missing)}")
+            task = (next_row, df, kind, args.top_k, args.keep)
+            next_row += len(df)
+
+            if pool is None:
+                commit(score_chunk(task))
+                continue
+
+            # Keep a bounded number of chunks in flight so memory stays flat
+            pending.append(pool.apply_async(score_chunk, (task,)))
+            if len(pending) >= 2 * args.processes:
+                commit(pending.popleft().get())
+
+        while pending:
+            commit(pending.popleft().get())
+    except KeyboardInterrupt:
+        stopping.append(signal.SIGINT)
+    finally:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if stopping:
+        print(f"⏸️  Stopped after {state['rows_done']:,} rows; rerun the same command to resume")
+        sys.exit(130)
+
+    writer.finish(state['chunks_done'])
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+
+    elapsed = time.perf_counter() - started
+    rate = scored / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Scored {scored:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s), "
+          f"{state['rows_done']:,} rows total -> {args.output}")
+    if failed:
+        print(f"⚠️  {failed:,} rows could not be scored; see the error column")
+
+
+if __name__ == "__main__":
+    main()
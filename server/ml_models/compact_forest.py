@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Compact Forest Format
+
+FlatForest keeps sklearn's widths: float64 thresholds, 64-bit node indices
+and a dense float64 class vector per leaf. Leaves dominate the size (52
+classes per leaf, ~2 of them non-zero on average), so CompactForest stores:
+
+    feature     smallest signed int holding the feature count
+    threshold   float32, rounded down: features are float32, and for a float32
+                x, x <= t exactly when x <= (largest float32 <= t), so every
+                split decision is unchanged
+    left/right  int16 (int32 for forests above 32767 nodes), global node indices
+    leaf_id     same width as the leaf count needs
+    leaf_class  (n_leaves, K) class of each non-zero entry (K = most non-zero
+                classes in any leaf; shorter leaves are padded with classes
+                they do not contain)
+    leaf_code   (n_leaves, K) index into codebook (code 0 = 0.0)
+    codebook    distinct leaf probabilities; exact (uint8 codes) when there
+                are at most 255 of them, otherwise rounded to 1/65535 (uint16)
+
+CompactForest is a FlatForest subclass and scores straight from these
+arrays (memory-mapped, NumPy or Numba), so it drops in wherever the
+predictor uses a FlatForest. Anytime evaluation runs on the NumPy path.
+
+Usage:
+    python3 compact_forest.py [disease_model.pkl] [animal_disease_prediction.csv]
+
+    Exports disease_model_compact/ and prints bytes per tree (sklearn, flat,
+    compact) and the largest probability deviation from the sklearn model.
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import os
+import sys
+import threading
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+import forest_engine
+from forest_engine import NUMBA_AVAILABLE, FlatForest, forest_path, load_forest
+
+# Rounding step when the leaf probabilities do not fit a 255-entry codebook
+QUANTIZATION_LEVELS = 65535
+
+if NUMBA_AVAILABLE:
+    numba = forest_engine.numba
+
+    @numba.njit(nogil=True, cache=True)
+    def _walk_compact_numba(X, roots, feature, threshold, left, right, leaf_id,
+                            leaf_class, leaf_code, codebook, out):
+        n_rows = X.shape[0]
+        n_trees = roots.shape[0]
+        width = leaf_class.shape[1]
+        for i in range(n_rows):
+            for t in range(n_trees):
+                node = roots[t]
+                while left[node] != node:
+                    if X[i, feature[node]] <= threshold[node]:
+                        node = left[node]
+                    else:
+                        node = right[node]
+                leaf = leaf_id[node]
+                for k in range(width):
+                    out[i, leaf_class[leaf, k]] += codebook[leaf_code[leaf, k]]
+            for c in range(out.shape[1]):
+                out[i, c] /= n_trees
+        return out
+
+
+class CompactForestError(Exception):
+    """The compact forest is missing, unreadable or belongs to another model"""
+
+
+def compact_forest_path(model_path: str) -> str:
+    """
+    Location of the compact forest saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        str: Directory path (disease_model_compact/)
+    """
+    return os.path.splitext(model_path)[0] + '_compact'
+
+
+def smallest_int(low: int, high: int, minimum=np.int8) -> np.dtype:
+    """
+    Narrowest signed integer dtype holding [low, high]
+
+    Args:
+        low (int): Smallest value to store
+        high (int): Largest value to store
+        minimum (np.dtype): Narrowest dtype to consider
+
+    Returns:
+        np.dtype: int8, int16, int32 or int64
+    """
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.dtype(dtype).itemsize < np.dtype(minimum).itemsize:
+            continue
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(f"No integer dtype holds [{low}, {high}]")
+
+
+def round_down_float32(values: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 not above each value (keeps x <= t decisions for float32 x)
+
+    Args:
+        values (np.ndarray): float64 thresholds
+
+    Returns:
+        np.ndarray: float32 thresholds
+    """
+    rounded = np.asarray(values, dtype=np.float64).astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def encode_leaves(leaf_value: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sparse (ELL) + codebook encoding of dense leaf distributions
+
+    Args:
+        leaf_value (np.ndarray): (n_leaves, n_classes) class distributions
+
+    Returns:
+        tuple: (leaf_class, leaf_code, codebook)
+    """
+    leaf_value = np.asarray(leaf_value, dtype=np.float64)
+    n_classes = leaf_value.shape[1]
+    nonzero = leaf_value > 0
+    width = max(int(nonzero.sum(axis=1).max()), 1)
+
+    # Non-zero classes first (in class order), then the leaf's zero classes as padding
+    leaf_class = np.argsort(~nonzero, axis=1, kind='stable')[:, :width]
+    entries = np.take_along_axis(leaf_value, leaf_class, axis=1)
+
+    codebook = np.unique(entries[entries > 0])
+    if len(codebook) >= 256:
+        entries = np.round(entries * QUANTIZATION_LEVELS) / QUANTIZATION_LEVELS
+        codebook = np.unique(entries[entries > 0])
+    codebook = np.concatenate(([0.0], codebook))
+    code_dtype = np.uint8 if len(codebook) <= 256 else np.uint16
+    leaf_code = np.searchsorted(codebook, entries).astype(code_dtype)
+
+    class_dtype = np.uint8 if n_classes <= 256 else np.uint16
+    return leaf_class.astype(class_dtype), leaf_code, codebook
+
+
+class CompactForest(FlatForest):
+    """
+    FlatForest with narrow node arrays and sparse, codebook-encoded leaves
+    """
+
+    ARRAY_NAMES = ['roots', 'feature', 'threshold', 'left', 'right', 'leaf_id',
+                   'leaf_class', 'leaf_code', 'codebook']
+
+    def __init__(self, roots, feature, threshold, left, right, leaf_id, leaf_class, leaf_code,
+                 codebook, max_depth, n_classes, classes=None, training_date=None):
+        """
+        Wrap already-compacted forest arrays (dtypes are kept as given)
+
+        Args:
+            roots, feature, threshold, left, right, leaf_id: Node arrays
+            leaf_class, leaf_code, codebook: Sparse leaf distributions
+            max_depth (int): Deepest tree depth (lockstep iteration count)
+            n_classes (int): Number of classes
+            classes (list): Disease names in probability column order
+            training_date (str): Training date of the source model package
+        """
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.feature = np.ascontiguousarray(feature)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float32)
+        self.left = np.ascontiguousarray(left)
+        self.right = np.ascontiguousarray(right)
+        self.leaf_id = np.ascontiguousarray(leaf_id)
+        self.leaf_class = np.ascontiguousarray(leaf_class)
+        self.leaf_code = np.ascontiguousarray(leaf_code)
+        self.codebook = np.ascontiguousarray(codebook, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.classes = list(classes) if classes is not None else None
+        self.training_date = training_date
+
+        self.n_trees = len(self.roots)
+        self.n_classes = int(n_classes)
+
+        self._scratch = threading.local()
+        self._anytime_thresholds = {}
+        self._subsets = {}
+
+    @classmethod
+    def from_flat(cls, forest: FlatForest) -> 'CompactForest':
+        """
+        Compact a FlatForest
+
+        Args:
+            forest (FlatForest): Forest to compact
+
+        Returns:
+            CompactForest: Same trees in the compact format
+        """
+        n_nodes = len(forest.left)
+        node_dtype = smallest_int(0, n_nodes - 1, minimum=np.int16)
+        leaf_class, leaf_code, codebook = encode_leaves(forest.leaf_value)
+        return cls(forest.roots,
+                   np.asarray(forest.feature).astype(smallest_int(0, int(forest.feature.max()))),
+                   round_down_float32(forest.threshold),
+                   np.asarray(forest.left).astype(node_dtype),
+                   np.asarray(forest.right).astype(node_dtype),
+                   np.asarray(forest.leaf_id).astype(smallest_int(-1, len(forest.leaf_value) - 1)),
+                   leaf_class, leaf_code, codebook, forest.max_depth, forest.n_classes,
+                   forest.classes, forest.training_date)
+
+    def meta(self) -> Dict[str, Any]:
+        """Non-array attributes written to meta.json by save()"""
+        return dict(super().meta(), format='compact', n_classes=self.n_classes)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> 'CompactForest':
+        """Rebuild a compact forest from its arrays and meta() (used by load())"""
+        return cls(max_depth=meta['max_depth'], n_classes=meta['n_classes'], classes=meta.get('classes'),
+                   training_date=meta.get('training_date'), **arrays)
+
+    def nbytes(self) -> int:
+        """Bytes held by the forest arrays"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_NAMES)
+
+    def subset(self, n_trees: int) -> 'CompactForest':
+        """
+        The forest made of the first n_trees trees (shares all node arrays)
+
+        Args:
+            n_trees (int): Trees to keep (clamped to 1..n_trees)
+
+        Returns:
+            CompactForest: self when n_trees covers the whole forest
+        """
+        n_trees = min(max(int(n_trees), 1), self.n_trees)
+        if n_trees == self.n_trees:
+            return self
+        forest = self._subsets.get(n_trees)
+        if forest is None:
+            forest = self._subsets[n_trees] = CompactForest(
+                self.roots[:n_trees], self.feature, self.threshold, self.left, self.right,
+                self.leaf_id, self.leaf_class, self.leaf_code, self.codebook, self.max_depth,
+                self.n_classes, self.classes, self.training_date)
+        return forest
+
+    def leaf_distributions(self, leaves: np.ndarray) -> np.ndarray:
+        """
+        Dense class distributions of the given leaves (decoded on the fly)
+
+        Args:
+            leaves (np.ndarray): Leaf indices, any shape
+
+        Returns:
+            np.ndarray: Array of shape leaves.shape + (n_classes,)
+        """
+        dense = np.zeros(np.shape(leaves) + (self.n_classes,), dtype=np.float64)
+        # Padding entries name classes the leaf does not contain, so plain assignment is safe
+        np.put_along_axis(dense, self.leaf_class[leaves].astype(np.intp),
+                          self.codebook[self.leaf_code[leaves]], axis=-1)
+        return dense
+
+    def predict_proba(self, X: np.ndarray, use_numba: Optional[bool] = None,
+                      chunk_size: int = forest_engine.DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """
+        Average leaf distributions over all trees
+
+        Args:
+            X (np.ndarray): Feature matrix (n_rows, n_features)
+            use_numba (bool): Force the Numba path on/off (default: use it if installed)
+            chunk_size (int): Rows per NumPy chunk
+
+        Returns:
+            np.ndarray: Class probabilities of shape (n_rows, n_classes)
+        """
+        X = np.atleast_2d(X)
+        proba = np.zeros((X.shape[0], self.n_classes), dtype=np.float64)
+
+        if use_numba is None:
+            use_numba = NUMBA_AVAILABLE
+        if not use_numba:
+            for start in range(0, X.shape[0], chunk_size):
+                leaves = self.leaf_id[self.apply(X[start:start + chunk_size])]
+                # Sparse entries of every (row, tree) leaf, summed per (row, class) cell
+                cells = (self.leaf_class[leaves].astype(np.intp)
+                         + self.n_classes * np.arange(len(leaves))[:, None, None])
+                proba[start:start + len(leaves)] = np.bincount(
+                    cells.ravel(), weights=self.codebook[self.leaf_code[leaves]].ravel(),
+                    minlength=len(leaves) * self.n_classes).reshape(len(leaves), self.n_classes)
+            proba /= self.n_trees
+            return proba
+
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        return _walk_compact_numba(X32, self.roots, self.feature, self.threshold, self.left, self.right,
+                                   self.leaf_id, self.leaf_class, self.leaf_code, self.codebook, proba)
+
+    def predict_proba_row(self, x: np.ndarray, use_numba: Optional[bool] = None) -> np.ndarray:
+        """
+        Score one feature row from preallocated per-thread buffers
+
+        Args:
+            x (np.ndarray): Feature row of length n_features
+            use_numba (bool): Force the Numba path on/off (default: use it if installed)
+
+        Returns:
+            np.ndarray: Class probabilities of length n_classes (reused buffer)
+        """
+        s = getattr(self._scratch, 'compact', None)
+        if s is None or s.x32.shape[0] != x.shape[-1]:
+            s = self._scratch.compact = _CompactRowScratch(self, x.shape[-1])
+        np.copyto(s.x32, x, casting='unsafe')
+
+        if use_numba is None:
+            use_numba = NUMBA_AVAILABLE
+        if use_numba:
+            s.proba_2d.fill(0.0)
+            _walk_compact_numba(s.x32_2d, self.roots, self.feature, self.threshold, self.left, self.right,
+                                self.leaf_id, self.leaf_class, self.leaf_code, self.codebook, s.proba_2d)
+            return s.proba
+
+        np.copyto(s.nodes, self.roots, casting='unsafe')
+        for _ in range(self.max_depth):
+            self.feature.take(s.nodes, out=s.features, mode='clip')
+            s.x32.take(s.features, out=s.values, mode='clip')
+            self.threshold.take(s.nodes, out=s.thresholds, mode='clip')
+            np.less_equal(s.values, s.thresholds, out=s.go_left)
+            self.right.take(s.nodes, out=s.children, mode='clip')
+            self.left.take(s.nodes, out=s.lefts, mode='clip')
+            np.copyto(s.children, s.lefts, where=s.go_left)
+            s.nodes, s.children = s.children, s.nodes
+
+        self.leaf_id.take(s.nodes, out=s.leaves, mode='clip')
+        self.leaf_class.take(s.leaves, axis=0, out=s.leaf_classes, mode='clip')
+        self.leaf_code.take(s.leaves, axis=0, out=s.leaf_codes, mode='clip')
+        self.codebook.take(s.leaf_codes, out=s.weights, mode='clip')
+        s.proba[:] = np.bincount(s.leaf_classes.ravel(), weights=s.weights.ravel(), minlength=self.n_classes)
+        np.divide(s.proba, self.n_trees, out=s.proba)
+        return s.proba
+
+    def predict_proba_anytime(self, X: np.ndarray, chunk_trees: int = 10, delta: float = 0.05,
+                              bound: str = 'hoeffding', use_numba: Optional[bool] = None
+                              ) -> Tuple[np.ndarray, np.ndarray]:
+        """Anytime evaluation (see FlatForest.predict_proba_anytime), always on the NumPy path"""
+        return super().predict_proba_anytime(X, chunk_trees, delta, bound, use_numba=False)
+
+
+class _CompactRowScratch:
+    """
+    Preallocated buffers for CompactForest.predict_proba_row (one set per thread)
+    """
+
+    def __init__(self, forest: CompactForest, n_features: int):
+        n_trees = forest.n_trees
+        width = forest.leaf_class.shape[1]
+        self.x32 = np.zeros(n_features, dtype=np.float32)
+        self.nodes = np.zeros(n_trees, dtype=forest.left.dtype)
+        self.children = np.zeros(n_trees, dtype=forest.left.dtype)
+        self.lefts = np.zeros(n_trees, dtype=forest.left.dtype)
+        self.features = np.zeros(n_trees, dtype=forest.feature.dtype)
+        self.values = np.zeros(n_trees, dtype=np.float32)
+        self.thresholds = np.zeros(n_trees, dtype=np.float32)
+        self.go_left = np.zeros(n_trees, dtype=bool)
+        self.leaves = np.zeros(n_trees, dtype=forest.leaf_id.dtype)
+        self.leaf_classes = np.zeros((n_trees, width), dtype=forest.leaf_class.dtype)
+        self.leaf_codes = np.zeros((n_trees, width), dtype=forest.leaf_code.dtype)
+        self.weights = np.zeros((n_trees, width), dtype=np.float64)
+        self.proba = np.zeros(forest.n_classes, dtype=np.float64)
+
+        # 2-D views for the Numba kernel, created once
+        self.x32_2d = self.x32.reshape(1, -1)
+        self.proba_2d = self.proba.reshape(1, -1)
+
+
+def load_forest_dir(path: str, mmap_mode: Optional[str] = 'r') -> FlatForest:
+    """
+    Load a saved forest directory in whichever format it was written
+
+    Args:
+        path (str): Forest directory (FlatForest.save or CompactForest.save)
+        mmap_mode (str): np.load mmap mode
+
+    Returns:
+        FlatForest: A FlatForest or CompactForest
+    """
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        compact = json.load(f).get('format') == 'compact'
+    return (CompactForest if compact else FlatForest).load(path, mmap_mode=mmap_mode)
+
+
+def load_compact_forest(model_path: str, training_date: Optional[str]) -> CompactForest:
+    """
+    Load the compact forest exported for a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        training_date (str): Training date of the loaded model package
+
+    Returns:
+        CompactForest: Memory-mapped compact forest
+
+    Raises:
+        CompactForestError: Missing, unreadable or exported from another model
+    """
+    path = compact_forest_path(model_path)
+    try:
+        forest = CompactForest.load(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise CompactForestError(f"{os.path.basename(path)} could not be loaded: {e}")
+    if forest.training_date != training_date or not forest.classes:
+        raise CompactForestError(f"{os.path.basename(path)} is from another model or has no class list")
+    return forest
+
+
+def array_bytes(forest: FlatForest) -> Dict[str, int]:
+    """
+    Bytes per forest array
+
+    Args:
+        forest (FlatForest): Flat or compact forest
+
+    Returns:
+        dict: Array name -> bytes
+    """
+    return {name: getattr(forest, name).nbytes for name in forest.ARRAY_NAMES}
+
+
+def sklearn_tree_bytes(model) -> int:
+    """
+    Bytes of the node and value arrays sklearn keeps for all trees of a forest
+
+    Args:
+        model: Fitted RandomForestClassifier
+
+    Returns:
+        int: Total bytes
+    """
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
+
+
+def main():
+    """
+    Export the compact forest, report its size and verify it against sklearn
+    """
+    import pickle
+    import joblib
+    import pandas as pd
+    from feature_engine import encode_dataset, load_encoder_tables
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'disease_model.pkl'
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else 'animal_disease_prediction.csv'
+
+    print("🗜️  COMPACT FOREST EXPORT")
+    print("=" * 60)
+
+    model_package = joblib.load(model_path)
+    model = model_package['model']
+    flat = load_forest(model_path, model_package)
+    CompactForest.from_flat(flat).save(compact_forest_path(model_path))
+    compact = CompactForest.load(compact_forest_path(model_path))
+    n_trees = compact.n_trees
+    print(f"✅ Exported {n_trees} trees to {compact_forest_path(model_path)} "
+          f"(leaf width {compact.leaf_class.shape[1]}, {len(compact.codebook)} codebook entries, "
+          f"{'exact' if compact.leaf_code.dtype == np.uint8 else f'rounded to 1/{QUANTIZATION_LEVELS}'})")
+
+    print(f"\n{'bytes per tree':<34}{'bytes':>10}{'vs flat':>10}")
+    print("-" * 60)
+    flat_bytes = sum(array_bytes(flat).values())
+    sizes = [('sklearn pickle', len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))),
+             ('sklearn tree arrays (in memory)', sklearn_tree_bytes(model)),
+             (f'flat ({forest_path(model_path)})', flat_bytes),
+             ('compact', compact.nbytes())]
+    for name, size in sizes:
+        print(f"{name:<34}{size / n_trees:>10.0f}{size / flat_bytes:>9.2f}x")
+    print()
+    compact_sizes = array_bytes(compact)
+    for name, size in array_bytes(flat).items():
+        print(f"   flat {name:<12}{size / n_trees:>9.0f} B/tree ({flat.__dict__[name].dtype})")
+    for name, size in compact_sizes.items():
+        print(f"   compact {name:<10}{size / n_trees:>9.0f} B/tree ({compact.__dict__[name].dtype})")
+
+    # Training rows plus random rows over the observed feature ranges (reaches more leaves)
+    tables = load_encoder_tables(model_path, model_package)
+    X_train = encode_dataset(pd.read_csv(csv_path), tables, model_package['feature_columns'])
+    rng = np.random.default_rng(0)
+    X_random = np.stack([rng.choice(np.unique(X_train[:, j]), 20000) for j in range(X_train.shape[1])], axis=1)
+    X = np.vstack([X_train, X_random])
+
+    expected = model.predict_proba(X)
+    print()
+    paths = [('numpy', False)] + ([('numba', True)] if NUMBA_AVAILABLE else [])
+    for name, use_numba in paths:
+        actual = compact.predict_proba(X, use_numba=use_numba)
+        rows = np.stack([compact.predict_proba_row(x, use_numba=use_numba).copy() for x in X[:2000]])
+        max_diff = max(float(np.abs(actual - expected).max()), float(np.abs(rows - expected[:2000]).max()))
+        same_top3 = float(np.mean(np.all(forest_engine.top_k_rows(actual, 3)
+                                         == forest_engine.top_k_rows(expected, 3), axis=1)))
+        status = "✅" if max_diff <= 1e-6 else "⚠️ "
+        print(f"{status} {name}: max |p - p_sklearn| = {max_diff:.3e}, identical top-3 {same_top3:.2%} "
+              f"over {len(X)} rows ({len(X_train)} training + {len(X_random)} random)")
+
+
+if __name__ == "__main__":
+    main()
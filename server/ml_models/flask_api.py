@@ -4,184 +4,614 @@ Flask API for Disease Prediction
 Runs as a standalone microservice
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import hmac
+import itertools
 import json
+import tempfile
 import warnings
 import os
+import threading
+import time
 
 warnings.filterwarnings('ignore')
 
-# Import ML libraries
-import joblib
-import pandas as pd
+# Import ML libraries (sklearn/joblib are only imported if the lean artifacts are unusable)
 import numpy as np
 
+from answer_table import AnswerTableError, load_answer_table
+from compact_forest import CompactForestError, compact_forest_path, load_compact_forest
+from feature_engine import FeatureEngine, load_encoder_tables
+from forest_engine import NUMBA_AVAILABLE, forest_path, load_forest, top_k, top_k_rows
+from inference_pool import InferencePool
+from job_queue import JobError, JobRunner, JobStore, summarize_job, validate_callback_url
+from lean_predictor import LeanArtifactError, load_lean_model, write_lean_manifest
+from micro_batcher import MicroBatcher
+from online_learning import (CASE_FIELDS, FeedbackError, FeedbackStore, ModelUpdater, ModelWatcher,
+                             match_diagnosis)
+from prediction_cache import data_fingerprint
+from quality_policy import ListenBacklog, QualityPolicy, parse_levels, request_deadline
+from shared_cache import cache_from_env
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 class APIPredictor:
-    def __init__(self):
-        # Load model and encoders
-        model_path = os.path.join(os.path.dirname(__file__), 'disease_model.pkl')
+    def __init__(self, cache=None, model_path=None):
+        # Load model and encoders (model_path: a published online-learning version, default the shipped model)
+        model_path = model_path or SHIPPED_MODEL_PATH
         severity_path = os.path.join(os.path.dirname(__file__), 'severity_mapping.json')
+        self.model_path = model_path
+        
+        # Prefer the sklearn-free artifacts; MODEL_LEAN_LOAD=0 forces the pickle
+        try:
+            if os.environ.get('MODEL_LEAN_LOAD', '1') == '0':
+                raise LeanArtifactError('disabled by MODEL_LEAN_LOAD=0')
+            self._load_lean(model_path)
+        except LeanArtifactError as e:
+            print(f"⚠️  Lean model unavailable ({e}), loading {os.path.basename(model_path)}")
+            self._load_full(model_path)
+        
+        # FOREST_FORMAT=compact scores from disease_model_compact/ (narrow dtypes, sparse leaves)
+        self.forest_dir = forest_path(model_path)
+        self.forest_format = 'flat'
+        if os.environ.get('FOREST_FORMAT', 'flat') == 'compact':
+            try:
+                self.forest = load_compact_forest(model_path, self.model_package.get('training_date'))
+                self.forest_dir = compact_forest_path(model_path)
+                self.forest_format = 'compact'
+            except CompactForestError as e:
+                print(f"⚠️  Compact forest unavailable ({e}), scoring with the flat forest")
+        
+        with open(severity_path, 'r') as f:
+            self.severity_data = json.load(f)
+        
+        # Cached responses are only valid for this model + severity mapping
+        self.cache = cache
+        self.cache_version = data_fingerprint(self.model_package, self.severity_data)
+        self.batcher = None
+        self.pool = None
+        self.early_exit = None
+        self.quality = None
+        
+        # Precomputed answers for default-parameter requests (ANSWER_TABLE=0 disables)
+        self.answers = None
+        if os.environ.get('ANSWER_TABLE', '1') != '0':
+            try:
+                self.answers = load_answer_table(model_path, self.model_package.get('training_date'))
+            except AnswerTableError as e:
+                print(f"⚠️  Answer table unavailable ({e}), scoring every request")
+    
+    def _load_lean(self, model_path):
+        # Flattened forest + encoder tables + class list: NumPy only, no unpickling
+        lean = load_lean_model(model_path)
+        self.model_package = lean.package_info()
+        self.feature_columns = lean.feature_columns
+        self.encoder_tables = lean.encoder_tables
+        self.feature_engine = lean.feature_engine
+        self.forest = lean.forest
+        self.classes = lean.classes
+        self.load_mode = 'lean'
+    
+    def _load_full(self, model_path):
+        import joblib
         
         self.model_package = joblib.load(model_path)
         self.model = self.model_package['model']
         self.label_encoders = self.model_package['label_encoders']
         self.target_encoder = self.model_package['target_encoder']
         self.feature_columns = self.model_package['feature_columns']
+        self.encoder_tables = load_encoder_tables(model_path, self.model_package)
+        self.feature_engine = FeatureEngine(self.encoder_tables, self.feature_columns)
+        self.forest = load_forest(model_path, self.model_package)
+        self.classes = list(self.target_encoder.classes_)
+        self.load_mode = 'full'
         
-        with open(severity_path, 'r') as f:
-            self.severity_data = json.load(f)
+        # Both artifacts are current now, so the next cold start can skip the pickle
+        if self.forest.classes:
+            try:
+                write_lean_manifest(model_path, self.model_package.get('training_date'))
+            except OSError:
+                pass
     
     def preprocess_symptoms(self, symptoms, animal_type='Dog', age=3, weight=20.0, 
                           gender='Male', breed='Mixed', duration='3 days', heart_rate=120, 
                           temperature=39.0):
-        # Create base animal data
-        animal_data = {
-            'Animal_Type': animal_type,
-            'Breed': breed,
-            'Age': age,
-            'Gender': gender,
-            'Weight': weight,
-            'Duration': duration,
-            'Heart_Rate': heart_rate,
-            'Body_Temperature_Numeric': temperature
-        }
-        
-        # Process symptoms
-        symptom_mapping = {
-            'fever': 'Fever',
-            'lethargy': 'Lethargy', 
-            'vomiting': 'Vomiting',
-            'diarrhea': 'Diarrhea',
-            'coughing': 'Coughing',
-            'appetite loss': 'Appetite Loss',
-            'nasal discharge': 'Nasal Discharge',
-            'eye discharge': 'Eye Discharge',
-            'skin lesions': 'Skin Lesions',
-            'lameness': 'Lameness',
-            'labored breathing': 'Labored Breathing',
-            'sneezing': 'Sneezing'
-        }
-        
-        normalized_symptoms = [s.lower().strip() for s in symptoms]
-        
-        # Fill symptom slots
-        mapped_symptoms = []
-        for symptom in normalized_symptoms[:4]:
-            mapped_symptom = symptom_mapping.get(symptom, symptom.title())
-            mapped_symptoms.append(mapped_symptom)
-        
-        while len(mapped_symptoms) < 4:
-            mapped_symptoms.append('No')
-        
-        animal_data['Symptom_1'] = mapped_symptoms[0]
-        animal_data['Symptom_2'] = mapped_symptoms[1] 
-        animal_data['Symptom_3'] = mapped_symptoms[2]
-        animal_data['Symptom_4'] = mapped_symptoms[3]
-        
-        # Set binary indicators
-        binary_symptoms = {
-            'Appetite_Loss': 'appetite loss' in normalized_symptoms or 'lethargy' in normalized_symptoms,
-            'Vomiting': 'vomiting' in normalized_symptoms,
-            'Diarrhea': 'diarrhea' in normalized_symptoms,
-            'Coughing': 'coughing' in normalized_symptoms,
-            'Labored_Breathing': 'labored breathing' in normalized_symptoms,
-            'Lameness': 'lameness' in normalized_symptoms,
-            'Skin_Lesions': 'skin lesions' in normalized_symptoms,
-            'Nasal_Discharge': 'nasal discharge' in normalized_symptoms,
-            'Eye_Discharge': 'eye discharge' in normalized_symptoms
-        }
+        return self.preprocess_symptoms_batch([{
+            'symptoms': symptoms,
+            'animal_type': animal_type,
+            'age': age,
+            'weight': weight,
+            'gender': gender,
+            'breed': breed,
+            'duration': duration,
+            'heart_rate': heart_rate,
+            'temperature': temperature
+        }])
+    
+    def preprocess_symptoms_batch(self, requests):
+        # Fill the feature matrix straight from the request dicts (no DataFrame)
+        return self.feature_engine.transform(requests)
+    
+    def enable_micro_batching(self, window_ms, max_batch):
+        # Concurrent cache misses are coalesced into predict_batch calls
+        self.batcher = MicroBatcher(lambda cases: self.predict_batch(cases)[0], window_ms, max_batch)
+    
+    def enable_inference_pool(self, processes, max_rows):
+        # Score in separate processes fed through shared memory; needs the forest directory on disk
+        forest_dir = self.forest_dir
+        if not os.path.isdir(forest_dir):
+            print(f"⚠️  {forest_dir} not found, scoring in-process")
+            return
+        self.pool = InferencePool(forest_dir, self.feature_engine.n_features, self.forest.n_classes,
+                                  processes, max_rows)
+    
+    def enable_early_exit(self, chunk_trees, delta, bound):
+        # Stop evaluating trees once the top-1 class is settled; responses then report trees_used
+        self.forest.anytime_thresholds(delta, bound)  # Rejects an unknown bound up front
+        if not NUMBA_AVAILABLE:
+            # The NumPy path walks a chunk of trees per depth level, which is slower than the
+            # whole forest for one row: changed answers for no speedup, so keep every tree
+            print("⚠️  Numba not installed: FOREST_EARLY_EXIT_DELTA ignored, scoring with every tree")
+            return
+        self.early_exit = {'chunk_trees': chunk_trees, 'delta': delta, 'bound': bound}
+        self.cache_version = f"{self.cache_version}:anytime-{bound}-{delta}-{chunk_trees}"
+    
+    def enable_quality_policy(self, levels, floor, queue_step):
+        # Score with fewer trees when this worker is backed up or a caller's deadline is close
+        self.quality = QualityPolicy(self.forest.n_trees, levels, floor, queue_step, listen_backlog)
+    
+    def full_quality(self):
+        return {'percent': 100, 'trees': self.forest.n_trees, 'reason': 'full'}
+    
+    def score(self, X, n_trees=None):
+        # Returns (probabilities, trees used per row or None if every row used all n_trees)
+        if self.pool is not None:
+            return self.pool.predict_proba(X, n_trees=n_trees), None
+        forest = self.forest if n_trees is None else self.forest.subset(n_trees)
+        if self.early_exit is not None:
+            return forest.predict_proba_anytime(X, **self.early_exit)
+        return forest.predict_proba(X), None
+    
+    def predict(self, symptoms, deadline_ms=None, **kwargs):
+        if self.answers is not None:
+            answer = self.answers.lookup(symptoms, kwargs)
+            if answer is not None:
+                result = {'predictions': self.format_answer(*answer), 'status': 'success'}
+                if self.early_exit is not None:
+                    result['trees_used'] = self.forest.n_trees
+                if self.quality is not None:
+                    result['quality'] = self.full_quality()
+                return result
         
-        for symptom, present in binary_symptoms.items():
-            animal_data[symptom] = 'Yes' if present else 'No'
-        
-        # Convert to DataFrame
-        df = pd.DataFrame([animal_data])
-        
-        # Encode categorical variables
-        categorical_cols = ['Animal_Type', 'Breed', 'Gender', 'Symptom_1', 'Symptom_2', 
-                           'Symptom_3', 'Symptom_4', 'Duration', 'Appetite_Loss', 'Vomiting',
-                           'Diarrhea', 'Coughing', 'Labored_Breathing', 'Lameness', 
-                           'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
-        
-        for col in categorical_cols:
-            if col in df.columns and col in self.label_encoders:
-                le = self.label_encoders[col]
-                value = str(df[col].iloc[0])
-                try:
-                    if value in le.classes_:
-                        df[col + '_encoded'] = le.transform([value])
-                    else:
-                        df[col + '_encoded'] = 0
-                except:
-                    df[col + '_encoded'] = 0
-        
-        # Create feature vector
-        feature_vector = []
-        for feature in self.feature_columns:
-            if feature in df.columns:
-                feature_vector.append(df[feature].iloc[0])
-            else:
-                feature_vector.append(0)
+        if self.quality is None:
+            return self.predict_at(None, symptoms, **kwargs)
+        with self.quality.admit():
+            level = self.quality.choose(deadline_ms)
+            result = self.predict_at(level, symptoms, **kwargs)
+        if result.get('status') == 'success':
+            result.setdefault('quality', self.full_quality())
+        return result
+    
+    def predict_at(self, level, symptoms, **kwargs):
+        compute = self.predict_uncached
+        store = True
+        if level is not None and level['trees'] < self.forest.n_trees:
+            # Degraded answers are served once, never cached; a cached full answer still wins
+            def compute(symptoms, **kwargs):
+                result = self.predict_uncached(symptoms, n_trees=level['trees'], **kwargs)
+                if result.get('status') == 'success':
+                    result['quality'] = dict(level)
+                return result
+            store = False
+        elif self.batcher is not None and isinstance(symptoms, list):
+            compute = self.predict_batched
         
-        return np.array(feature_vector).reshape(1, -1)
+        if self.cache is None:
+            return compute(symptoms, **kwargs)
+        return self.cache.get_or_compute(self.cache_version, compute, symptoms, store=store, **kwargs)
     
-    def predict(self, symptoms, **kwargs):
+    def predict_batched(self, symptoms, **kwargs):
+        return self.batcher.submit_sync(dict(kwargs, symptoms=symptoms))
+    
+    def predict_uncached(self, symptoms, n_trees=None, **kwargs):
         try:
-            X = self.preprocess_symptoms(symptoms, **kwargs)
-            probabilities = self.model.predict_proba(X)[0]
-            top_indices = np.argsort(probabilities)[-3:][::-1]
-            
-            predictions = []
-            for idx in top_indices:
-                disease = self.target_encoder.classes_[idx]
-                confidence = probabilities[idx]
-                
-                severity_info = self.severity_data.get(disease, {})
-                severity = severity_info.get('severity', 'Unknown')
-                recommendation = severity_info.get('recommendation', 
-                    'Consult with a veterinarian for proper diagnosis and treatment.')
-                
-                predictions.append({
-                    'disease': disease,
-                    'confidence': f"{confidence*100:.0f}%",
-                    'severity': severity,
-                    'recommendation': recommendation
-                })
+            # Single-row fast path: per-thread buffers, no DataFrame or temporary matrix
+            x = self.feature_engine.transform_one(kwargs, symptoms)
+            forest = self.forest if n_trees is None else self.forest.subset(n_trees)
+            trees_used = None
+            start = time.perf_counter()
+            if self.pool is not None:
+                probabilities = self.pool.predict_proba(x.reshape(1, -1), n_trees=n_trees)[0]
+            elif self.early_exit is not None:
+                probabilities, used = forest.predict_proba_anytime(x.reshape(1, -1), **self.early_exit)
+                probabilities, trees_used = probabilities[0], int(used[0])
+            else:
+                probabilities = forest.predict_proba_row(x)
+            if self.quality is not None:
+                self.quality.observe(forest.n_trees, 1, time.perf_counter() - start)
+            top_indices = top_k(probabilities, 3)
             
-            return {'predictions': predictions, 'status': 'success'}
+            result = {'predictions': self.format_predictions(probabilities, top_indices), 'status': 'success'}
+            if trees_used is not None:
+                result['trees_used'] = trees_used
+            return result
             
         except Exception as e:
             return {'error': str(e), 'predictions': [], 'status': 'error'}
+    
+    def format_predictions(self, probabilities, top_indices):
+        return [self.format_prediction(idx, f"{probabilities[idx]*100:.0f}%") for idx in top_indices]
+    
+    def format_answer(self, top_indices, percents):
+        # Answer-table hit: class indices and rounded percentages are already known
+        return [self.format_prediction(idx, f"{percent}%") for idx, percent in zip(top_indices, percents)]
+    
+    def format_prediction(self, idx, confidence):
+        disease = self.classes[idx]
+        
+        severity_info = self.severity_data.get(disease, {})
+        severity = severity_info.get('severity', 'Unknown')
+        recommendation = severity_info.get('recommendation', 
+            'Consult with a veterinarian for proper diagnosis and treatment.')
+        
+        return {
+            'disease': disease,
+            'confidence': confidence,
+            'severity': severity,
+            'recommendation': recommendation
+        }
+    
+    def predict_batch(self, cases, n_trees=None):
+        """
+        Score many cases with one matrix, one forest pass and one top-k
+
+        Identical feature rows are scored once. Bad cases get their own error
+        entry and never fail the rest of the batch. Batches bypass the
+        response cache.
+        
+        Args:
+            cases (list): Request dicts with 'symptoms' plus optional animal fields
+                and an optional 'id' that is echoed back
+            n_trees (int): Score with only the first n_trees trees (default: all)
+        
+        Returns:
+            tuple: (per-case results in input order, number of distinct rows scored)
+        """
+        results = [None] * len(cases)
+        X = np.zeros((len(cases), self.feature_engine.n_features), dtype=np.float64)
+        valid = []
+        
+        for i, case in enumerate(cases):
+            if not isinstance(case, dict) or not isinstance(case.get('symptoms'), list):
+                results[i] = {'error': 'Each case needs a list of symptoms', 'predictions': [], 'status': 'error'}
+                continue
+            try:
+                self.feature_engine.fill_row({field: case.get(field) for field in BATCH_FIELDS}, X[len(valid)])
+            except Exception as e:
+                X[len(valid)] = 0.0
+                results[i] = {'error': str(e), 'predictions': [], 'status': 'error'}
+                continue
+            valid.append(i)
+        
+        n_unique = 0
+        if valid:
+            unique_rows, inverse = np.unique(X[:len(valid)], axis=0, return_inverse=True)
+            n_unique = len(unique_rows)
+            start = time.perf_counter()
+            probabilities, trees_used = self.score(unique_rows, n_trees)
+            if self.quality is not None:
+                self.quality.observe(n_trees or self.forest.n_trees, n_unique, time.perf_counter() - start)
+            top_indices = top_k_rows(probabilities, 3)
+            rendered = [self.format_predictions(probabilities[u], top_indices[u]) for u in range(n_unique)]
+            
+            for i, u in zip(valid, inverse.reshape(-1)):
+                results[i] = {'predictions': [dict(p) for p in rendered[u]], 'status': 'success'}
+                if trees_used is not None:
+                    results[i]['trees_used'] = int(trees_used[u])
+        
+        for i, case in enumerate(cases):
+            if isinstance(case, dict) and 'id' in case:
+                results[i] = dict({'id': case['id']}, **results[i])
+        return results, n_unique
+
+# Fields a case may set (the same ones /predict forwards to the model)
+BATCH_FIELDS = ('symptoms', 'animal_type', 'age', 'weight', 'gender', 'breed')
+
+# Largest accepted /predict/batch request
+PREDICT_BATCH_MAX_ITEMS = int(os.environ.get('PREDICT_BATCH_MAX_ITEMS', 1000))
+
+# /predict/stream scores this many cases at a time and rejects longer NDJSON lines
+PREDICT_STREAM_CHUNK = int(os.environ.get('PREDICT_STREAM_CHUNK', 256))
+PREDICT_STREAM_MAX_LINE_BYTES = int(os.environ.get('PREDICT_STREAM_MAX_LINE_BYTES', 64 * 1024))
+
+# Micro-batching of concurrent /predict calls (needs threaded workers). Unset disables it;
+# 0 batches only what queued up while the previous batch was scoring (no added wait)
+MICROBATCH_WINDOW_MS = os.environ.get('PREDICT_MICROBATCH_WINDOW_MS')
+MICROBATCH_MAX = int(os.environ.get('PREDICT_MICROBATCH_MAX', 64))
+
+# Offload forest scoring to this many inference processes per worker (0 scores in-process)
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))
+INFERENCE_MAX_ROWS = int(os.environ.get('INFERENCE_MAX_ROWS', 256))
+
+# Anytime forest evaluation: FOREST_EARLY_EXIT_DELTA enables it (unset = every tree, 0 = only stop
+# once the remaining trees cannot change the top-1 class). Bound is 'hoeffding' or 'normal' (see
+# forest_engine.ANYTIME_BOUNDS); ignored when INFERENCE_PROCESSES scores out of process or
+# when Numba is not installed
+FOREST_EARLY_EXIT_DELTA = os.environ.get('FOREST_EARLY_EXIT_DELTA')
+FOREST_EARLY_EXIT_BOUND = os.environ.get('FOREST_EARLY_EXIT_BOUND', 'hoeffding')
+FOREST_EARLY_EXIT_CHUNK = int(os.environ.get('FOREST_EARLY_EXIT_CHUNK', 10))
+
+# Degraded scoring under load: QUALITY_LEVELS (e.g. "100,50,25", percent of trees; unset disables),
+# never below QUALITY_FLOOR percent; see quality_policy.py. Callers pass X-Request-Deadline-Ms
+QUALITY_LEVELS = os.environ.get('QUALITY_LEVELS')
+QUALITY_FLOOR = int(os.environ.get('QUALITY_FLOOR', 50))
+QUALITY_QUEUE_STEP = int(os.environ.get('QUALITY_QUEUE_STEP', 4))
+
+# Connections waiting on gunicorn's listen socket count as queued requests (set per worker by
+# gunicorn.conf.py post_fork; the development server has none)
+listen_backlog = None
+
+# Background jobs (POST /jobs): SQLite store shared by all workers, JOBS_WORKERS runner threads per worker
+JOBS_DB_PATH = os.environ.get('JOBS_DB_PATH', os.path.join(tempfile.gettempdir(), 'petcarehub_jobs.sqlite'))
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', 1))
+JOBS_CHUNK = int(os.environ.get('JOBS_CHUNK', 256))
+JOBS_DUTY_CYCLE = float(os.environ.get('JOBS_DUTY_CYCLE', 0.5))
+JOBS_MAX_QUEUED = int(os.environ.get('JOBS_MAX_QUEUED', 100))
+JOBS_MAX_INLINE_ITEMS = int(os.environ.get('JOBS_MAX_INLINE_ITEMS', 100000))
+JOBS_RETENTION_SECONDS = float(os.environ.get('JOBS_RETENTION_SECONDS', 7 * 24 * 3600))
+JOBS_RESULTS_PAGE = int(os.environ.get('JOBS_RESULTS_PAGE', 1000))
+# Jobs may only read NDJSON input files from this directory
+JOBS_INPUT_DIR = os.environ.get('JOBS_INPUT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_inputs'))
+
+# Online learning (see online_learning.py): POST /feedback stores vet-confirmed cases; with
+# ONLINE_UPDATE_INTERVAL > 0 a background updater grows trees on them and publishes a new version
+# under ONLINE_MODEL_DIR, which every worker picks up within MODEL_RELOAD_INTERVAL seconds
+SHIPPED_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'disease_model.pkl')
+FEEDBACK_DB_PATH = os.environ.get('FEEDBACK_DB_PATH', os.path.join(tempfile.gettempdir(), 'petcarehub_feedback.sqlite'))
+ONLINE_MODEL_DIR = os.environ.get('ONLINE_MODEL_DIR', os.path.join(tempfile.gettempdir(), 'petcarehub_models'))
+# Confirmed cases become training data: only callers holding FEEDBACK_API_TOKEN (the Node
+# backend, after checking the vet's sign-in) may send them, a few per prediction at most
+FEEDBACK_API_TOKEN = os.environ.get('FEEDBACK_API_TOKEN', '')
+FEEDBACK_MAX_PER_PREDICTION = int(os.environ.get('FEEDBACK_MAX_PER_PREDICTION', 2))
+ONLINE_UPDATE_INTERVAL = float(os.environ.get('ONLINE_UPDATE_INTERVAL', 0))
+ONLINE_MIN_CASES = int(os.environ.get('ONLINE_MIN_CASES', 50))
+ONLINE_TREES_PER_UPDATE = int(os.environ.get('ONLINE_TREES_PER_UPDATE', 10))
+ONLINE_MAX_ADDED_TREES = int(os.environ.get('ONLINE_MAX_ADDED_TREES', 0))
+ONLINE_MAX_CASES = int(os.environ.get('ONLINE_MAX_CASES', 5000))
+ONLINE_DUTY_CYCLE = float(os.environ.get('ONLINE_DUTY_CYCLE', 0.25))
+ONLINE_KEEP_VERSIONS = int(os.environ.get('ONLINE_KEEP_VERSIONS', 3))
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 30))
+# A replaced predictor's inference processes are stopped after in-flight requests had time to finish
+MODEL_RETIRE_SECONDS = 60.0
 
 # Initialize predictor
 predictor = None
+prediction_cache = cache_from_env()
+# Created on first use by the get_*() accessors below, so importing this module (the gunicorn
+# master with preload_app, or a tool) opens no database and builds no background threads
+job_runner = None
+model_updater = None
+model_watcher = None
+_services_lock = threading.Lock()
+
+# Synthetic request scored once after loading so the first real user hits warm code paths
+WARMUP_REQUEST = {'symptoms': ['fever', 'vomiting', 'lethargy']}
+
+_predictor_lock = threading.Lock()
+model_state = {
+    'status': 'not_started',  # not_started -> loading -> warming_up -> ready | failed
+    'error': None,
+    'load_mode': None,  # 'lean' (sklearn-free artifacts) or 'full' (pickle)
+    'training_date': None,  # of the model being served (changes when a published version is loaded)
+    'reloads': 0,
+    'forest_format': None,  # 'flat' or 'compact' (FOREST_FORMAT)
+    'load_seconds': None,
+    'warmup_seconds': None,
+    'started_at': None,
+    'ready_at': None
+}
+
+def get_predictor():
+    """
+    Get or create the predictor, loading and warming it up exactly once
+
+    Concurrent callers wait on a lock for the load already in progress instead
+    of unpickling the model again. gunicorn.conf.py calls this in the master
+    before forking; otherwise the background thread started at import does.
+    A failed load is retried by the next caller. The newest published
+    online-learning version is loaded instead of the shipped model if there is one.
+    """
+    global predictor
+    if predictor is not None:
+        return predictor
+
+    with _predictor_lock:
+        if predictor is not None:
+            return predictor
+
+        model_state.update(status='loading', error=None, started_at=time.time())
+        try:
+            start = time.perf_counter()
+            loaded = APIPredictor(cache=prediction_cache, model_path=get_model_watcher().current())
+            model_state['load_seconds'] = round(time.perf_counter() - start, 4)
+            model_state['load_mode'] = loaded.load_mode
+            model_state['forest_format'] = loaded.forest_format
+            model_state['training_date'] = loaded.model_package.get('training_date')
+
+            # Bypass the cache so the synthetic request is never served to users
+            model_state['status'] = 'warming_up'
+            model_state['warmup_seconds'] = warm_up(loaded)
+        except Exception as e:
+            model_state.update(status='failed', error=str(e))
+            raise
+
+        configure_predictor(loaded)
+        predictor = loaded
+        model_state.update(status='ready', ready_at=time.time())
+        return predictor
+
+def warm_up(loaded):
+    """Enable early exit if configured and score the synthetic request once; returns the seconds it took"""
+    if FOREST_EARLY_EXIT_DELTA:
+        loaded.enable_early_exit(FOREST_EARLY_EXIT_CHUNK, float(FOREST_EARLY_EXIT_DELTA),
+                                 FOREST_EARLY_EXIT_BOUND)
+    start = time.perf_counter()
+    result = loaded.predict_uncached(**WARMUP_REQUEST)
+    if result.get('status') != 'success':
+        raise RuntimeError(f"Warm-up prediction failed: {result.get('error')}")
+    return round(time.perf_counter() - start, 4)
+
+def configure_predictor(loaded, previous=None):
+    """Enable batching, the quality policy and inference processes (a reload takes over the batcher)"""
+    if previous is not None and previous.batcher is not None:
+        loaded.batcher = previous.batcher
+        loaded.batcher.score_batch = lambda cases: loaded.predict_batch(cases)[0]
+    elif MICROBATCH_WINDOW_MS:
+        loaded.enable_micro_batching(float(MICROBATCH_WINDOW_MS), MICROBATCH_MAX)
+    if QUALITY_LEVELS:
+        loaded.enable_quality_policy(parse_levels(QUALITY_LEVELS), QUALITY_FLOOR, QUALITY_QUEUE_STEP)
+    if INFERENCE_PROCESSES > 0:
+        # Processes start on first use in each worker (gunicorn.conf.py starts them after fork)
+        loaded.enable_inference_pool(INFERENCE_PROCESSES, INFERENCE_MAX_ROWS)
+
+def watch_listen_backlog(sockets, workers):
+    """Count connections waiting on the listen sockets in the quality policy's queue depth"""
+    global listen_backlog
+    listen_backlog = ListenBacklog(sockets, workers)
+    if predictor is not None and predictor.quality is not None:
+        predictor.quality.backlog = listen_backlog
+
+def reload_predictor(model_path):
+    """
+    Switch to a newly published model version (called by the model watcher thread)
+
+    The new predictor is loaded and warmed up next to the current one, then
+    swapped in; requests already running finish on the predictor they started with.
+
+    Args:
+        model_path (str): Resolved path of the published disease_model.pkl
+
+    Returns:
+        bool: True once model_path is being served (False before the first load)
+    """
+    global predictor
+    current = predictor
+    if current is None:
+        return False
+    if current.model_path == model_path:
+        return True
+
+    with _predictor_lock:
+        start = time.perf_counter()
+        loaded = APIPredictor(cache=prediction_cache, model_path=model_path)
+        warm_up(loaded)
+        configure_predictor(loaded, previous=current)
+        predictor = loaded
+        model_state.update(training_date=loaded.model_package.get('training_date'),
+                           load_mode=loaded.load_mode, forest_format=loaded.forest_format,
+                           reloads=model_state['reloads'] + 1)
+
+    if current.pool is not None:
+        threading.Timer(MODEL_RETIRE_SECONDS, current.pool.close).start()
+    print(f"🔄 Now serving {model_path} ({loaded.forest.n_trees} trees, "
+          f"loaded in {time.perf_counter() - start:.2f}s)")
+    return True
+
+def get_model_updater():
+    """This process's online-learning updater, opening the feedback database on first use"""
+    global model_updater
+    with _services_lock:
+        if model_updater is None:
+            model_updater = ModelUpdater(FeedbackStore(FEEDBACK_DB_PATH), ONLINE_MODEL_DIR, SHIPPED_MODEL_PATH,
+                                         ONLINE_UPDATE_INTERVAL, ONLINE_MIN_CASES, ONLINE_TREES_PER_UPDATE,
+                                         ONLINE_MAX_ADDED_TREES, ONLINE_MAX_CASES, ONLINE_DUTY_CYCLE,
+                                         ONLINE_KEEP_VERSIONS)
+        return model_updater
+
+def get_model_watcher():
+    """This process's published-model watcher (its thread starts separately)"""
+    global model_watcher
+    with _services_lock:
+        if model_watcher is None:
+            model_watcher = ModelWatcher(ONLINE_MODEL_DIR, SHIPPED_MODEL_PATH, reload_predictor,
+                                         MODEL_RELOAD_INTERVAL)
+        return model_watcher
+
+def _load_in_background():
+    try:
+        get_predictor()
+        print(f"✅ Model loaded in {model_state['load_seconds']}s, "
+              f"warm-up {model_state['warmup_seconds']}s")
+    except Exception as e:
+        print(f"❌ Background model load failed: {e}")
+
+def start_background_load():
+    """Start loading the model on a daemon thread (no-op once loaded)"""
+    if predictor is None:
+        threading.Thread(target=_load_in_background, name='model-loader', daemon=True).start()
+
+# Load eagerly at import so no user request pays the unpickling cost (MODEL_EAGER_LOAD=0 disables);
+# inference processes spawned from `python flask_api.py` re-import this file as __mp_main__
+if os.environ.get('MODEL_EAGER_LOAD', '1') != '0' and __name__ != '__mp_main__':
+    start_background_load()
 
 @app.route('/', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness endpoint (never waits for the model)"""
     return jsonify({
         'status': 'healthy',
         'service': 'Disease Prediction API',
         'version': '1.0.0'
     })
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once the model is loaded and warmed up, 503 before"""
+    state = dict(model_state, ready=model_state['status'] == 'ready', pid=os.getpid())
+    if predictor is not None and predictor.pool is not None:
+        state['inference_pool'] = predictor.pool.stats()
+    if predictor is not None and predictor.answers is not None:
+        state['answer_table'] = predictor.answers.stats()
+    if predictor is not None and predictor.early_exit is not None:
+        state['early_exit'] = predictor.early_exit
+    return jsonify(state), (200 if state['ready'] else 503)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Prediction cache counters"""
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(prediction_cache.stats(), enabled=True))
+
+@app.route('/batcher/stats', methods=['GET'])
+def batcher_stats():
+    """Micro-batching metrics for this worker (batch sizes, queueing delay)"""
+    current = predictor
+    if current is None or current.batcher is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(current.batcher.stats(), enabled=True, pid=os.getpid()))
+
+@app.route('/quality/stats', methods=['GET'])
+def quality_stats():
+    """Degraded-scoring policy for this worker (levels, in-flight requests, choices made)"""
+    current = predictor
+    if current is None or current.quality is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(current.quality.stats(), enabled=True, pid=os.getpid()))
+
 @app.route('/predict', methods=['POST'])
 def predict_disease():
     """Main prediction endpoint"""
-    global predictor
-    
     try:
-        # Lazy load predictor
-        if predictor is None:
-            predictor = APIPredictor()
+        # Waits for the background load if it is still running
+        predictor = get_predictor()
         
-        data = request.get_json()
+        # silent=True: a malformed body is the client's error (400), not ours (500)
+        data = request.get_json(silent=True)
         
-        if not data or 'symptoms' not in data:
+        if not isinstance(data, dict) or 'symptoms' not in data:
             return jsonify({
                 'error': 'Symptoms are required',
                 'predictions': [],
@@ -195,7 +625,8 @@ def predict_disease():
             age=data.get('age', 3),
             weight=data.get('weight', 20.0),
             gender=data.get('gender', 'Male'),
-            breed=data.get('breed', 'Mixed')
+            breed=data.get('breed', 'Mixed'),
+            deadline_ms=request_deadline(request.headers)
         )
         
         return jsonify(result)
@@ -207,7 +638,331 @@ def predict_disease():
             'status': 'error'
         }), 500
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_disease_batch():
+    """Batch prediction endpoint: {"cases": [{...}, ...]} -> per-case results in order"""
+    try:
+        predictor = get_predictor()
+        
+        data = request.get_json(silent=True)
+        cases = data.get('cases') if isinstance(data, dict) else data
+        
+        if not isinstance(cases, list) or not cases:
+            return jsonify({
+                'error': 'A non-empty list of cases is required',
+                'results': [],
+                'status': 'error'
+            }), 400
+        
+        if len(cases) > PREDICT_BATCH_MAX_ITEMS:
+            return jsonify({
+                'error': f'Batch too large: {len(cases)} cases (max {PREDICT_BATCH_MAX_ITEMS})',
+                'results': [],
+                'status': 'error'
+            }), 413
+        
+        if predictor.quality is None:
+            results, n_unique = predictor.predict_batch(cases)
+            quality = {}
+        else:
+            with predictor.quality.admit():
+                level = predictor.quality.choose(request_deadline(request.headers), rows=len(cases))
+                n_trees = level['trees'] if level['trees'] < predictor.forest.n_trees else None
+                results, n_unique = predictor.predict_batch(cases, n_trees)
+            quality = {'quality': level}
+        
+        return jsonify(dict({
+            'results': results,
+            'count': len(results),
+            'unique_rows': n_unique,
+            'status': 'success'
+        }, **quality))
+        
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'results': [],
+            'status': 'error'
+        }), 500
+
+def read_ndjson_lines(stream, max_line_bytes):
+    """Yield (line number, raw line or None if too long) without buffering the whole body"""
+    number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        number += 1
+        
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Skip the rest of an oversized line
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield number, None
+        elif line.strip():
+            yield number, line
+
+def chunked(items, size):
+    """Group an iterator into lists of at most size items"""
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def score_ndjson_chunk(predictor, chunk):
+    """Score one chunk of (line number, raw line) pairs; one result per line, tagged with its number"""
+    entries = []
+    cases = []
+    for number, raw in chunk:
+        if raw is None:
+            entries.append((number, {'error': 'Line too long', 'predictions': [], 'status': 'error'}))
+            continue
+        try:
+            cases.append(json.loads(raw))
+            entries.append((number, None))
+        except ValueError as e:
+            entries.append((number, {'error': f'Invalid JSON: {e}', 'predictions': [], 'status': 'error'}))
+    
+    results = iter(predictor.predict_batch(cases)[0] if cases else [])
+    return [dict({'line': number}, **(entry or next(results))) for number, entry in entries]
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_disease_stream():
+    """
+    Streaming prediction endpoint: NDJSON cases in, NDJSON results out
+    
+    The body is read line by line and scored PREDICT_STREAM_CHUNK cases at a
+    time; each chunk's results are sent as soon as it is scored, so memory
+    stays flat however large the upload is. Every non-blank input line gets
+    one output line carrying its 'line' number (and 'id' if the case had one).
+    Clients should read the response while still sending (curl does).
+    """
+    try:
+        predictor = get_predictor()
+    except Exception as e:
+        return jsonify({'error': str(e), 'predictions': [], 'status': 'error'}), 503
+    
+    stream = request.stream
+    
+    def generate():
+        for chunk in chunked(read_ndjson_lines(stream, PREDICT_STREAM_MAX_LINE_BYTES), PREDICT_STREAM_CHUNK):
+            yield ''.join(json.dumps(result) + '\n' for result in score_ndjson_chunk(predictor, chunk))
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def resolve_job_input(path):
+    """Absolute path of a job input file, which must be inside JOBS_INPUT_DIR"""
+    base = os.path.realpath(JOBS_INPUT_DIR)
+    resolved = os.path.realpath(os.path.join(base, str(path)))
+    if os.path.commonpath([resolved, base]) != base or not os.path.isfile(resolved):
+        raise JobError(f'path must name an existing file in {JOBS_INPUT_DIR}')
+    return resolved
+
+def count_ndjson_cases(path):
+    """Number of non-blank lines, i.e. results the job will produce"""
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+def run_job_chunks(job, skip):
+    """Yield a job's results JOBS_CHUNK cases at a time, skipping the first `skip` (already committed)"""
+    predictor = get_predictor()
+    
+    if job['source'] == 'inline':
+        cases = get_job_runner().store.inline_cases(job['id'])
+        for start in range(skip, len(cases), JOBS_CHUNK):
+            yield predictor.predict_batch(cases[start:start + JOBS_CHUNK])[0]
+        return
+    
+    with open(job['source'], 'rb') as f:
+        lines = itertools.islice(read_ndjson_lines(f, PREDICT_STREAM_MAX_LINE_BYTES), skip, None)
+        for chunk in chunked(lines, JOBS_CHUNK):
+            yield score_ndjson_chunk(predictor, chunk)
+
+def get_job_runner():
+    """This process's job runner, opening the job database on first use"""
+    global job_runner
+    with _services_lock:
+        if job_runner is None:
+            job_runner = JobRunner(JobStore(JOBS_DB_PATH, JOBS_RETENTION_SECONDS), run_job_chunks,
+                                   JOBS_WORKERS, JOBS_DUTY_CYCLE)
+        return job_runner
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a bulk prediction job and return its id immediately
+    
+    Body: {"cases": [...]} (or a bare list) for inline cases, or
+    {"path": "file.ndjson"} for an NDJSON file in JOBS_INPUT_DIR, plus an
+    optional local "callback_url" that is POSTed the job summary when done.
+    """
+    try:
+        data = request.get_json(silent=True)
+        options = data if isinstance(data, dict) else {}
+        callback_url = validate_callback_url(options.get('callback_url'))
+        
+        if options.get('path') is not None:
+            source = resolve_job_input(options['path'])
+            cases = None
+            total = count_ndjson_cases(source)
+        else:
+            cases = options.get('cases') if isinstance(data, dict) else data
+            if not isinstance(cases, list) or not cases:
+                raise JobError('A non-empty list of cases or a path is required')
+            if len(cases) > JOBS_MAX_INLINE_ITEMS:
+                raise JobError(f'Too many cases: {len(cases)} (max {JOBS_MAX_INLINE_ITEMS}); '
+                               f'use an input file', 413)
+            source = 'inline'
+            total = len(cases)
+        
+        runner = get_job_runner()
+        job_id = runner.store.create(source, total, cases, callback_url, JOBS_MAX_QUEUED)
+        runner.notify()
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'total': total,
+            'status_url': f'/jobs/{job_id}'
+        }), 202
+        
+    except JobError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job progress plus a page of the results committed so far (?offset=&limit=)"""
+    runner = get_job_runner()
+    runner.start()
+    job = runner.store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job', 'status': 'error'}), 404
+    
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', JOBS_RESULTS_PAGE, type=int), 0), JOBS_RESULTS_PAGE)
+    results = runner.store.results(job_id, offset, limit)
+    
+    summary = summarize_job(job)
+    summary.update(results=results, offset=offset,
+                   next_offset=offset + len(results) if offset + len(results) < job['done'] else None)
+    return jsonify(summary)
+
+def parse_feedback_case(predictor, case):
+    """Validate one confirmed case and attach the model class its diagnosis maps to"""
+    if not isinstance(case, dict):
+        raise FeedbackError('case must be an object')
+    if not isinstance(case.get('symptoms'), list) or not case['symptoms']:
+        raise FeedbackError('symptoms must be a non-empty list')
+    diagnosis = case.get('diagnosis')
+    if not isinstance(diagnosis, str) or not diagnosis.strip():
+        raise FeedbackError('diagnosis is required')
+    for field in ('prediction_id', 'confirmed_by'):
+        if not isinstance(case.get(field), str) or not case[field].strip():
+            raise FeedbackError(f'{field} is required')
+    
+    # Rejects field values the model could not featurize before they reach the training set
+    predictor.feature_engine.transform([case])
+    
+    parsed = {field: case[field] for field in CASE_FIELDS if case.get(field) is not None}
+    parsed.update(diagnosis=diagnosis.strip(), disease=match_diagnosis(diagnosis, predictor.classes),
+                  prediction_id=case['prediction_id'].strip(), confirmed_by=case['confirmed_by'].strip())
+    return parsed
+
+def check_feedback_token():
+    """Reject feedback unless it carries FEEDBACK_API_TOKEN (refused outright while the token is unset)"""
+    if not FEEDBACK_API_TOKEN:
+        raise FeedbackError('Feedback is disabled: FEEDBACK_API_TOKEN is not set', 503)
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+    if not hmac.compare_digest(token.encode('utf-8'), FEEDBACK_API_TOKEN.encode('utf-8')):
+        raise FeedbackError('A valid feedback token is required', 401)
+
+@app.route('/feedback', methods=['POST'])
+def submit_feedback():
+    """
+    Store vet-confirmed diagnoses for online learning
+    
+    Body: {"cases": [...]}, a bare list or a single case; each case carries the
+    /predict fields plus "diagnosis", "prediction_id" and "confirmed_by" (the
+    vet's user id). Requires "Authorization: Bearer <FEEDBACK_API_TOKEN>".
+    Invalid cases, and cases beyond FEEDBACK_MAX_PER_PREDICTION for their
+    prediction, are reported by index and the rest are stored.
+    """
+    try:
+        check_feedback_token()
+        predictor = get_predictor()
+        
+        data = request.get_json(silent=True)
+        cases = data.get('cases', [data]) if isinstance(data, dict) else data
+        if not isinstance(cases, list) or not cases:
+            raise FeedbackError('A case or a non-empty list of cases is required')
+        if len(cases) > PREDICT_BATCH_MAX_ITEMS:
+            raise FeedbackError(f'Too many cases: {len(cases)} (max {PREDICT_BATCH_MAX_ITEMS})', 413)
+        
+        parsed, indices, errors = [], [], []
+        for i, case in enumerate(cases):
+            try:
+                parsed.append(parse_feedback_case(predictor, case))
+                indices.append(i)
+            except Exception as e:
+                errors.append({'index': i, 'error': str(e)})
+        if not parsed:
+            return jsonify({'accepted': 0, 'errors': errors, 'status': 'error'}), 400
+        
+        updater = get_model_updater()
+        results = updater.store.add(parsed, FEEDBACK_MAX_PER_PREDICTION)
+        stored = [case for case, case_id in zip(parsed, results) if case_id is not None]
+        ids = [case_id for case_id in results if case_id is not None]
+        errors.extend({'index': i, 'error': f'prediction {case["prediction_id"]} already has '
+                                            f'{FEEDBACK_MAX_PER_PREDICTION} confirmed diagnoses'}
+                      for i, case, case_id in zip(indices, parsed, results) if case_id is None)
+        errors.sort(key=lambda error: error['index'])
+        if not ids:
+            return jsonify({'accepted': 0, 'errors': errors, 'status': 'error'}), 429
+        updater.start()
+        
+        return jsonify({
+            'accepted': len(ids),
+            'ids': ids,
+            # Stored, but only a full retrain can learn a disease the model has no class for
+            'unknown_disease': [case['diagnosis'] for case in stored if case['disease'] is None],
+            'errors': errors,
+            'status': 'success'
+        })
+        
+    except FeedbackError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), e.status_code
+    except Exception as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+@app.route('/feedback/stats', methods=['GET'])
+def feedback_stats():
+    """Confirmed-case counters, the last model update and the model this worker serves"""
+    updater = get_model_updater()
+    try:
+        shipped_model = updater.shipped_model
+    except OSError:
+        # No disease_model.pkl to hash (lean-only deploy or failed load): no update lineage to report
+        shipped_model = None
+    stats = updater.store.stats(shipped_model)
+    stats.update(
+        shipped_model=shipped_model,
+        serving=dict(training_date=model_state['training_date'], reloads=model_state['reloads'],
+                     model_path=predictor.model_path if predictor is not None else None, pid=os.getpid()),
+        updater=dict(interval=ONLINE_UPDATE_INTERVAL, min_cases=ONLINE_MIN_CASES,
+                     trees_per_update=ONLINE_TREES_PER_UPDATE, max_added_trees=ONLINE_MAX_ADDED_TREES,
+                     duty_cycle=ONLINE_DUTY_CYCLE)
+    )
+    return jsonify(stats)
+
 if __name__ == '__main__':
+    get_job_runner().start()
+    get_model_watcher().start()
+    get_model_updater().start()
     port = int(os.environ.get('PORT', 5002))  # Default to 5002 for local dev
     print(f"🚀 Disease Prediction API starting on port {port}...")
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for the Disease Prediction API
+
+Loads the model once in the master process before forking so every worker
+shares the same pages: the imported libraries and model package are inherited
+copy-on-write, and the flattened forest arrays are memory-mapped read-only
+from disease_model_forest/. gc.freeze() moves everything loaded so far into
+the permanent generation, so worker garbage collections do not write to (and
+un-share) those pages.
+
+Usage:
+    gunicorn -c gunicorn.conf.py flask_api:app
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5002')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# More than one thread per worker lets PREDICT_MICROBATCH_WINDOW_MS coalesce requests
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = True
+
+# Avoid collections while the master is still building the shared heap
+gc.disable()
+
+
+def when_ready(server):
+    """Load the predictor in the master, then freeze the heap before any fork"""
+    import flask_api
+
+    try:
+        flask_api.get_predictor()
+        server.log.info("Model preloaded in master (pid %s)", os.getpid())
+    except Exception as e:
+        # Workers fall back to loading lazily on their first /predict
+        server.log.warning("Model preload failed: %s", e)
+
+    # Workers inherit an enabled collector that never scans the frozen objects
+    gc.freeze()
+    gc.enable()
+
+
+def post_fork(server, worker):
+    """Start this worker's inference processes (INFERENCE_PROCESSES), job runners and model threads before it takes traffic"""
+    import flask_api
+
+    current = flask_api.predictor
+    if current is not None and current.pool is not None:
+        current.pool.start()
+
+    # The quality policy's queue depth includes connections waiting on the shared listen socket,
+    # which is where requests queue when each worker runs one thread
+    flask_api.watch_listen_backlog([getattr(listener, 'sock', listener) for listener in worker.sockets],
+                                   server.cfg.workers)
+
+    # Also picks up jobs left behind by a worker that died mid-job
+    flask_api.get_job_runner().start()
+
+    # Reload published online-learning versions; the updater also starts on the first POST /feedback
+    flask_api.get_model_watcher().start()
+    flask_api.get_model_updater().start()
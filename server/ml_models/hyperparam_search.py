@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Random Forest Hyperparameter Search
+
+Evaluates a grid (or a random sample of it) of RandomForestClassifier
+settings on the training split train_model.py uses, fanned out over a
+process pool, and reports the latency-vs-accuracy Pareto front:
+
+    accuracy     mean top-1 accuracy over stratified CV folds of the training split
+    top-3        mean share of fold rows whose disease is in the top 3
+    fit s        mean fit time per fold (one core)
+    model KB     pickled size of the forest fitted on the whole training split
+    µs/row       NumPy FlatForest scoring time of that forest, one row per call
+                 and batched over the held-out rows (what production serves with)
+    held-out     accuracy of that forest on the held-out split (reported, not
+                 used for the front)
+
+A config is on the front when no other config is at least as accurate and at
+least as fast for single rows, and strictly better in one of the two. Latency
+is measured serially after the pool has finished so the configs do not
+compete for cores while being timed. Every config is written to a CSV.
+
+Usage:
+    python3 hyperparam_search.py
+    python3 hyperparam_search.py --n-estimators 25,50,100 --max-depth 8,12,none --sample 20
+    python3 hyperparam_search.py --save 7 --out disease_model.pkl
+
+    --save ID retrains the config with that id (see the table or CSV) through
+    the normal AnimalDiseasePredictor pipeline and saves it as the model
+    package, with its encoder tables, flattened forest and lean manifest.
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from forest_engine import FlatForest, top_k_rows
+from train_model import AnimalDiseasePredictor, DEFAULT_HYPERPARAMS
+
+CSV_PATH = 'animal_disease_prediction.csv'
+MODEL_PATH = 'disease_model.pkl'
+RESULTS_PATH = 'hyperparam_search.csv'
+
+# Same split as AnimalDiseasePredictor.train_model
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+REPEATS = 3
+
+# Training split shared with forked pool workers
+_data = {}
+
+
+def parse_values(spec: str) -> List[Any]:
+    """
+    Parse a comma-separated list of hyperparameter values
+
+    Integers and floats are converted, 'none' becomes None and anything
+    else (e.g. 'sqrt') is kept as a string.
+
+    Args:
+        spec (str): e.g. "8,12,none" or "sqrt,0.5"
+
+    Returns:
+        list: Parsed values
+    """
+    values = []
+    for part in (part.strip() for part in spec.split(',')):
+        if not part:
+            continue
+        if part.lower() == 'none':
+            values.append(None)
+            continue
+        try:
+            values.append(int(part))
+        except ValueError:
+            try:
+                values.append(float(part))
+            except ValueError:
+                values.append(part)
+    return values
+
+
+def build_configs(grid: Dict[str, List[Any]], sample: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Expand the grid into configs (DEFAULT_HYPERPARAMS fills unsearched settings)
+
+    Args:
+        grid (dict): Setting -> candidate values
+        sample (int): Keep only this many configs, drawn at random (None = all)
+
+    Returns:
+        list: Config dicts, each with an 'id'
+    """
+    names = list(grid)
+    configs = [{**DEFAULT_HYPERPARAMS, **dict(zip(names, values))}
+               for values in itertools.product(*(grid[name] for name in names))]
+    if sample is not None and sample < len(configs):
+        configs = random.Random(RANDOM_STATE).sample(configs, sample)
+    return [{'id': i, **config} for i, config in enumerate(configs)]
+
+
+def load_training_data(csv_path: str):
+    """
+    Preprocess the CSV exactly like train_model.py and split it the same way
+
+    Args:
+        csv_path (str): Training CSV
+
+    Returns:
+        tuple: (X_train, X_test, y_train, y_test) as NumPy arrays
+    """
+    predictor = AnimalDiseasePredictor(csv_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.load_data()
+        X, y = predictor.preprocess_data()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X.to_numpy(dtype=np.float64), y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+    return X_train, X_test, y_train, y_test
+
+
+def forest_params(config: Dict[str, Any]) -> Dict[str, Any]:
+    """RandomForestClassifier keyword arguments of a config"""
+    return {name: config[name] for name in config if name != 'id'}
+
+
+def evaluate_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cross-validate one config and fit it on the whole training split (pool worker)
+
+    Args:
+        config (dict): build_configs() entry
+
+    Returns:
+        dict: Metrics plus 'forest_dir', the saved flattened forest for timing
+    """
+    X_train, y_train = _data['X_train'], _data['y_train']
+    X_test, y_test = _data['X_test'], _data['y_test']
+    params = forest_params(config)
+
+    folds = StratifiedKFold(n_splits=_data['folds'], shuffle=True, random_state=RANDOM_STATE)
+    accuracies, top3, fit_times = [], [], []
+    for train_idx, test_idx in folds.split(X_train, y_train):
+        model = RandomForestClassifier(**params, random_state=RANDOM_STATE, n_jobs=1)
+        start = time.perf_counter()
+        model.fit(X_train[train_idx], y_train[train_idx])
+        fit_times.append(time.perf_counter() - start)
+
+        # Folds may miss a class, so map probability columns back through classes_
+        predicted = model.classes_[top_k_rows(model.predict_proba(X_train[test_idx]), 3)]
+        expected = y_train[test_idx]
+        accuracies.append(float(np.mean(predicted[:, 0] == expected)))
+        top3.append(float(np.mean(np.any(predicted == expected[:, None], axis=1))))
+
+    model = RandomForestClassifier(**params, random_state=RANDOM_STATE, n_jobs=1)
+    model.fit(X_train, y_train)
+    forest = FlatForest.from_sklearn(model)
+    forest_dir = forest.save(os.path.join(_data['workdir'], f"config_{config['id']}"))
+
+    return {
+        **config,
+        'accuracy': float(np.mean(accuracies)),
+        'accuracy_std': float(np.std(accuracies)),
+        'top3': float(np.mean(top3)),
+        'fit_s': float(np.mean(fit_times)),
+        'model_bytes': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        'nodes': len(forest.feature),
+        'held_out': float(np.mean(model.predict(X_test) == y_test)),
+        'forest_dir': forest_dir
+    }
+
+
+def time_forest(forest: FlatForest, X: np.ndarray):
+    """
+    NumPy scoring time per row in microseconds (best of REPEATS passes)
+
+    Args:
+        forest (FlatForest): Forest to time
+        X (np.ndarray): Rows to score
+
+    Returns:
+        tuple: (one row per call, all rows in one call)
+    """
+    forest.predict_proba_row(X[0], use_numba=False)
+    single = batch = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for row in X:
+            forest.predict_proba_row(row, use_numba=False)
+        single = min(single, time.perf_counter() - start)
+        start = time.perf_counter()
+        forest.predict_proba(X, use_numba=False)
+        batch = min(batch, time.perf_counter() - start)
+    return single / len(X) * 1e6, batch / len(X) * 1e6
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Configs not dominated on (accuracy up, single-row latency down)
+
+    Args:
+        results (list): Evaluated configs with 'accuracy' and 'us_per_row'
+
+    Returns:
+        list: Front configs, fastest first
+    """
+    front = []
+    best_accuracy = -1.0
+    for result in sorted(results, key=lambda r: (r['us_per_row'], -r['accuracy'])):
+        if result['accuracy'] > best_accuracy:
+            front.append(result)
+            best_accuracy = result['accuracy']
+    return front
+
+
+def print_table(rows: List[Dict[str, Any]], names: List[str]):
+    """
+    Print configs with their metrics
+
+    Args:
+        rows (list): Evaluated configs
+        names (list): Hyperparameter columns to show
+    """
+    widths = [len(name) + 2 for name in names]
+    header = f"{'id':>4}" + ''.join(f"{name:>{width}}" for name, width in zip(names, widths))
+    print(header + f"{'accuracy':>14}{'top-3':>8}{'fit s':>7}{'model KB':>10}"
+          f"{'µs/row':>8}{'batch':>7}{'held-out':>10}")
+    print("-" * (len(header) + 64))
+    for row in rows:
+        accuracy = f"{row['accuracy']:.1%}±{row['accuracy_std']:.1%}"
+        print(f"{row['id']:>4}" + ''.join(f"{str(row[name]):>{width}}" for name, width in zip(names, widths))
+              + f"{accuracy:>14}{row['top3']:>8.1%}{row['fit_s']:>7.2f}{row['model_bytes'] / 1024:>10.0f}"
+                f"{row['us_per_row']:>8.1f}{row['us_per_row_batch']:>7.1f}{row['held_out']:>10.1%}")
+
+
+def save_config(config: Dict[str, Any], csv_path: str, model_path: str) -> str:
+    """
+    Train a config through the normal pipeline and save it as the model package
+
+    Args:
+        config (dict): Config to train
+        csv_path (str): Training CSV
+        model_path (str): Destination .pkl path
+
+    Returns:
+        str: Path of the saved package
+    """
+    predictor = AnimalDiseasePredictor(csv_path)
+    predictor.load_data()
+    X, y = predictor.preprocess_data()
+    X_train, X_test, y_train, y_test = predictor.train_model(X, y, hyperparams=forest_params(config))
+    accuracy = float(np.mean(predictor.model.predict(X_test) == y_test))
+    print(f"🎯 Held-out accuracy: {accuracy:.4f}")
+    return predictor.save_model(os.path.abspath(model_path))
+
+
+def main(argv=None):
+    """
+    Run the search, print the Pareto front and optionally save one config
+    """
+    parser = argparse.ArgumentParser(description="Search RandomForest hyperparameters for accuracy vs latency")
+    parser.add_argument('--csv', default=CSV_PATH, help="Training CSV")
+    parser.add_argument('--n-estimators', default='25,50,100,200', help="Values to try (default 25,50,100,200)")
+    parser.add_argument('--max-depth', default='8,12,15,none', help="Values to try, none = unlimited")
+    parser.add_argument('--min-samples-leaf', default='1,2,4', help="Values to try (default 1,2,4)")
+    parser.add_argument('--max-features', default='sqrt,log2,0.5', help="Values to try (default sqrt,log2,0.5)")
+    parser.add_argument('--sample', type=int, help="Evaluate this many random grid points instead of all")
+    parser.add_argument('--folds', type=int, default=3, help="Stratified CV folds (default 3)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: all cores)")
+    parser.add_argument('--results', default=RESULTS_PATH, help=f"CSV of every config (default {RESULTS_PATH})")
+    parser.add_argument('--all', action='store_true', help="Print every config, not only the front")
+    parser.add_argument('--save', type=int, help="Config id to train and save as the model package")
+    parser.add_argument('--out', default=MODEL_PATH, help=f"Package path for --save (default {MODEL_PATH})")
+    args = parser.parse_args(argv)
+
+    grid = {
+        'n_estimators': parse_values(args.n_estimators),
+        'max_depth': parse_values(args.max_depth),
+        'min_samples_leaf': parse_values(args.min_samples_leaf),
+        'max_features': parse_values(args.max_features)
+    }
+    configs = build_configs(grid, args.sample)
+
+    print("🔎 RANDOM FOREST HYPERPARAMETER SEARCH")
+    print("=" * 50)
+    X_train, X_test, y_train, y_test = load_training_data(args.csv)
+    print(f"📊 {len(X_train)} training rows ({args.folds} stratified folds), {len(X_test)} held-out rows")
+    print(f"🧮 {len(configs)} configs on {args.processes} processes")
+
+    workdir = tempfile.mkdtemp(prefix='hyperparam_search_')
+    _data.update(X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test,
+                 folds=args.folds, workdir=workdir)
+    results = []
+    start = time.perf_counter()
+    try:
+        if args.processes > 1:
+            # Workers inherit the training data through fork where available
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ctx.Pool(args.processes) as pool:
+                for result in pool.imap_unordered(evaluate_config, configs):
+                    results.append(result)
+                    print(f"  ✅ {len(results)}/{len(configs)} configs", end='\r', flush=True)
+        else:
+            for config in configs:
+                results.append(evaluate_config(config))
+                print(f"  ✅ {len(results)}/{len(configs)} configs", end='\r', flush=True)
+        print(f"\n⏱️  Search took {time.perf_counter() - start:.1f}s; timing inference...")
+
+        for result in results:
+            forest = FlatForest.load(result.pop('forest_dir'))
+            result['us_per_row'], result['us_per_row_batch'] = time_forest(forest, X_test)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results.sort(key=lambda r: r['id'])
+    front = pareto_front(results)
+    front_ids = {r['id'] for r in front}
+    pd.DataFrame([{**r, 'pareto': r['id'] in front_ids} for r in results]).to_csv(args.results, index=False)
+
+    print(f"\n📈 PARETO FRONT ({len(front)} of {len(results)} configs, fastest first)")
+    print_table(front, list(grid))
+    if args.all:
+        print(f"\n📋 ALL CONFIGS")
+        print_table(results, list(grid))
+    print(f"\n📄 Results saved to: {args.results}")
+
+    if args.save is None:
+        return
+    config = next((r for r in results if r['id'] == args.save), None)
+    if config is None:
+        print(f"❌ No config with id {args.save}")
+        sys.exit(1)
+    chosen = {name: config[name] for name in ['id', *DEFAULT_HYPERPARAMS]}
+    print(f"\n💾 Training config {args.save} for production: {forest_params(chosen)}")
+    save_config(chosen, args.csv, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Process-Pool Inference Offload
+
+Forest scoring is CPU-bound and holds the GIL, so in a threaded worker every
+other connection stalls while one request is being scored. InferencePool
+moves the scoring into a fixed set of inference processes: the front end
+keeps parsing requests, featurizing and rendering JSON, and only the
+feature matrix crosses the process boundary.
+
+Each inference process owns a pair of shared-memory buffers (features in,
+probabilities out) sized for max_rows rows. The front end writes the rows
+into the input buffer and sends the row count (and how many trees to use)
+over a pipe; the process scores them in place and answers with a one-byte
+status. Nothing but those two counts is pickled. Processes are started with 'spawn' and load only the
+memory-mapped flattened forest (no sklearn), so they start fast and share
+the forest pages through the page cache. The directory may hold either
+forest format (FlatForest or CompactForest).
+
+Front-end threads block in a pipe read while their rows are scored, which
+releases the GIL, so scoring in N processes runs on N cores while the
+front end keeps serving.
+
+Configuration (environment variables, read by flask_api.py):
+    INFERENCE_PROCESSES      number of inference processes (default 0 = score in-process)
+    INFERENCE_MAX_ROWS       rows per shared-memory buffer (default 256)
+
+A request that finds no free process for SLOT_TIMEOUT_SECONDS fails with
+RuntimeError instead of waiting forever (e.g. if respawning keeps failing).
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Optional
+
+from compact_forest import load_forest_dir
+
+_OK = b'\x00'
+
+# Longest a request waits for a free inference process
+SLOT_TIMEOUT_SECONDS = 30.0
+
+
+def _inference_process(forest_dir, in_name, out_name, max_rows, n_features, n_classes, conn):
+    """Inference process main loop: score the rows the front end wrote, until told to stop"""
+    forest = load_forest_dir(forest_dir)
+    # Spawned processes share the front end's resource tracker, which unlinks the blocks
+    in_shm = shared_memory.SharedMemory(name=in_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    inputs = np.ndarray((max_rows, n_features), dtype=np.float64, buffer=in_shm.buf)
+    outputs = np.ndarray((max_rows, n_classes), dtype=np.float64, buffer=out_shm.buf)
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            n_rows, n_trees = message
+            try:
+                scorer = forest if n_trees is None else forest.subset(n_trees)
+                outputs[:n_rows] = scorer.predict_proba(inputs[:n_rows])
+                conn.send_bytes(_OK)
+            except Exception as e:
+                conn.send_bytes(str(e).encode('utf-8') or b'error')
+    finally:
+        del inputs, outputs
+        in_shm.close()
+        out_shm.close()
+
+
+class _Slot:
+    """One inference process plus its shared buffers and control pipe"""
+
+    def __init__(self, ctx, forest_dir, max_rows, n_features, n_classes):
+        self.in_shm = shared_memory.SharedMemory(create=True, size=max_rows * n_features * 8)
+        self.out_shm = shared_memory.SharedMemory(create=True, size=max_rows * n_classes * 8)
+        self.inputs = np.ndarray((max_rows, n_features), dtype=np.float64, buffer=self.in_shm.buf)
+        self.outputs = np.ndarray((max_rows, n_classes), dtype=np.float64, buffer=self.out_shm.buf)
+
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_inference_process, name='inference', daemon=True,
+            args=(forest_dir, self.in_shm.name, self.out_shm.name, max_rows, n_features, n_classes, child_conn))
+        self.process.start()
+        child_conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+        del self.inputs, self.outputs
+        for shm in (self.in_shm, self.out_shm):
+            shm.close()
+            shm.unlink()
+
+
+class InferencePool:
+    """
+    Fixed pool of forest-scoring processes fed through shared memory
+    """
+
+    def __init__(self, forest_dir, n_features, n_classes, processes=2, max_rows=256,
+                 slot_timeout=SLOT_TIMEOUT_SECONDS):
+        """
+        Configure the pool (processes start on first use, once per front-end process)
+
+        Args:
+            forest_dir (str): Flattened forest directory (forest_engine.forest_path)
+            n_features (int): Feature columns per row
+            n_classes (int): Probability columns per row
+            processes (int): Number of inference processes
+            max_rows (int): Rows per shared-memory buffer (larger inputs are split)
+            slot_timeout (float): Seconds to wait for a free process before failing
+        """
+        self.forest_dir = forest_dir
+        self.n_features = int(n_features)
+        self.n_classes = int(n_classes)
+        self.processes = max(int(processes), 1)
+        self.max_rows = max(int(max_rows), 1)
+        self.slot_timeout = float(slot_timeout)
+
+        self._lock = threading.Lock()
+        self._ctx = None
+        self._pid = None
+        self._slots = []
+        self._free = None
+
+    def start(self):
+        """Start the inference processes for this process (no-op if already running here)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Slots inherited through a fork belong to the parent; leave them alone
+            self._ctx = multiprocessing.get_context('spawn')
+            self._slots = [self._new_slot() for _ in range(self.processes)]
+            self._free = queue.Queue()
+            for slot in self._slots:
+                self._free.put(slot)
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def _new_slot(self):
+        return _Slot(self._ctx, self.forest_dir, self.max_rows, self.n_features, self.n_classes)
+
+    def _replace(self, slot):
+        """Swap a slot whose process died for a fresh one"""
+        with self._lock:
+            fresh = self._new_slot()
+            self._slots[self._slots.index(slot)] = fresh
+        slot.close()
+        return fresh
+
+    def close(self):
+        """Stop the inference processes and free their shared memory"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            for slot in self._slots:
+                slot.close()
+            self._slots = []
+            self._pid = None
+
+    def _take(self):
+        """Wait for a free slot, up to slot_timeout seconds"""
+        try:
+            return self._free.get(timeout=self.slot_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No inference process became free within {self.slot_timeout:g}s") from None
+
+    def _dispatch(self, slot, rows, n_trees=None):
+        """
+        Write rows into a slot's input buffer and wake its process (respawning it if it died)
+
+        If that fails, the slot (or its replacement) goes back to the free queue before the error propagates.
+        """
+        try:
+            if not slot.process.is_alive():
+                slot = self._replace(slot)
+            slot.inputs[:len(rows)] = rows
+            try:
+                slot.conn.send((len(rows), n_trees))
+            except OSError:
+                slot = self._replace(slot)
+                slot.inputs[:len(rows)] = rows
+                slot.conn.send((len(rows), n_trees))
+        except BaseException:
+            self._free.put(slot)
+            raise
+        return slot
+
+    def _collect(self, slot, out, start, n_rows):
+        """Wait for one slot's answer, copy its rows out and hand the slot back (even if respawning fails)"""
+        try:
+            try:
+                status = slot.conn.recv_bytes()
+            except (EOFError, OSError):
+                status = b'inference process exited'
+                slot = self._replace(slot)
+            if status == _OK:
+                out[start:start + n_rows] = slot.outputs[:n_rows]
+        finally:
+            self._free.put(slot)
+        if status != _OK:
+            raise RuntimeError(f"Inference process failed: {status.decode('utf-8', 'replace')}")
+
+    def predict_proba(self, X: np.ndarray, out: Optional[np.ndarray] = None,
+                      n_trees: Optional[int] = None) -> np.ndarray:
+        """
+        Score a feature matrix in the inference processes
+
+        Inputs larger than max_rows are split and the chunks scored in
+        parallel on as many processes as are free.
+
+        Args:
+            X (np.ndarray): Feature matrix (n_rows, n_features)
+            out (np.ndarray): Optional (n_rows, n_classes) output array
+            n_trees (int): Score with only the first n_trees trees (default: all)
+
+        Returns:
+            np.ndarray: Class probabilities of shape (n_rows, n_classes)
+        """
+        self.start()
+        X = np.atleast_2d(X)
+        if out is None:
+            out = np.empty((X.shape[0], self.n_classes), dtype=np.float64)
+
+        pending = []
+        error = None
+        try:
+            for start in range(0, X.shape[0], self.max_rows):
+                n_rows = min(self.max_rows, X.shape[0] - start)
+
+                # Never wait for a slot while holding busy ones of our own (could deadlock)
+                while True:
+                    try:
+                        slot = self._free.get_nowait() if pending else self._take()
+                        break
+                    except queue.Empty:
+                        self._collect(*pending.pop(0))
+
+                slot = self._dispatch(slot, X[start:start + n_rows], n_trees)
+                pending.append((slot, out, start, n_rows))
+        finally:
+            # Drain every pending slot so none keeps an unread status for the next request
+            for item in pending:
+                try:
+                    self._collect(*item)
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            raise error
+        return out
+
+    def stats(self):
+        """
+        Pool configuration and liveness for this process
+
+        Returns:
+            dict: Process count, buffer size and alive/idle process counts
+        """
+        running = self._pid == os.getpid()
+        return {
+            'processes': self.processes,
+            'max_rows': self.max_rows,
+            'started': running,
+            'alive': sum(slot.process.is_alive() for slot in self._slots) if running else 0,
+            'idle': self._free.qsize() if running else 0
+        }
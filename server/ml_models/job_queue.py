@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Persistent Prediction Jobs
+
+Bulk scoring that does not fit in one HTTP request (the Node caller gives up
+after 45 s) runs as a job: POST /jobs stores the job and returns its id at
+once, background runner threads score it chunk by chunk, and GET /jobs/<id>
+reports progress and pages through the results.
+
+Jobs, their inline input and their results live in a local SQLite file (WAL
+mode) shared by every gunicorn worker, so a job survives the worker that was
+running it: each chunk's results are committed together with the progress
+counter, and a job whose runner process died (or stopped heartbeating) is
+claimed again by another worker and resumes after its last committed chunk.
+
+Each worker runs at most JOBS_WORKERS runner threads, and a runner sleeps
+between chunks so that it uses at most JOBS_DUTY_CYCLE of a core: job
+scoring shares the worker with interactive /predict traffic and must never
+starve it.
+
+On completion an optional callback URL (local hosts only) receives a JSON
+summary of the job.
+
+Configuration (environment variables, read by flask_api.py):
+    JOBS_DB_PATH             SQLite file (default: petcarehub_jobs.sqlite in the temp dir)
+    JOBS_WORKERS             runner threads per worker (default 1, 0 = accept but do not run jobs)
+    JOBS_CHUNK               cases scored per chunk (default 256)
+    JOBS_DUTY_CYCLE          fraction of time a runner may spend scoring (default 0.5)
+    JOBS_MAX_QUEUED          queued + running jobs before POST /jobs answers 429 (default 100)
+    JOBS_RETENTION_SECONDS   finished jobs are deleted after this long (default 7 days)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import List, Dict, Any, Callable, Iterator, Optional
+
+# Writers (progress commits from several workers) may wait this long for each other
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# A running job whose runner has not committed anything for this long is reclaimed
+STALE_SECONDS = 60.0
+
+# Hosts a completion callback may be sent to
+LOCAL_CALLBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+CALLBACK_TIMEOUT_SECONDS = 5.0
+CALLBACK_ATTEMPTS = 3
+
+
+class JobError(Exception):
+    """A job request was rejected (bad input, queue full, unknown job)"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """Whether the runner process that claimed a job still exists (owners are 'pid-thread')"""
+    try:
+        os.kill(int(str(owner).split('-')[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def validate_callback_url(url: Optional[str]) -> Optional[str]:
+    """
+    Accept only http(s) callback URLs pointing at this host
+
+    Args:
+        url (str): Callback URL from the request (None = no callback)
+
+    Returns:
+        str: The URL unchanged
+
+    Raises:
+        JobError: When the URL is not a local http(s) URL
+    """
+    if url is None:
+        return None
+    parsed = urllib.parse.urlparse(str(url))
+    if parsed.scheme not in ('http', 'https') or parsed.hostname not in LOCAL_CALLBACK_HOSTS:
+        raise JobError(f"callback_url must be an http(s) URL on {', '.join(LOCAL_CALLBACK_HOSTS)}")
+    return url
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared between processes
+    """
+
+    def __init__(self, path, retention_seconds=7 * 24 * 3600.0):
+        """
+        Open (or create) the job database
+
+        Args:
+            path (str): SQLite database path
+            retention_seconds (float): How long finished jobs are kept
+        """
+        self.path = path
+        self.retention_seconds = float(retention_seconds)
+        self._local = threading.local()
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread, per-process connection (reopened after a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                            id TEXT PRIMARY KEY,
+                            status TEXT NOT NULL,
+                            source TEXT NOT NULL,
+                            total INTEGER,
+                            done INTEGER NOT NULL DEFAULT 0,
+                            errors INTEGER NOT NULL DEFAULT 0,
+                            chunks INTEGER NOT NULL DEFAULT 0,
+                            callback_url TEXT,
+                            callback_status TEXT,
+                            error TEXT,
+                            owner TEXT,
+                            created_at REAL NOT NULL,
+                            started_at REAL,
+                            heartbeat_at REAL,
+                            finished_at REAL)''')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS job_inputs (
+                            job_id TEXT PRIMARY KEY,
+                            payload TEXT NOT NULL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS job_results (
+                            job_id TEXT NOT NULL,
+                            chunk INTEGER NOT NULL,
+                            first INTEGER NOT NULL,
+                            payload TEXT NOT NULL,
+                            n_rows INTEGER,
+                            PRIMARY KEY (job_id, chunk))''')
+        # Databases created before n_rows existed: count the rows of the chunks already stored
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(job_results)')]
+        if 'n_rows' not in columns:
+            conn.execute('ALTER TABLE job_results ADD COLUMN n_rows INTEGER')
+            conn.execute('UPDATE job_results SET n_rows = json_array_length(payload) WHERE n_rows IS NULL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def create(self, source: str, total: Optional[int], cases: Optional[List[Any]] = None,
+               callback_url: Optional[str] = None, max_active: Optional[int] = None) -> str:
+        """
+        Queue a new job
+
+        Args:
+            source (str): 'inline' or the server-local input file path
+            total (int): Number of cases, if known
+            cases (list): Inline cases (stored with the job)
+            callback_url (str): URL notified on completion
+            max_active (int): Refuse the job when this many are queued or running
+
+        Returns:
+            str: The new job id
+
+        Raises:
+            JobError: 429 when the queue is full
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._purge_finished(conn, now)
+            if max_active is not None:
+                active = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+                if active >= max_active:
+                    raise JobError(f"Too many jobs in progress ({active}); try again later", 429)
+            conn.execute('INSERT INTO jobs (id, status, source, total, callback_url, created_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (job_id, 'queued', source, total, callback_url, now))
+            if cases is not None:
+                conn.execute('INSERT INTO job_inputs VALUES (?, ?)', (job_id, json.dumps(cases)))
+        return job_id
+
+    def _purge_finished(self, conn, now):
+        """Delete finished jobs past retention (inside a transaction)"""
+        expired = [row[0] for row in conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+            (now - self.retention_seconds,))]
+        for table, column in (('job_results', 'job_id'), ('job_inputs', 'job_id'), ('jobs', 'id')):
+            conn.executemany(f'DELETE FROM {table} WHERE {column} = ?', [(job_id,) for job_id in expired])
+
+    def claim(self, owner: str, stale_seconds: float = STALE_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job, or a running job whose runner died or went quiet
+
+        Args:
+            owner (str): Runner identity recorded on the job
+            stale_seconds (float): Heartbeat age after which a running job is reclaimed
+
+        Returns:
+            dict: The claimed job or None when there is nothing to do
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Active jobs are capped by max_active, so checking them all is cheap
+            active = conn.execute("SELECT id, status, owner, heartbeat_at FROM jobs "
+                                  "WHERE status IN ('queued', 'running') ORDER BY created_at").fetchall()
+            job_id = next((job_id for job_id, status, job_owner, heartbeat_at in active
+                           if status == 'queued' or heartbeat_at < now - stale_seconds
+                           or not _owner_alive(job_owner)), None)
+            if job_id is None:
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?, "
+                         "started_at = COALESCE(started_at, ?) WHERE id = ?", (owner, now, now, job_id))
+        return self.get(job_id)
+
+    def inline_cases(self, job_id: str) -> List[Any]:
+        """Inline cases stored with a job"""
+        row = self._connection().execute('SELECT payload FROM job_inputs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def save_chunk(self, job_id: str, owner: str, results: List[Dict[str, Any]]) -> bool:
+        """
+        Commit one chunk of results together with the progress counters
+
+        Args:
+            job_id (str): Job id
+            owner (str): Runner that claimed the job
+            results (list): Per-case results of the chunk
+
+        Returns:
+            bool: False if the job was reclaimed by another runner (stop working on it)
+        """
+        errors = sum(1 for result in results if result.get('status') != 'success')
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT owner, chunks, done FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row[0] != owner:
+                return False
+            chunk, first = row[1], row[2]
+            conn.execute('INSERT INTO job_results (job_id, chunk, first, payload, n_rows) VALUES (?, ?, ?, ?, ?)',
+                         (job_id, chunk, first, json.dumps(results, ensure_ascii=False), len(results)))
+            conn.execute('UPDATE jobs SET chunks = chunks + 1, done = done + ?, errors = errors + ?, '
+                         'heartbeat_at = ? WHERE id = ?', (len(results), errors, time.time(), job_id))
+        return True
+
+    def finish(self, job_id: str, owner: str, error: Optional[str] = None):
+        """Mark a job succeeded (or failed with an error message)"""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, heartbeat_at = ?, "
+                         "total = COALESCE(total, done) WHERE id = ? AND owner = ?",
+                         ('failed' if error else 'succeeded', error, now, now, job_id, owner))
+
+    def set_callback_status(self, job_id: str, status: str):
+        conn = self._connection()
+        with conn:
+            conn.execute('UPDATE jobs SET callback_status = ? WHERE id = ?', (status, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job status and progress
+
+        Args:
+            job_id (str): Job id
+
+        Returns:
+            dict: Job fields or None when unknown
+        """
+        cursor = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        A page of a job's results in input order
+
+        Args:
+            job_id (str): Job id
+            offset (int): First result to return
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Results committed so far within [offset, offset + limit)
+        """
+        # Only the chunks overlapping the window are read and decoded
+        rows = self._connection().execute(
+            'SELECT first, payload FROM job_results WHERE job_id = ? AND first + n_rows > ? AND first < ? '
+            'ORDER BY chunk', (job_id, offset, offset + limit)).fetchall()
+        page = []
+        for first, payload in rows:
+            page.extend(json.loads(payload)[max(offset - first, 0):])
+        return page[:limit]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        rows = self._connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+
+class JobRunner:
+    """
+    Bounded pool of background threads that claim and score jobs
+    """
+
+    def __init__(self, store: JobStore,
+                 run_chunks: Callable[[Dict[str, Any], int], Iterator[List[Dict[str, Any]]]],
+                 workers=1, duty_cycle=0.5, poll_seconds=2.0):
+        """
+        Configure the runner (threads start on first use, once per process)
+
+        Args:
+            store (JobStore): Job database
+            run_chunks (callable): run_chunks(job, skip) -> iterator of per-chunk result lists,
+                skipping the first `skip` cases (already committed)
+            workers (int): Runner threads in this process
+            duty_cycle (float): Fraction of wall time a runner may spend scoring (0-1]
+            poll_seconds (float): How often idle runners look for work queued by other workers
+        """
+        self.store = store
+        self.run_chunks = run_chunks
+        self.workers = max(int(workers), 0)
+        self.duty_cycle = min(max(float(duty_cycle), 0.01), 1.0)
+        self.poll_seconds = float(poll_seconds)
+
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """Start this process's runner threads (no-op if already running here or disabled)"""
+        if self._pid == os.getpid() or self.workers == 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            for n in range(self.workers):
+                threading.Thread(target=self._work, name=f'job-runner-{n}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def notify(self):
+        """Wake an idle runner in this process (a job was just queued)"""
+        self.start()
+        self._wakeup.set()
+
+    def _work(self):
+        owner = f"{os.getpid()}-{threading.get_ident()}"
+        while True:
+            try:
+                job = self.store.claim(owner)
+            except sqlite3.Error as e:
+                print(f"⚠️  Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+                continue
+            self._run(job, owner)
+
+    def _run(self, job, owner):
+        """Score one job from its last committed chunk, then notify its callback"""
+        try:
+            # run_chunks scores lazily, so a chunk's cost is the time since the last throttle
+            started = time.perf_counter()
+            for results in self.run_chunks(job, job['done']):
+                if not self.store.save_chunk(job['id'], owner, results):
+                    return  # Reclaimed by another runner
+                self._throttle(time.perf_counter() - started)
+                started = time.perf_counter()
+            self.store.finish(job['id'], owner)
+        except Exception as e:
+            self.store.finish(job['id'], owner, error=str(e))
+        self._send_callback(job['id'])
+
+    def _throttle(self, busy):
+        """Sleep long enough that scoring stays within the duty cycle"""
+        if self.duty_cycle < 1.0:
+            time.sleep(busy * (1.0 - self.duty_cycle) / self.duty_cycle)
+
+    def _send_callback(self, job_id):
+        """POST a job summary to its callback URL, retrying a few times"""
+        job = self.store.get(job_id)
+        if job is None or not job['callback_url']:
+            return
+
+        body = json.dumps(summarize_job(job)).encode('utf-8')
+        status = 'failed'
+        for attempt in range(CALLBACK_ATTEMPTS):
+            try:
+                req = urllib.request.Request(job['callback_url'], data=body, method='POST',
+                                             headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(req, timeout=CALLBACK_TIMEOUT_SECONDS) as response:
+                    status = f"sent ({response.status})"
+                break
+            except (urllib.error.URLError, OSError) as e:
+                status = f"failed: {e}"
+                time.sleep(2 ** attempt)
+        self.store.set_callback_status(job_id, status)
+
+
+def summarize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public view of a job row
+
+    Args:
+        job (dict): Row from JobStore.get
+
+    Returns:
+        dict: Id, status, progress, timings and callback state
+    """
+    total = job['total']
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'source': job['source'],
+        'total': total,
+        'done': job['done'],
+        'errors': job['errors'],
+        'progress': round(job['done'] / total, 4) if total else (1.0 if job['status'] == 'succeeded' else 0.0),
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'callback_url': job['callback_url'],
+        'callback_status': job['callback_status']
+    }
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Lean Inference Artifacts
+
+Cold starts on the sleeping free-tier host are dominated by importing
+sklearn and unpickling disease_model.pkl. Scoring only needs three things,
+all of which are already saved next to the pickle as plain files:
+
+    disease_model_forest/          flattened trees + class list (meta.json)
+    disease_model_encoders.json    category -> code tables + feature columns
+    disease_model_lean.json        manifest tying both to one disease_model.pkl
+
+load_lean_model() builds a LeanModel from those files with NumPy only: this
+module, feature_engine and forest_engine never import pandas, sklearn or
+joblib. The manifest records the SHA-1 of the pickle it was exported from,
+so a retrained model is never served from stale artifacts; anything
+missing or mismatched raises LeanArtifactError and callers fall back to
+the pickle.
+
+Usage:
+    python3 lean_predictor.py [model_path]     # export + verify (build step)
+
+    from lean_predictor import load_lean_model
+    model = load_lean_model('disease_model.pkl')
+    probabilities = model.predict_proba_one({'symptoms': ['fever', 'vomiting']})
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import hashlib
+import json
+import os
+import sys
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+from feature_engine import (FeatureEngine, BINARY_SYMPTOMS, encoder_tables_path,
+                            read_encoder_tables, load_encoder_tables)
+from forest_engine import FlatForest, forest_path, load_forest
+
+
+class LeanArtifactError(Exception):
+    """Lean artifacts are missing, inconsistent or older than the pickle"""
+
+
+def lean_manifest_path(model_path: str) -> str:
+    """
+    Location of the lean manifest saved next to a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+
+    Returns:
+        str: Path to the matching *_lean.json file
+    """
+    return os.path.splitext(model_path)[0] + '_lean.json'
+
+
+def file_sha1(path: str) -> str:
+    """
+    SHA-1 of a file's contents (a few ms for the model pickle)
+
+    Args:
+        path (str): File to hash
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_lean_manifest(model_path: str, training_date: Optional[str]) -> str:
+    """
+    Record that the forest and encoder files next to model_path match it
+
+    Call only after load_forest/load_encoder_tables (or an export) have made
+    both files current for this pickle.
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        training_date (str): Training date of the model package
+
+    Returns:
+        str: Path of the written manifest
+    """
+    path = lean_manifest_path(model_path)
+    payload = {
+        'training_date': training_date,
+        'source_sha1': file_sha1(model_path),
+        'forest': os.path.basename(forest_path(model_path)),
+        'encoders': os.path.basename(encoder_tables_path(model_path))
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def export_lean_artifacts(model_path: str, model_package: Dict[str, Any]) -> str:
+    """
+    Make the forest, encoder tables and manifest current for a model package
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        model_package (dict): Loaded model package
+
+    Returns:
+        str: Path of the written manifest
+    """
+    load_encoder_tables(model_path, model_package)
+    forest = load_forest(model_path, model_package)
+    if not forest.classes:
+        raise LeanArtifactError("Model package has no 'classes' list; retrain with train_model.py")
+    return write_lean_manifest(model_path, model_package.get('training_date'))
+
+
+class LeanModel:
+    """
+    sklearn-free scoring model: encoder tables + flattened forest + class list
+    """
+
+    def __init__(self, forest: FlatForest, encoder_tables: Dict[str, Dict[str, int]],
+                 feature_columns: List[str], training_date: Optional[str] = None,
+                 binary_symptoms=BINARY_SYMPTOMS, fill_values: Optional[Dict[str, Any]] = None):
+        """
+        Wire the loaded artifacts together
+
+        Args:
+            forest (FlatForest): Flattened forest (its classes give the probability order)
+            encoder_tables (dict): Column -> {category: code}
+            feature_columns (list): Feature column order
+            training_date (str): Training date shared by all artifacts
+            binary_symptoms (dict): Binary column -> triggering symptoms
+            fill_values (dict): Raw column -> training fill value ({} for models saved without them)
+        """
+        self.forest = forest
+        self.encoder_tables = encoder_tables
+        self.feature_columns = list(feature_columns)
+        self.training_date = training_date
+        self.fill_values = dict(fill_values or {})
+        self.classes = list(forest.classes)
+        self.feature_engine = FeatureEngine(encoder_tables, self.feature_columns, binary_symptoms)
+
+    def package_info(self) -> Dict[str, Any]:
+        """
+        The model-package fields that describe this model (no sklearn objects)
+
+        Returns:
+            dict: training_date, feature_columns and classes, as in the pickle
+        """
+        return {
+            'training_date': self.training_date,
+            'feature_columns': self.feature_columns,
+            'classes': self.classes
+        }
+
+    def predict_proba(self, requests: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Class probabilities for a batch of requests
+
+        Args:
+            requests (List[dict]): Requests with 'symptoms' plus optional animal fields
+
+        Returns:
+            np.ndarray: (n_requests, n_classes) probabilities
+        """
+        return self.forest.predict_proba(self.feature_engine.transform(requests))
+
+    def predict_proba_one(self, request: Dict[str, Any]) -> np.ndarray:
+        """
+        Class probabilities for one request (per-thread buffers, see FlatForest.predict_proba_row)
+
+        Args:
+            request (dict): Request with 'symptoms' plus optional animal fields
+
+        Returns:
+            np.ndarray: (n_classes,) probabilities, valid until the next call on this thread
+        """
+        return self.forest.predict_proba_row(self.feature_engine.transform_one(request))
+
+
+def load_lean_model(model_path: str, binary_symptoms=BINARY_SYMPTOMS,
+                    verify_source: bool = True) -> LeanModel:
+    """
+    Load the lean artifacts saved next to a model package without unpickling it
+
+    Args:
+        model_path (str): Path to disease_model.pkl (need not exist when verify_source is False)
+        binary_symptoms (dict): Binary column -> triggering symptoms
+        verify_source (bool): Check the manifest against the pickle's SHA-1 when the pickle exists
+
+    Returns:
+        LeanModel: Ready-to-score model
+
+    Raises:
+        LeanArtifactError: When the artifacts are missing, inconsistent or stale
+    """
+    try:
+        with open(lean_manifest_path(model_path), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise LeanArtifactError(f"No lean manifest: {e}")
+
+    if verify_source and os.path.exists(model_path):
+        if manifest.get('source_sha1') != file_sha1(model_path):
+            raise LeanArtifactError(f"{model_path} changed since the lean artifacts were exported")
+
+    training_date = manifest.get('training_date')
+    tables = read_encoder_tables(model_path)
+    if tables is None or tables.get('training_date') != training_date:
+        raise LeanArtifactError("Encoder tables are missing or from another model")
+
+    try:
+        forest = FlatForest.load(forest_path(model_path))
+    except (OSError, ValueError, KeyError) as e:
+        raise LeanArtifactError(f"Flattened forest could not be loaded: {e}")
+    if forest.training_date != training_date or not forest.classes:
+        raise LeanArtifactError("Flattened forest is from another model or has no class list")
+
+    return LeanModel(forest, tables['encoders'], tables['feature_columns'], training_date, binary_symptoms,
+                     tables.get('fill_values'))
+
+
+def main():
+    """
+    Export the lean artifacts for a model package and check they score like the pickle
+    """
+    import joblib
+
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'disease_model.pkl'
+
+    print("🪶 LEAN INFERENCE EXPORT")
+    print("=" * 50)
+
+    if not os.path.exists(model_path):
+        # Deploys without a trained model keep working; flask_api falls back at startup
+        print(f"⚠️  {model_path} not found, skipping lean export")
+        return
+
+    model_package = joblib.load(model_path)
+    manifest = export_lean_artifacts(model_path, model_package)
+    print(f"✅ Wrote {manifest}")
+
+    lean = load_lean_model(model_path)
+    requests = [
+        {'symptoms': ['fever', 'vomiting', 'lethargy']},
+        {'symptoms': ['coughing', 'nasal discharge'], 'animal_type': 'Cat', 'age': 3, 'weight': 4.5},
+        {'symptoms': ['coughing', 'labored breathing', 'fever'], 'animal_type': 'Horse', 'age': 8, 'weight': 500.0}
+    ]
+    X = lean.feature_engine.transform(requests)
+    max_diff = float(np.abs(lean.predict_proba(requests) - model_package['model'].predict_proba(X)).max())
+    same_classes = lean.classes == [str(c) for c in model_package['target_encoder'].classes_]
+
+    status = "✅" if max_diff <= 1e-9 and same_classes else "❌"
+    print(f"{status} max |p - p_sklearn| = {max_diff:.3e}, class order matches: {same_classes}")
+
+
+if __name__ == "__main__":
+    main()
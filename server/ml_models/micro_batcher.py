@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Micro-Batcher
+
+Coalesces concurrent single predictions into batched forest calls. Requests
+are queued on an asyncio event loop running on its own thread; the collector
+takes the oldest waiting request, keeps gathering until its window (e.g.
+2 ms) closes or max_batch requests are waiting, scores them with one batch
+call and fans the results back out to the callers' futures.
+
+Threaded Flask/gunicorn workers call submit_sync(); async code running on
+the batcher's loop can await submit() directly. Batches are scored on the
+loop thread itself: handing them to another thread costs more in GIL
+handoffs than the scoring, and requests arriving meanwhile simply wait in
+the loop's queue and form the next batch.
+
+stats() reports the achieved batch sizes and the queueing delay the window
+adds (enqueue -> scoring start), plus scoring time per batch.
+
+A window of 0 adds no wait at all: each batch is whatever queued up while
+the previous one was scoring, so a lone request is scored immediately.
+
+Configuration (environment variables, read by flask_api.py):
+    PREDICT_MICROBATCH_WINDOW_MS   gathering window in ms (unset = disabled, 0 = no added wait)
+    PREDICT_MICROBATCH_MAX         maximum requests per batch (default 64)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Callable
+
+import numpy as np
+
+# Recent per-request delays / per-batch timings kept for percentiles
+METRIC_WINDOW = 10000
+
+
+class MicroBatcher:
+    """
+    asyncio queue that turns concurrent requests into batched scoring calls
+    """
+
+    def __init__(self, score_batch: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 window_ms=2.0, max_batch=64):
+        """
+        Configure the batcher (the loop thread starts on first use)
+
+        Args:
+            score_batch (callable): score_batch(cases) -> results in the same order
+            window_ms (float): How long to keep gathering after the first request arrives
+            max_batch (int): Score immediately once this many requests are waiting
+        """
+        self.score_batch = score_batch
+        self.window = float(window_ms) / 1000.0
+        self.max_batch = max(int(max_batch), 1)
+
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._pending = None
+        self._wakeup = None
+
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+        self.size_histogram = {}
+        self.queue_delays = deque(maxlen=METRIC_WINDOW)
+        self.score_times = deque(maxlen=METRIC_WINDOW)
+
+    def _ensure_started(self):
+        """Start the event loop thread in this process (after a fork it is started again)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._pending = deque()
+                self._wakeup = asyncio.Event()
+                loop.create_task(self._collect())
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name='micro-batcher', daemon=True).start()
+            ready.wait()
+            self._loop = loop
+            self._pid = os.getpid()
+
+    def _enqueue(self, item):
+        """Add a waiting request (runs on the loop); wake the collector when idle or full"""
+        self._pending.append(item)
+        if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def submit(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue one case and wait for its result (must run on the batcher's loop)
+
+        Args:
+            case (dict): Request dict accepted by score_batch
+
+        Returns:
+            dict: The case's result
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue((case, future, time.monotonic()))
+        return await future
+
+    def submit_sync(self, case: Dict[str, Any], timeout=None) -> Dict[str, Any]:
+        """
+        Queue one case from any thread and block until its batch is scored
+
+        Args:
+            case (dict): Request dict accepted by score_batch
+            timeout (float): Seconds to wait (None = forever)
+
+        Returns:
+            dict: The case's result
+        """
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._enqueue, (case, future, time.monotonic()))
+        return future.result(timeout)
+
+    async def _collect(self):
+        """Gather batches until the window closes or max_batch is reached, then score them"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # The window opens when the oldest waiting request arrived
+            remaining = self._pending[0][2] + self.window - time.monotonic()
+            if len(self._pending) < self.max_batch and remaining > 0:
+                self._wakeup.clear()
+                timer = loop.call_later(remaining, self._wakeup.set)
+                await self._wakeup.wait()
+                timer.cancel()
+
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+            started = time.monotonic()
+            try:
+                results = self.score_batch([case for case, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record(batch, started, time.monotonic())
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, batch, started, finished):
+        """Update batch-size and delay metrics for one scored batch"""
+        size = len(batch)
+        bucket = 1 << (size.bit_length() - 1)
+        label = str(bucket) if bucket == 1 else f"{bucket}-{2 * bucket - 1}"
+
+        with self._metrics_lock:
+            self.batches += 1
+            self.items += size
+            self.max_seen = max(self.max_seen, size)
+            self.size_histogram[label] = self.size_histogram.get(label, 0) + 1
+            self.queue_delays.extend(started - enqueued for _, _, enqueued in batch)
+            self.score_times.append(finished - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of batching metrics for this process
+
+        Returns:
+            dict: Batch counts and sizes, queueing delay and scoring time (ms)
+        """
+        with self._metrics_lock:
+            delays = np.array(self.queue_delays) * 1e3
+            scores = np.array(self.score_times) * 1e3
+            return {
+                'window_ms': self.window * 1e3,
+                'max_batch': self.max_batch,
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_seen,
+                'batch_size_histogram': dict(sorted(self.size_histogram.items(),
+                                                    key=lambda item: int(item[0].split('-')[0]))),
+                'queue_delay_ms': {
+                    'mean': round(float(delays.mean()), 3) if len(delays) else None,
+                    'p50': round(float(np.percentile(delays, 50)), 3) if len(delays) else None,
+                    'p99': round(float(np.percentile(delays, 99)), 3) if len(delays) else None
+                },
+                'score_ms_per_batch': {
+                    'mean': round(float(scores.mean()), 3) if len(scores) else None,
+                    'p99': round(float(np.percentile(scores, 99)), 3) if len(scores) else None
+                }
+            }
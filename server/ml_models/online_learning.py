@@ -0,0 +1,714 @@
+#!/usr/bin/env python3
+"""
+Online Learning from Confirmed Diagnoses
+
+Vet-confirmed outcomes flow back into the served forest without a full
+retrain:
+
+    FeedbackStore   POST /feedback appends confirmed cases (the symptom-checker
+                    fields plus the diagnosis and the confirming vet) to a
+                    local SQLite file (WAL mode) shared by every gunicorn
+                    worker, at most FEEDBACK_MAX_PER_PREDICTION per prediction
+    ModelUpdater    background thread; once ONLINE_MIN_CASES new confirmed
+                    cases are stored, one worker (an SQLite lease) grows
+                    ONLINE_TREES_PER_UPDATE trees on the most recent
+                    ONLINE_MAX_CASES of them and appends them to the current
+                    forest; the shipped trees are always kept, and only the
+                    oldest grown trees beyond ONLINE_MAX_ADDED_TREES are dropped
+    publish_model   writes the whole package (pickle, encoder tables, flat and
+                    compact forests, lean manifest, answer table) into a new
+                    version directory, then swaps the `current` symlink, so a
+                    reader resolves either the old or the new version, never
+                    a mix of both
+    ModelWatcher    every worker checks `current` every MODEL_RELOAD_INTERVAL
+                    seconds and swaps in a predictor loaded (and warmed up)
+                    from the new version
+
+sklearn's warm_start on the served forest would re-derive classes_ from the
+feedback labels (usually a handful of diseases), so the new trees are grown
+one at a time with warm_start in a side forest and their leaf distributions
+are mapped onto the model's classes before they are appended. Grown trees
+only vote for diseases that were confirmed, so they stay a minority next to
+the shipped trees instead of replacing them. Diagnoses the model has no
+class for are stored but only a full retrain can learn them.
+
+The updater shares the worker with /predict traffic: it fits with one core,
+one tree per call, and sleeps between steps so that it uses at most
+ONLINE_DUTY_CYCLE of a core (the answer table rebuild is throttled the same
+way, per scoring chunk).
+
+Published versions are tied to the shipped disease_model.pkl they descend
+from; deploying a new model ignores versions grown from an older one.
+
+Configuration (environment variables, read by flask_api.py):
+    FEEDBACK_API_TOKEN        bearer token POST /feedback requires (unset = feedback is refused)
+    FEEDBACK_MAX_PER_PREDICTION  confirmed cases stored per prediction_id (default 2)
+    FEEDBACK_DB_PATH          SQLite file (default: petcarehub_feedback.sqlite in the temp dir)
+    ONLINE_MODEL_DIR          published versions (default: petcarehub_models in the temp dir)
+    ONLINE_UPDATE_INTERVAL    seconds between update checks (default 0 = this service never updates)
+    ONLINE_MIN_CASES          new confirmed cases needed for an update (default 50)
+    ONLINE_TREES_PER_UPDATE   trees grown per update (default 10)
+    ONLINE_MAX_ADDED_TREES    grown trees kept on top of the shipped forest, oldest dropped first
+                              (default 0 = a quarter of the shipped forest, at least one update's worth)
+    ONLINE_MAX_CASES          most recent confirmed cases the new trees are fitted on (default 5000)
+    ONLINE_DUTY_CYCLE         fraction of a core the updater may use (default 0.25)
+    ONLINE_KEEP_VERSIONS      published versions kept on disk (default 3)
+    MODEL_RELOAD_INTERVAL     seconds between checks for a new version (default 30, 0 = never reload)
+
+Usage:
+    python3 online_learning.py [--force]     # run one update now at full speed (e.g. from cron)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import copy
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from lean_predictor import file_sha1
+
+# Writers (feedback inserts from several workers) may wait this long for each other
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# An update lease whose holder has not renewed it for this long is taken over
+LEASE_SECONDS = 600.0
+
+# Request fields kept with a confirmed case (the same ones /predict accepts)
+CASE_FIELDS = ('symptoms', 'animal_type', 'age', 'weight', 'gender', 'breed',
+               'duration', 'heart_rate', 'temperature')
+
+# Tree settings the new trees copy from the served forest
+TREE_PARAMS = ('max_depth', 'min_samples_split', 'min_samples_leaf', 'max_features', 'criterion')
+
+VERSION_FILE = 'version.json'
+MODEL_FILE = 'disease_model.pkl'
+
+
+class FeedbackError(Exception):
+    """A feedback request was rejected"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def match_diagnosis(diagnosis: Any, classes: List[str]) -> Optional[str]:
+    """
+    Class name for a confirmed diagnosis (case and surrounding whitespace ignored)
+
+    Args:
+        diagnosis: Diagnosis from the request
+        classes (list): Disease names the model knows
+
+    Returns:
+        str: Matching class name, or None for a disease the model has no class for
+    """
+    wanted = str(diagnosis).strip().lower()
+    return next((name for name in classes if name.lower() == wanted), None)
+
+
+class FeedbackStore:
+    """
+    SQLite-backed store of confirmed cases and model updates, shared between processes
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the feedback database
+
+        Args:
+            path (str): SQLite database path
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread, per-process connection (reopened after a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS feedback (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            created_at REAL NOT NULL,
+                            payload TEXT NOT NULL,
+                            diagnosis TEXT NOT NULL,
+                            disease TEXT,
+                            prediction_id TEXT,
+                            confirmed_by TEXT)''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(feedback)')]
+        if 'confirmed_by' not in columns:
+            conn.execute('ALTER TABLE feedback ADD COLUMN confirmed_by TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS feedback_prediction ON feedback (prediction_id)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS model_updates (
+                            version TEXT PRIMARY KEY,
+                            shipped_model TEXT NOT NULL,
+                            feedback_through INTEGER NOT NULL,
+                            cases INTEGER NOT NULL,
+                            trees_added INTEGER NOT NULL,
+                            trees_dropped INTEGER NOT NULL,
+                            n_trees INTEGER NOT NULL,
+                            seconds REAL NOT NULL,
+                            created_at REAL NOT NULL,
+                            skipped_cases INTEGER NOT NULL DEFAULT 0)''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(model_updates)')]
+        if 'skipped_cases' not in columns:
+            conn.execute('ALTER TABLE model_updates ADD COLUMN skipped_cases INTEGER NOT NULL DEFAULT 0')
+        conn.execute('''CREATE TABLE IF NOT EXISTS leases (
+                            name TEXT PRIMARY KEY,
+                            owner TEXT NOT NULL,
+                            renewed_at REAL NOT NULL)''')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def add(self, cases: List[Dict[str, Any]], max_per_prediction: int = 0) -> List[Optional[int]]:
+        """
+        Append confirmed cases
+
+        Args:
+            cases (list): Dicts with the CASE_FIELDS, 'diagnosis', 'disease'
+                (matching class name or None) and optional 'prediction_id' and 'confirmed_by'
+            max_per_prediction (int): Cases stored per prediction_id (0 = no limit)
+
+        Returns:
+            list: Id of each stored case, None where its prediction already has max_per_prediction
+        """
+        now = time.time()
+        conn = self._connection()
+        ids = []
+        with conn:
+            # The write lock is taken before counting, so workers cannot race past the limit
+            conn.execute('BEGIN IMMEDIATE')
+            for case in cases:
+                prediction_id = None if case.get('prediction_id') is None else str(case['prediction_id'])
+                if max_per_prediction and prediction_id is not None:
+                    stored = conn.execute('SELECT COUNT(*) FROM feedback WHERE prediction_id = ?',
+                                          (prediction_id,)).fetchone()[0]
+                    if stored >= max_per_prediction:
+                        ids.append(None)
+                        continue
+                payload = json.dumps({field: case[field] for field in CASE_FIELDS if case.get(field) is not None})
+                cursor = conn.execute('INSERT INTO feedback (created_at, payload, diagnosis, disease, prediction_id, '
+                                      'confirmed_by) VALUES (?, ?, ?, ?, ?, ?)',
+                                      (now, payload, str(case['diagnosis']), case.get('disease'), prediction_id,
+                                       None if case.get('confirmed_by') is None else str(case['confirmed_by'])))
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def last_update(self, shipped_model: str) -> Optional[Dict[str, Any]]:
+        """Most recent update grown from the given shipped model (None before the first)"""
+        cursor = self._connection().execute('SELECT * FROM model_updates WHERE shipped_model = ? '
+                                            'ORDER BY created_at DESC LIMIT 1', (shipped_model,))
+        row = cursor.fetchone()
+        return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def pending(self, after_id: int) -> int:
+        """Confirmed cases with a known disease stored after the given id"""
+        return self._connection().execute('SELECT COUNT(*) FROM feedback WHERE id > ? AND disease IS NOT NULL',
+                                          (after_id,)).fetchone()[0]
+
+    def training_cases(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        The most recent confirmed cases with a known disease
+
+        Args:
+            limit (int): Maximum number of cases
+
+        Returns:
+            list: {'id', 'case', 'disease'} dicts, oldest first
+        """
+        rows = self._connection().execute('SELECT id, payload, disease FROM feedback WHERE disease IS NOT NULL '
+                                          'ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [{'id': row[0], 'case': json.loads(row[1]), 'disease': row[2]} for row in reversed(rows)]
+
+    def record_update(self, update: Dict[str, Any]):
+        """Store a published update (see ModelUpdater.run_once)"""
+        columns = ['version', 'shipped_model', 'feedback_through', 'cases', 'skipped_cases', 'trees_added',
+                   'trees_dropped', 'n_trees', 'seconds', 'created_at']
+        self._connection().execute(f"INSERT INTO model_updates ({', '.join(columns)}) "
+                                   f"VALUES ({', '.join('?' for _ in columns)})",
+                                   [update[column] for column in columns])
+
+    def acquire_lease(self, name: str, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """
+        Take or renew a named lease (one model update at a time across workers)
+
+        Args:
+            name (str): Lease name
+            owner (str): Holder identity
+            lease_seconds (float): Age after which another holder's lease is taken over
+
+        Returns:
+            bool: True when this owner holds the lease
+        """
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT owner, renewed_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] >= now - lease_seconds:
+                return False
+            conn.execute('INSERT OR REPLACE INTO leases (name, owner, renewed_at) VALUES (?, ?, ?)',
+                         (name, owner, now))
+        return True
+
+    def release_lease(self, name: str, owner: str):
+        """Give up a lease held by this owner"""
+        self._connection().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    def stats(self, shipped_model: Optional[str]) -> Dict[str, Any]:
+        """
+        Counters for GET /feedback/stats
+
+        Args:
+            shipped_model (str): Identity of the shipped model (see shipped_model_id; None when
+                it cannot be hashed, so no update counts as its own)
+
+        Returns:
+            dict: Stored, known-disease and pending case counts plus the last update
+        """
+        conn = self._connection()
+        total, known = conn.execute('SELECT COUNT(*), COUNT(disease) FROM feedback').fetchone()
+        last = self.last_update(shipped_model)
+        return {
+            'cases': total,
+            'known_disease': known,
+            'unknown_disease': total - known,
+            'pending': self.pending(last['feedback_through'] if last else 0),
+            'last_update': last
+        }
+
+
+def shipped_model_id(model_path: str) -> str:
+    """SHA-1 of the shipped disease_model.pkl, which published versions record as their origin"""
+    return file_sha1(model_path)
+
+
+def published_model_path(publish_dir: str, shipped_model: str) -> Optional[str]:
+    """
+    Model package the `current` symlink points at, if it descends from the shipped model
+
+    The path is fully resolved, so a caller that loads every artifact from its
+    directory keeps reading one consistent version even if `current` moves on.
+
+    Args:
+        publish_dir (str): ONLINE_MODEL_DIR
+        shipped_model (str): shipped_model_id() of the deployed disease_model.pkl
+
+    Returns:
+        str: Resolved path of the published disease_model.pkl, or None
+    """
+    version_dir = os.path.realpath(os.path.join(publish_dir, 'current'))
+    try:
+        with open(os.path.join(version_dir, VERSION_FILE), 'r', encoding='utf-8') as f:
+            version = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if version.get('shipped_model') != shipped_model:
+        return None
+    return os.path.join(version_dir, MODEL_FILE)
+
+
+def as_forest_tree(fitted, side_classes: np.ndarray, template, n_classes: int):
+    """
+    Rewrap a tree grown on a subset of the classes as a tree of the full forest
+
+    Args:
+        fitted (DecisionTreeClassifier): Tree from the side forest (its classes_
+            are positions in side_classes)
+        side_classes (np.ndarray): The side forest's classes_, i.e. the class
+            indices of the full forest present in the feedback
+        template (DecisionTreeClassifier): Any tree of the full forest
+        n_classes (int): Classes of the full forest
+
+    Returns:
+        DecisionTreeClassifier: Tree whose leaf values cover all n_classes
+    """
+    from sklearn.tree._tree import Tree
+
+    state = fitted.tree_.__getstate__()
+    values = np.zeros((state['values'].shape[0], 1, n_classes), dtype=np.float64)
+    columns = np.asarray(side_classes)[fitted.classes_.astype(np.intp)].astype(np.intp)
+    values[:, 0, columns] = state['values'][:, 0, :]
+    state['values'] = values
+
+    tree = Tree(fitted.n_features_in_, np.array([n_classes], dtype=np.intp), 1)
+    tree.__setstate__(state)
+    estimator = copy.copy(template)
+    estimator.tree_ = tree
+    estimator.random_state = fitted.random_state
+    return estimator
+
+
+def grow_trees(model, X: np.ndarray, y: np.ndarray, n_trees: int, seed: int,
+               step: Callable[[], None] = lambda: None) -> List[Any]:
+    """
+    Grow new trees for a fitted forest on new data, one warm_start step at a time
+
+    Args:
+        model (RandomForestClassifier): Served forest (tree settings and classes)
+        X (np.ndarray): Feature rows
+        y (np.ndarray): Class indices of the served forest
+        n_trees (int): Trees to grow
+        seed (int): Random state of the side forest
+        step (callable): Called after every tree (throttling, lease renewal)
+
+    Returns:
+        list: New trees, ready to append to model.estimators_
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    params = model.get_params()
+    side = RandomForestClassifier(n_estimators=0, warm_start=True, n_jobs=1, random_state=seed,
+                                  **{name: params[name] for name in TREE_PARAMS})
+    for n in range(1, n_trees + 1):
+        side.set_params(n_estimators=n)
+        side.fit(X, y)
+        step()
+
+    return [as_forest_tree(tree, side.classes_, model.estimators_[0], model.n_classes_)
+            for tree in side.estimators_]
+
+
+def publish_model(publish_dir: str, package: Dict[str, Any], version: Dict[str, Any],
+                  keep_versions: int = 3, throttle: Optional[Callable[[], None]] = None) -> str:
+    """
+    Write a model package with all its artifacts as a new version and make it current
+
+    Args:
+        publish_dir (str): ONLINE_MODEL_DIR
+        package (dict): Model package (same keys as train_model.py writes)
+        version (dict): version.json contents; 'version' names the directory
+        keep_versions (int): Published versions kept (the current one is never removed)
+        throttle (callable): Called between answer-table scoring chunks
+
+    Returns:
+        str: Path of the published disease_model.pkl
+    """
+    import joblib
+    from answer_table import build_answer_table, save_answer_table
+    from compact_forest import CompactForest, compact_forest_path
+    from lean_predictor import export_lean_artifacts, load_lean_model
+
+    os.makedirs(publish_dir, exist_ok=True)
+    name = version['version']
+    tmp_dir = os.path.join(publish_dir, f'.{name}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Every artifact is named after the pickle, so building them in the
+    # temporary directory and renaming it keeps them consistent
+    model_path = os.path.join(tmp_dir, MODEL_FILE)
+    joblib.dump(package, model_path)
+    export_lean_artifacts(model_path, package)
+    lean = load_lean_model(model_path)
+    CompactForest.from_flat(lean.forest).save(compact_forest_path(model_path))
+    table, _ = build_answer_table(lean, throttle=throttle)
+    save_answer_table(model_path, table, package['training_date'])
+    with open(os.path.join(tmp_dir, VERSION_FILE), 'w', encoding='utf-8') as f:
+        json.dump(version, f, ensure_ascii=False)
+
+    version_dir = os.path.join(publish_dir, name)
+    os.replace(tmp_dir, version_dir)
+
+    # Atomic switch: a new symlink renamed over `current`
+    link = os.path.join(publish_dir, 'current')
+    tmp_link = f"{link}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(name, tmp_link)
+    os.replace(tmp_link, link)
+
+    # Workers still scoring from an old version keep their memory-mapped pages
+    versions = sorted(entry for entry in os.listdir(publish_dir)
+                      if not entry.startswith('.') and entry != 'current'
+                      and os.path.isfile(os.path.join(publish_dir, entry, VERSION_FILE)))
+    for old in versions[:-max(keep_versions, 1)]:
+        if old != name:
+            shutil.rmtree(os.path.join(publish_dir, old), ignore_errors=True)
+
+    return os.path.join(version_dir, MODEL_FILE)
+
+
+class ModelUpdater:
+    """
+    Background thread that grows the served forest from confirmed cases
+    """
+
+    LEASE = 'model-update'
+
+    def __init__(self, store: FeedbackStore, publish_dir: str, shipped_path: str,
+                 interval=0.0, min_cases=50, trees_per_update=10, max_added_trees=0,
+                 max_cases=5000, duty_cycle=0.25, keep_versions=3):
+        """
+        Configure the updater (the thread starts on first use, once per process)
+
+        Args:
+            store (FeedbackStore): Confirmed cases
+            publish_dir (str): Where versions are published
+            shipped_path (str): Deployed disease_model.pkl (the first update grows from it)
+            interval (float): Seconds between checks (0 = never run in the background)
+            min_cases (int): New confirmed cases needed for an update
+            trees_per_update (int): Trees grown per update
+            max_added_trees (int): Grown trees kept next to the shipped ones
+                (0 = a quarter of the shipped forest, at least trees_per_update)
+            max_cases (int): Most recent confirmed cases the new trees are fitted on
+            duty_cycle (float): Fraction of a core the updater may use (0-1]
+            keep_versions (int): Published versions kept on disk
+        """
+        self.store = store
+        self.publish_dir = publish_dir
+        self.shipped_path = shipped_path
+        self.interval = max(float(interval), 0.0)
+        self.min_cases = max(int(min_cases), 1)
+        self.trees_per_update = max(int(trees_per_update), 1)
+        self.max_added_trees = max(int(max_added_trees), 0)
+        self.max_cases = max(int(max_cases), 1)
+        self.duty_cycle = min(max(float(duty_cycle), 0.01), 1.0)
+        self.keep_versions = max(int(keep_versions), 1)
+
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._shipped_model = None
+        # Feedback id through which no case names a class of the current model
+        self._unusable_through = 0
+
+    @property
+    def shipped_model(self) -> str:
+        """shipped_model_id() of the deployed pickle (hashed once per process)"""
+        if self._shipped_model is None:
+            self._shipped_model = shipped_model_id(self.shipped_path)
+        return self._shipped_model
+
+    def start(self):
+        """Start this process's updater thread (no-op if already running here or disabled)"""
+        if self._pid == os.getpid() or self.interval == 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._work, name='model-updater', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        owner = f"{os.getpid()}-{threading.get_ident()}"
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once(owner)
+            except Exception as e:
+                print(f"⚠️  Model update failed: {e}")
+
+    def _throttle(self, busy):
+        """Sleep long enough that updating stays within the duty cycle"""
+        if self.duty_cycle < 1.0:
+            time.sleep(busy * (1.0 - self.duty_cycle) / self.duty_cycle)
+
+    def run_once(self, owner: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Grow and publish one update if enough new confirmed cases are stored
+
+        Args:
+            owner (str): Lease holder identity
+            force (bool): Update even with fewer than min_cases new cases
+
+        Returns:
+            dict: The recorded update, or None when nothing was done
+        """
+        last = self.store.last_update(self.shipped_model)
+        through = max(last['feedback_through'] if last else 0, self._unusable_through)
+        new_cases = self.store.pending(through)
+        if new_cases == 0 or (new_cases < self.min_cases and not force):
+            return None
+        if not self.store.acquire_lease(self.LEASE, owner):
+            return None
+
+        try:
+            return self._update(owner, new_cases)
+        finally:
+            self.store.release_lease(self.LEASE, owner)
+
+    def _update(self, owner, new_cases):
+        import joblib
+        from feature_engine import FeatureEngine, load_encoder_tables
+
+        started = time.time()
+        busy_since = time.perf_counter()
+
+        def step():
+            # Yield the CPU and keep the lease between units of work
+            nonlocal busy_since
+            self._throttle(time.perf_counter() - busy_since)
+            if not self.store.acquire_lease(self.LEASE, owner):
+                raise RuntimeError('update lease lost')
+            busy_since = time.perf_counter()
+
+        base_path = published_model_path(self.publish_dir, self.shipped_model) or self.shipped_path
+        package = joblib.load(base_path)
+        model = package['model']
+        classes = list(package['classes'])
+
+        # Cases matched against an earlier model may name a disease a redeployed model lacks
+        stored = self.store.training_cases(self.max_cases)
+        index = {name: i for i, name in enumerate(classes)}
+        cases = [case for case in stored if case['disease'] in index]
+        skipped = len(stored) - len(cases)
+        feedback_through = stored[-1]['id']
+        if not cases:
+            self._unusable_through = feedback_through
+            print(f"⚠️  No update: none of {skipped} confirmed cases is a disease the model has a class for")
+            return None
+
+        engine = FeatureEngine(load_encoder_tables(base_path, package), package['feature_columns'])
+        X = engine.transform([case['case'] for case in cases])
+        y = np.array([index[case['disease']] for case in cases], dtype=np.intp)
+
+        new_trees = grow_trees(model, X, y, self.trees_per_update, seed=feedback_through, step=step)
+
+        # The shipped trees lead the forest and are never dropped; only the oldest grown trees beyond the cap go
+        online = package.get('online_learning', {})
+        shipped_trees = online.get('shipped_trees', len(model.estimators_))
+        cap = self.max_added_trees or max(shipped_trees // 4, self.trees_per_update)
+        grown = list(model.estimators_[shipped_trees:]) + new_trees
+        dropped = max(len(grown) - cap, 0)
+        updated = copy.copy(model)
+        updated.estimators_ = list(model.estimators_[:shipped_trees]) + grown[dropped:]
+        updated.n_estimators = len(updated.estimators_)
+
+        training_date = datetime.now().isoformat()
+        name = datetime.now().strftime('%Y%m%dT%H%M%S%f') + f'-{os.getpid()}'
+        history = list(online.get('updates', []))
+        update = {
+            'version': name,
+            'shipped_model': self.shipped_model,
+            'feedback_through': int(feedback_through),
+            'cases': len(cases),
+            'skipped_cases': skipped,
+            'trees_added': len(new_trees),
+            'trees_dropped': dropped,
+            'n_trees': updated.n_estimators,
+            'seconds': 0.0,
+            'created_at': started
+        }
+        new_package = dict(package)
+        new_package.update(model=updated, training_date=training_date, online_learning={
+            'shipped_trees': shipped_trees,
+            'max_added_trees': cap,
+            'base_training_date': package.get('training_date'),
+            'updates': history + [dict(update, new_cases=new_cases, training_date=training_date)]
+        })
+
+        publish_model(self.publish_dir, new_package,
+                      {'version': name, 'training_date': training_date, 'shipped_model': self.shipped_model,
+                       'feedback_through': int(feedback_through), 'n_trees': updated.n_estimators},
+                      self.keep_versions, throttle=step)
+        update['seconds'] = round(time.time() - started, 3)
+        self.store.record_update(update)
+        print(f"🌱 Published model {name}: +{len(new_trees)} trees from {len(cases)} confirmed cases "
+              f"({new_cases} new, {skipped} skipped), -{dropped} oldest grown, {updated.n_estimators} trees")
+        return update
+
+
+class ModelWatcher:
+    """
+    Background thread that reloads the predictor when a new version is published
+    """
+
+    def __init__(self, publish_dir: str, shipped_path: str, on_change: Callable[[str], bool],
+                 interval=30.0):
+        """
+        Configure the watcher (the thread starts on first use, once per process)
+
+        Args:
+            publish_dir (str): Where versions are published
+            shipped_path (str): Deployed disease_model.pkl
+            on_change (callable): on_change(model_path) -> True once the path is being served
+            interval (float): Seconds between checks (0 = never reload)
+        """
+        self.publish_dir = publish_dir
+        self.shipped_path = shipped_path
+        self.on_change = on_change
+        self.interval = max(float(interval), 0.0)
+
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._shipped_model = None
+
+    def current(self) -> Optional[str]:
+        """Published model path to serve (None = the shipped model)"""
+        if not os.path.isdir(self.publish_dir):
+            return None
+        if self._shipped_model is None:
+            try:
+                self._shipped_model = shipped_model_id(self.shipped_path)
+            except OSError:
+                # Without the shipped pickle no published version can be tied to it
+                return None
+        return published_model_path(self.publish_dir, self._shipped_model)
+
+    def start(self):
+        """Start this process's watcher thread (no-op if already running here or disabled)"""
+        if self._pid == os.getpid() or self.interval == 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._work, name='model-watcher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                path = self.current()
+                if path is not None:
+                    self.on_change(path)
+            except Exception as e:
+                print(f"⚠️  Model reload failed: {e}")
+
+
+def main():
+    """
+    Run one model update in the foreground (same settings as the API)
+    """
+    store = FeedbackStore(os.environ.get('FEEDBACK_DB_PATH', os.path.join(tempfile.gettempdir(),
+                                                                          'petcarehub_feedback.sqlite')))
+    updater = ModelUpdater(
+        store,
+        os.environ.get('ONLINE_MODEL_DIR', os.path.join(tempfile.gettempdir(), 'petcarehub_models')),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), MODEL_FILE),
+        min_cases=int(os.environ.get('ONLINE_MIN_CASES', 50)),
+        trees_per_update=int(os.environ.get('ONLINE_TREES_PER_UPDATE', 10)),
+        max_added_trees=int(os.environ.get('ONLINE_MAX_ADDED_TREES', 0)),
+        max_cases=int(os.environ.get('ONLINE_MAX_CASES', 5000)),
+        duty_cycle=float(os.environ.get('ONLINE_DUTY_CYCLE', 1.0)),
+        keep_versions=int(os.environ.get('ONLINE_KEEP_VERSIONS', 3))
+    )
+
+    print("🌱 ONLINE MODEL UPDATE")
+    print("=" * 50)
+    stats = store.stats(updater.shipped_model)
+    print(f"📊 {stats['cases']} confirmed cases, {stats['pending']} new since the last update")
+    update = updater.run_once(f"{os.getpid()}-cli", force='--force' in sys.argv)
+    if update is None:
+        print(f"⏭️  Nothing to do (need {updater.min_cases} new cases, or another update is running)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Forest Pruning and Distillation
+
+Builds smaller candidates from a trained disease_model.pkl and reports what
+each one costs and gives up against the original forest:
+
+    subset-k      the k trees chosen greedily (forward selection) to best
+                  reproduce the full forest's top-1 prediction on the training
+                  split; candidates are nested and keep the greedy order, so
+                  a prefix of a subset model is still its best prefix
+    depth-d       every tree cut at depth d: nodes at depth d become leaves
+                  carrying the class fractions of the samples that reached them
+    distill-NxD   a new N-tree forest of depth D fitted on the original
+                  forest's soft labels (its class probabilities) for the
+                  training rows
+
+The held-out split is rebuilt exactly as train_model.py makes it (stratified,
+20%, random_state 42), so held-out accuracy is comparable with the training
+report. For every candidate the table shows:
+
+    accuracy      held-out top-1 accuracy
+    top-3 same    held-out rows whose top-3 disease set matches the original
+    nodes         tree nodes in the flattened forest
+    pkl / flat    pickle size and flattened-forest (.npy) size
+    load          joblib.load of the pickle and FlatForest.load of the arrays
+    µs/row        NumPy FlatForest scoring time, one row per call and batched
+
+The chosen candidate is written as a drop-in model package (same keys as
+train_model.py, new training_date, plus a 'pruning' record) together with its
+encoder tables, flattened forest and lean manifest.
+
+Usage:
+    python3 prune_model.py [--model disease_model.pkl] [--csv animal_disease_prediction.csv]
+    python3 prune_model.py --subset 10,25,50 --depths 6,8,10 --distill 25x8,50x10
+    python3 prune_model.py --write auto --out disease_model.pkl
+    python3 prune_model.py --write subset-25 --out disease_model_pruned.pkl
+
+    --write auto picks the fastest single-row candidate that loses at most
+    --max-accuracy-drop held-out accuracy and keeps at least --min-top3 of
+    the original top-3 sets.
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import Tree
+
+from feature_engine import encode_dataset, load_encoder_tables
+from forest_engine import FlatForest, top_k_rows
+from lean_predictor import export_lean_artifacts
+
+MODEL_PATH = 'disease_model.pkl'
+CSV_PATH = 'animal_disease_prediction.csv'
+OUTPUT_PATH = 'disease_model_pruned.pkl'
+
+# Same split as AnimalDiseasePredictor.train_model
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+REPEATS = 5
+
+
+def load_split(model_path: str, csv_path: str, model_package: Dict[str, Any]) -> Tuple[np.ndarray, ...]:
+    """
+    Rebuild the training/held-out split train_model.py used for this package
+
+    Rows of diseases the model does not know (rare classes dropped during
+    preprocessing) are removed first, which leaves the same rows in the same
+    order as preprocess_data(), so train_test_split returns the same split.
+
+    Args:
+        model_path (str): Path to disease_model.pkl
+        csv_path (str): Training CSV
+        model_package (dict): Loaded model package
+
+    Returns:
+        tuple: (X_train, X_test, y_train, y_test)
+    """
+    df = pd.read_csv(csv_path)
+    df = df[df['Disease_Prediction'].isin(model_package['classes'])]
+    tables = load_encoder_tables(model_path, model_package)
+    X = encode_dataset(df, tables, model_package['feature_columns'])
+    y = model_package['target_encoder'].transform(df['Disease_Prediction'])
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+
+
+def per_tree_proba(forest: FlatForest, X: np.ndarray) -> np.ndarray:
+    """
+    Class distribution of every tree for every row
+
+    Args:
+        forest (FlatForest): Flattened forest
+        X (np.ndarray): Feature matrix (n_rows, n_features)
+
+    Returns:
+        np.ndarray: Array of shape (n_trees, n_rows, n_classes)
+    """
+    leaves = forest.leaf_id[forest.apply(X)]
+    return forest.leaf_distributions(leaves).transpose(1, 0, 2)
+
+
+def greedy_tree_order(tree_proba: np.ndarray, target: np.ndarray, n_select: int) -> List[int]:
+    """
+    Forward selection of trees that best reproduce the full forest
+
+    Each step adds the tree whose inclusion maximizes top-1 agreement with
+    the full forest, ties broken by the smallest squared probability error.
+
+    Args:
+        tree_proba (np.ndarray): per_tree_proba() output on the selection rows
+        target (np.ndarray): Full-forest probabilities on the same rows
+        n_select (int): Trees to select
+
+    Returns:
+        list: Selected tree indices in selection order
+    """
+    target_top = target.argmax(axis=1)
+    remaining = list(range(tree_proba.shape[0]))
+    chosen = []
+    total = np.zeros_like(target)
+
+    for step in range(1, n_select + 1):
+        candidates = (total[None, :, :] + tree_proba[remaining]) / step
+        agreement = (candidates.argmax(axis=2) == target_top[None, :]).mean(axis=1)
+        error = ((candidates - target[None, :, :]) ** 2).mean(axis=(1, 2))
+        best = int(np.lexsort((error, -agreement))[0])
+        tree = remaining.pop(best)
+        chosen.append(tree)
+        total += tree_proba[tree]
+
+    return chosen
+
+
+def subset_model(model: RandomForestClassifier, trees: List[int]) -> RandomForestClassifier:
+    """
+    Copy of the forest that keeps only the given trees, in that order
+
+    Args:
+        model (RandomForestClassifier): Original forest
+        trees (list): Tree indices
+
+    Returns:
+        RandomForestClassifier: Smaller forest
+    """
+    pruned = copy.copy(model)
+    pruned.estimators_ = [model.estimators_[i] for i in trees]
+    pruned.n_estimators = len(trees)
+    return pruned
+
+
+def truncate_tree(estimator, depth: int):
+    """
+    Copy of a fitted decision tree cut at the given depth
+
+    sklearn stores the class fractions of every node, not only of leaves, so
+    a node that becomes a leaf predicts exactly what the samples reaching it
+    voted for. Nodes are renumbered depth-first, dropping the cut subtrees.
+
+    Args:
+        estimator (DecisionTreeClassifier): Fitted tree
+        depth (int): Maximum depth to keep
+
+    Returns:
+        DecisionTreeClassifier: Truncated tree
+    """
+    state = estimator.tree_.__getstate__()
+    nodes, values = state['nodes'], state['values']
+
+    keep, stack = [], [(0, 0)]
+    while stack:
+        node, node_depth = stack.pop()
+        keep.append((node, node_depth))
+        if nodes['left_child'][node] != -1 and node_depth < depth:
+            stack.append((nodes['right_child'][node], node_depth + 1))
+            stack.append((nodes['left_child'][node], node_depth + 1))
+
+    old_ids = np.array([node for node, _ in keep])
+    new_id = {node: i for i, node in enumerate(old_ids)}
+    new_nodes = nodes[old_ids].copy()
+    for i, (node, node_depth) in enumerate(keep):
+        if nodes['left_child'][node] == -1 or node_depth == depth:
+            new_nodes['left_child'][i] = new_nodes['right_child'][i] = -1
+            new_nodes['feature'][i] = new_nodes['threshold'][i] = -2
+        else:
+            new_nodes['left_child'][i] = new_id[nodes['left_child'][node]]
+            new_nodes['right_child'][i] = new_id[nodes['right_child'][node]]
+
+    tree = Tree(estimator.n_features_in_, np.atleast_1d(estimator.n_classes_).astype(np.intp),
+                estimator.n_outputs_)
+    tree.__setstate__({'max_depth': min(state['max_depth'], depth), 'node_count': len(old_ids),
+                       'nodes': new_nodes, 'values': np.ascontiguousarray(values[old_ids])})
+
+    truncated = copy.copy(estimator)
+    truncated.tree_ = tree
+    truncated.max_depth = depth
+    return truncated
+
+
+def truncate_model(model: RandomForestClassifier, depth: int) -> RandomForestClassifier:
+    """
+    Copy of the forest with every tree cut at the given depth
+
+    Args:
+        model (RandomForestClassifier): Original forest
+        depth (int): Maximum depth to keep
+
+    Returns:
+        RandomForestClassifier: Shallower forest
+    """
+    truncated = copy.copy(model)
+    truncated.estimators_ = [truncate_tree(estimator, depth) for estimator in model.estimators_]
+    truncated.max_depth = depth
+    return truncated
+
+
+def distill_model(model: RandomForestClassifier, teacher: FlatForest, X_train: np.ndarray,
+                  n_estimators: int, max_depth: int) -> RandomForestClassifier:
+    """
+    Fit a smaller forest on the teacher forest's soft labels
+
+    A multi-output regression forest learns the teacher's probability
+    vectors directly (squared error on soft labels), so every leaf holds a
+    mean class distribution. Its trees are then rewrapped as classifier trees
+    with the original classes, which makes the student a drop-in
+    RandomForestClassifier for predict_proba and FlatForest.from_sklearn.
+
+    Args:
+        model (RandomForestClassifier): Original forest (classes, tree template)
+        teacher (FlatForest): Original forest, flattened
+        X_train (np.ndarray): Training rows
+        n_estimators (int): Student trees
+        max_depth (int): Student depth
+
+    Returns:
+        RandomForestClassifier: Student forest
+    """
+    regressor = RandomForestRegressor(
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=model.min_samples_leaf,
+        max_features=model.max_features,
+        random_state=RANDOM_STATE,
+        n_jobs=-1
+    )
+    regressor.fit(X_train, teacher.predict_proba(X_train))
+
+    n_classes = np.array([model.n_classes_], dtype=np.intp)
+    estimators = []
+    for fitted in regressor.estimators_:
+        state = fitted.tree_.__getstate__()
+        # Regression values are (nodes, n_outputs, 1); classifier values are (nodes, 1, n_classes)
+        state['values'] = np.ascontiguousarray(state['values'].transpose(0, 2, 1))
+        tree = Tree(model.n_features_in_, n_classes, 1)
+        tree.__setstate__(state)
+
+        estimator = copy.copy(model.estimators_[0])
+        estimator.tree_ = tree
+        estimator.max_depth = max_depth
+        estimator.random_state = fitted.random_state
+        estimators.append(estimator)
+
+    student = copy.copy(model)
+    student.estimators_ = estimators
+    student.n_estimators = n_estimators
+    student.max_depth = max_depth
+    return student
+
+
+def time_rows(forest: FlatForest, X: np.ndarray) -> Tuple[float, float]:
+    """
+    NumPy scoring time per row in microseconds (best of REPEATS passes)
+
+    Args:
+        forest (FlatForest): Forest to time
+        X (np.ndarray): Rows to score
+
+    Returns:
+        tuple: (one row per call, all rows in one call)
+    """
+    forest.predict_proba_row(X[0], use_numba=False)
+    single = batch = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for row in X:
+            forest.predict_proba_row(row, use_numba=False)
+        single = min(single, time.perf_counter() - start)
+        start = time.perf_counter()
+        forest.predict_proba(X, use_numba=False)
+        batch = min(batch, time.perf_counter() - start)
+    return single / len(X) * 1e6, batch / len(X) * 1e6
+
+
+def measure(name: str, model: RandomForestClassifier, model_package: Dict[str, Any],
+            X_test: np.ndarray, y_test: np.ndarray, reference_top3: np.ndarray,
+            workdir: str) -> Dict[str, Any]:
+    """
+    Accuracy, agreement, size, load time and latency of one candidate
+
+    Args:
+        name (str): Candidate label
+        model (RandomForestClassifier): Candidate forest
+        model_package (dict): Original package (classes)
+        X_test (np.ndarray): Held-out rows
+        y_test (np.ndarray): Held-out labels
+        reference_top3 (np.ndarray): Original forest's top-3 class indices on X_test
+        workdir (str): Scratch directory for the size/load measurements
+
+    Returns:
+        dict: Report row (the candidate model is kept under 'model')
+    """
+    pkl_path = os.path.join(workdir, name + '.pkl')
+    joblib.dump({'model': model}, pkl_path)
+    start = time.perf_counter()
+    joblib.load(pkl_path)
+    pkl_load = time.perf_counter() - start
+
+    forest_dir = FlatForest.from_sklearn(model, classes=model_package['classes']).save(
+        os.path.join(workdir, name + '_forest'))
+    start = time.perf_counter()
+    forest = FlatForest.load(forest_dir)
+    flat_load = time.perf_counter() - start
+
+    proba = forest.predict_proba(X_test, use_numba=False)
+    top3 = top_k_rows(proba, 3)
+    single, batch = time_rows(forest, X_test)
+    return {
+        'name': name,
+        'model': model,
+        'trees': forest.n_trees,
+        'max_depth': forest.max_depth,
+        'nodes': len(forest.feature),
+        'accuracy': float(np.mean(top3[:, 0] == y_test)),
+        'top3_same': float(np.mean(np.all(np.sort(top3, axis=1) == np.sort(reference_top3, axis=1), axis=1))),
+        'pkl_bytes': os.path.getsize(pkl_path),
+        'flat_bytes': sum(getattr(forest, array).nbytes for array in FlatForest.ARRAY_NAMES),
+        'pkl_load_ms': pkl_load * 1e3,
+        'flat_load_ms': flat_load * 1e3,
+        'us_per_row': single,
+        'us_per_row_batch': batch
+    }
+
+
+def choose(report: List[Dict[str, Any]], max_accuracy_drop: float, min_top3: float) -> Dict[str, Any]:
+    """
+    Fastest single-row candidate within the accuracy and agreement limits
+
+    Args:
+        report (list): measure() rows, the original first
+        max_accuracy_drop (float): Held-out accuracy the candidate may lose
+        min_top3 (float): Share of held-out top-3 sets it must keep
+
+    Returns:
+        dict: Chosen report row (the original when nothing qualifies)
+    """
+    original = report[0]
+    eligible = [row for row in report
+                if row['accuracy'] >= original['accuracy'] - max_accuracy_drop and row['top3_same'] >= min_top3]
+    return min(eligible, key=lambda row: row['us_per_row']) if eligible else original
+
+
+def write_package(model_path: str, model_package: Dict[str, Any], candidate: Dict[str, Any],
+                  spec: Dict[str, Any]) -> str:
+    """
+    Save a candidate as a drop-in model package with its lean artifacts
+
+    Args:
+        model_path (str): Destination .pkl path
+        model_package (dict): Original package (encoders, features, classes)
+        candidate (dict): Chosen report row
+        spec (dict): How the candidate was built (stored under 'pruning')
+
+    Returns:
+        str: Path of the written lean manifest
+    """
+    package = dict(model_package)
+    package['model'] = candidate['model']
+    package['training_date'] = datetime.now().isoformat()
+    package['pruning'] = {
+        'source_training_date': model_package.get('training_date'),
+        'candidate': candidate['name'],
+        **spec,
+        'held_out_accuracy': candidate['accuracy'],
+        'top3_agreement': candidate['top3_same']
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+    tmp_path = f"{model_path}.tmp-{os.getpid()}"
+    joblib.dump(package, tmp_path)
+    os.replace(tmp_path, model_path)
+    return export_lean_artifacts(model_path, package)
+
+
+def parse_list(spec: str, cast=int) -> List[Any]:
+    """Comma-separated values, empty string -> []"""
+    return [cast(part) for part in spec.split(',') if part.strip()]
+
+
+def main(argv=None):
+    """
+    Build the candidates, print the trade-off table and optionally write one
+    """
+    parser = argparse.ArgumentParser(description="Prune or distill the disease model and compare candidates")
+    parser.add_argument('--model', default=MODEL_PATH, help="Path to disease_model.pkl")
+    parser.add_argument('--csv', default=CSV_PATH, help="Training CSV the model was fitted on")
+    parser.add_argument('--subset', default='10,25,50', help="Greedy tree-subset sizes (default 10,25,50)")
+    parser.add_argument('--depths', default='6,8,10', help="Truncation depths (default 6,8,10)")
+    parser.add_argument('--distill', default='25x8,50x10',
+                        help="Distilled forests as TREESxDEPTH (default 25x8,50x10)")
+    parser.add_argument('--write', help="Candidate to save (e.g. subset-25, depth-8, distill-50x10, auto)")
+    parser.add_argument('--out', default=OUTPUT_PATH, help=f"Output package path (default {OUTPUT_PATH})")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help="--write auto: held-out accuracy that may be lost (default 0.01)")
+    parser.add_argument('--min-top3', type=float, default=0.9,
+                        help="--write auto: share of top-3 sets to keep (default 0.9)")
+    args = parser.parse_args(argv)
+
+    print("✂️  FOREST PRUNING AND DISTILLATION")
+    print("=" * 50)
+
+    model_package = joblib.load(args.model)
+    model = model_package['model']
+    n_classes = len(model_package['classes'])
+    X_train, X_test, y_train, y_test = load_split(args.model, args.csv, model_package)
+    print(f"📊 {len(X_train)} training rows, {len(X_test)} held-out rows, {n_classes} classes")
+
+    teacher = FlatForest.from_sklearn(model, classes=model_package['classes'])
+    reference_top3 = top_k_rows(teacher.predict_proba(X_test), 3)
+
+    candidates = [('original', model, {'method': 'original'})]
+
+    sizes = [k for k in parse_list(args.subset) if 0 < k < teacher.n_trees]
+    if sizes:
+        start = time.perf_counter()
+        order = greedy_tree_order(per_tree_proba(teacher, X_train), teacher.predict_proba(X_train), max(sizes))
+        print(f"🌲 Greedy tree order ({max(sizes)} trees) in {time.perf_counter() - start:.1f}s")
+        for k in sizes:
+            candidates.append((f'subset-{k}', subset_model(model, order[:k]),
+                               {'method': 'subset', 'trees': order[:k]}))
+
+    for depth in parse_list(args.depths):
+        if 0 < depth < teacher.max_depth:
+            candidates.append((f'depth-{depth}', truncate_model(model, depth),
+                               {'method': 'depth', 'max_depth': depth}))
+
+    for spec in parse_list(args.distill, str):
+        n_estimators, max_depth = (int(part) for part in spec.lower().split('x'))
+        start = time.perf_counter()
+        student = distill_model(model, teacher, X_train, n_estimators, max_depth)
+        print(f"🎓 Distilled {n_estimators} trees of depth {max_depth} in {time.perf_counter() - start:.1f}s")
+        candidates.append((f'distill-{n_estimators}x{max_depth}', student,
+                           {'method': 'distill', 'n_estimators': n_estimators, 'max_depth': max_depth}))
+
+    report, specs = [], {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, candidate, spec in candidates:
+            report.append(measure(name, candidate, model_package, X_test, y_test, reference_top3, workdir))
+            specs[name] = spec
+
+    print()
+    print(f"{'candidate':<15}{'trees':>6}{'depth':>6}{'nodes':>8}{'accuracy':>10}{'top-3 same':>12}"
+          f"{'pkl KB':>9}{'flat KB':>9}{'load ms pkl/flat':>18}{'µs/row 1-row':>14}{'batch':>8}")
+    print("-" * 115)
+    for row in report:
+        loads = f"{row['pkl_load_ms']:.1f}/{row['flat_load_ms']:.1f}"
+        print(f"{row['name']:<15}{row['trees']:>6}{row['max_depth']:>6}{row['nodes']:>8}"
+              f"{row['accuracy']:>10.2%}{row['top3_same']:>12.2%}"
+              f"{row['pkl_bytes'] / 1024:>9.0f}{row['flat_bytes'] / 1024:>9.0f}{loads:>18}"
+              f"{row['us_per_row']:>14.1f}{row['us_per_row_batch']:>8.1f}")
+
+    if not args.write:
+        return
+
+    if args.write == 'auto':
+        chosen = choose(report, args.max_accuracy_drop, args.min_top3)
+    else:
+        chosen = next((row for row in report if row['name'] == args.write), None)
+        if chosen is None:
+            print(f"\n❌ Unknown candidate {args.write!r}; choose one of: "
+                  f"{', '.join(row['name'] for row in report)}, auto")
+            sys.exit(1)
+    if chosen['name'] == 'original':
+        print("\n⚠️  No candidate qualifies; keeping the original model (nothing written)")
+        return
+
+    manifest = write_package(args.out, model_package, chosen, specs[chosen['name']])
+    print(f"\n✅ Wrote {chosen['name']} to {args.out} (lean manifest: {manifest})")
+    print("   Serve it as disease_model.pkl; rebuild the answer table with: python3 answer_table.py")
+
+
+if __name__ == "__main__":
+    main()
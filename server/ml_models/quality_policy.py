@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Load-Adaptive Scoring Quality
+
+Under overload a slightly less precise prediction beats a timeout. The
+trees of a random forest are independent draws, so scoring with only the
+first k trees gives a smaller, noisier forest of the same model; no
+retraining is involved. QualityPolicy picks, per request, how many trees
+to use:
+
+    queue depth  every QUALITY_QUEUE_STEP requests ahead of this one drop one
+                 level; requests ahead are the ones being scored in this
+                 worker plus its share of the connections waiting in the
+                 listen socket's accept queue (ListenBacklog), so the rule
+                 also works with one gunicorn thread per worker, where
+                 nothing else ever waits inside the worker
+    deadline     a caller budget (X-Request-Deadline-Ms, optionally counted
+                 from X-Request-Start) drops to the best level whose estimated
+                 wait + scoring time still fits; the estimate uses a running
+                 average of the measured scoring cost per tree and row
+
+The lower of the two wins, but never below the operator floor. Levels are
+percentages of the forest's trees, e.g. 100,50,25.
+
+Configuration (environment variables, read by flask_api.py):
+    QUALITY_LEVELS        tree percentages, best first (unset = always score every tree)
+    QUALITY_FLOOR         lowest percentage ever served (default 50)
+    QUALITY_QUEUE_STEP    requests ahead per level drop (default 4, 0 = deadline only)
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import socket
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Weight of the newest measurement in the per-tree-row cost average
+COST_SMOOTHING = 0.1
+
+# Linux struct tcp_info: for a listening socket tcpi_unacked holds the accept queue length
+TCP_INFO = getattr(socket, 'TCP_INFO', None)
+TCP_INFO_SIZE = 104
+TCP_INFO_UNACKED_OFFSET = 24
+TCP_LISTEN = 10
+
+
+def parse_levels(spec: str) -> List[int]:
+    """
+    Parse a QUALITY_LEVELS value
+
+    Args:
+        spec (str): Comma-separated tree percentages, e.g. "100,50,25"
+
+    Returns:
+        list: Distinct percentages in 1..100, best first (100 is always included)
+    """
+    levels = sorted({int(part) for part in spec.split(',') if part.strip()} | {100}, reverse=True)
+    if levels[-1] < 1 or levels[0] > 100:
+        raise ValueError(f"QUALITY_LEVELS must be percentages between 1 and 100, got {spec!r}")
+    return levels
+
+
+def request_deadline(headers, now: Optional[float] = None) -> Optional[float]:
+    """
+    Remaining time budget of a request in milliseconds
+
+    X-Request-Deadline-Ms is the caller's budget. If the caller (or a proxy)
+    also stamps X-Request-Start (epoch milliseconds, optionally 't=' prefixed),
+    the time since then is deducted, so time spent queued before the worker
+    picked the request up counts too.
+
+    Args:
+        headers (Mapping): Request headers
+        now (float): Current epoch seconds (default: time.time())
+
+    Returns:
+        float: Milliseconds left, or None without a (valid) deadline header
+    """
+    try:
+        budget = float(headers.get('X-Request-Deadline-Ms', ''))
+    except ValueError:
+        return None
+
+    stamp = headers.get('X-Request-Start', '')
+    if stamp.startswith('t='):
+        stamp = stamp[2:]
+    try:
+        started = float(stamp)
+    except ValueError:
+        return budget
+    # Values beyond ~2286 in milliseconds are microsecond stamps (nginx style)
+    if started > 1e13:
+        started /= 1e3
+    elapsed = (now if now is not None else time.time()) * 1e3 - started
+    return budget - max(elapsed, 0.0)
+
+
+class ListenBacklog:
+    """
+    This worker's share of the connections waiting to be accepted (Linux TCP_INFO)
+    """
+
+    def __init__(self, sockets, workers: int = 1):
+        """
+        Watch the listen sockets the workers accept from
+
+        Args:
+            sockets (list): Listening sockets (shared by all workers)
+            workers (int): Workers accepting from them
+        """
+        self.sockets = list(sockets)
+        self.workers = max(int(workers), 1)
+
+    def __call__(self) -> int:
+        """
+        Waiting connections divided over the workers, rounded up
+
+        Returns:
+            int: Connections this worker can expect to serve before a new one (0 where unsupported)
+        """
+        if TCP_INFO is None:
+            return 0
+        waiting = 0
+        for sock in self.sockets:
+            try:
+                info = sock.getsockopt(socket.IPPROTO_TCP, TCP_INFO, TCP_INFO_SIZE)
+            except OSError:
+                continue  # Not a TCP socket (e.g. a unix socket bind)
+            if len(info) >= TCP_INFO_UNACKED_OFFSET + 4 and info[0] == TCP_LISTEN:
+                waiting += struct.unpack_from('=I', info, TCP_INFO_UNACKED_OFFSET)[0]
+        return -(-waiting // self.workers)
+
+
+class QualityPolicy:
+    """
+    Per-worker choice of how many trees to score a request with
+    """
+
+    def __init__(self, n_trees: int, levels: List[int], floor: int = 50, queue_step: int = 4,
+                 backlog: Optional[Callable[[], int]] = None):
+        """
+        Configure the policy
+
+        Args:
+            n_trees (int): Trees in the full forest
+            levels (list): Tree percentages, best first (see parse_levels)
+            floor (int): Lowest percentage ever served
+            queue_step (int): Requests ahead per level drop (0 = deadline only)
+            backlog (callable): Requests waiting outside the worker, e.g. a ListenBacklog
+                (None = only count the requests in flight)
+        """
+        self.n_trees = int(n_trees)
+        self.backlog = backlog
+        self.floor = int(floor)
+        self.queue_step = max(int(queue_step), 0)
+        allowed = [p for p in levels if p >= self.floor] or [max(levels)]
+        self.levels = [(p, max(1, round(self.n_trees * p / 100))) for p in allowed]
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.cost_per_tree_row = None  # seconds, running average
+        self.chosen = {p: 0 for p, _ in self.levels}
+        self.reasons = {'full': 0, 'queue': 0, 'deadline': 0}
+
+    @contextmanager
+    def admit(self):
+        """Count a request as in flight while its body runs"""
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def choose(self, deadline_ms: Optional[float] = None, rows: int = 1) -> Dict[str, Any]:
+        """
+        Pick the quality level for a request that is already admitted
+
+        Args:
+            deadline_ms (float): Remaining budget in milliseconds (None = no deadline)
+            rows (int): Feature rows the request will score
+
+        Returns:
+            dict: {'percent', 'trees', 'reason'} with reason 'full', 'queue' or 'deadline'
+        """
+        with self._lock:
+            ahead = max(self.in_flight - 1, 0)
+            cost = self.cost_per_tree_row
+        if self.backlog is not None:
+            ahead += self.backlog()
+
+        index, reason = 0, 'full'
+        if self.queue_step and ahead >= self.queue_step:
+            index, reason = min(ahead // self.queue_step, len(self.levels) - 1), 'queue'
+
+        if deadline_ms is not None and cost is not None:
+            # Requests ahead share the CPU with this one; assume each scores one row at full quality
+            waiting = ahead * self.n_trees * cost
+            fits = [i for i, (_, trees) in enumerate(self.levels)
+                    if (waiting + rows * trees * cost) * 1e3 <= deadline_ms]
+            deadline_index = fits[0] if fits else len(self.levels) - 1
+            if deadline_index > index:
+                index, reason = deadline_index, 'deadline'
+
+        percent, trees = self.levels[index]
+        with self._lock:
+            self.chosen[percent] += 1
+            self.reasons[reason] += 1
+        return {'percent': percent, 'trees': trees, 'reason': reason}
+
+    def observe(self, trees: int, rows: int, seconds: float):
+        """
+        Feed back a measured scoring time
+
+        Args:
+            trees (int): Trees scored
+            rows (int): Rows scored
+            seconds (float): Wall time of the scoring call
+        """
+        sample = seconds / max(trees * rows, 1)
+        with self._lock:
+            if self.cost_per_tree_row is None:
+                self.cost_per_tree_row = sample
+            else:
+                self.cost_per_tree_row += COST_SMOOTHING * (sample - self.cost_per_tree_row)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the policy for this worker
+
+        Returns:
+            dict: Levels, floor, in-flight and waiting requests, cost estimate and per-level counts
+        """
+        backlog = self.backlog() if self.backlog is not None else None
+        with self._lock:
+            cost = self.cost_per_tree_row
+            return {
+                'levels': [{'percent': p, 'trees': trees} for p, trees in self.levels],
+                'floor': self.floor,
+                'queue_step': self.queue_step,
+                'in_flight': self.in_flight,
+                'listen_backlog': backlog,
+                'us_per_tree_row': round(cost * 1e6, 4) if cost is not None else None,
+                'chosen_by_percent': {str(p): n for p, n in self.chosen.items()},
+                'chosen_by_reason': dict(self.reasons)
+            }
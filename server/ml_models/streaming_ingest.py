@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV Ingestion for Training
+
+AnimalDiseasePredictor.load_data() reads the whole CSV and preprocess_data()
+copies it before encoding, so the dataset has to fit in memory several times
+over. This module produces the same feature matrix and labels with memory
+bounded by the chunk size, in two passes over the CSV:
+
+    scan_csv       pass 1: per-column vocabularies with counts (exact, so the
+                   categorical mode is exact), a reservoir sample per numeric
+                   column for the median, missing-value counts and class counts
+    write_matrix   pass 2: fills missing values, encodes each chunk and appends
+                   it to one .npy file per feature column (narrowest dtype:
+                   uint8/16/32 codes, float32 numbers) plus labels.npy, then
+                   writes matrix.json (feature columns, vocabularies, fill
+                   values, classes)
+    load_matrix    assembles the float32 matrix the forest is fitted on
+
+The encoding is the one preprocess_data() produces: codes index the sorted
+vocabulary (LabelEncoder order), missing categories get the mode, missing
+numbers the median, rare classes (fewer than 3 rows) are dropped and the
+kept rows stay in file order, so train_test_split returns the same split.
+Medians are exact while a column has at most `sketch_size` values and
+approximate (reservoir sample) beyond that. Vocabularies are kept whole,
+since every category needs a code anyway.
+
+The forest itself still trains in memory: load_matrix() returns one float32
+matrix, which is the copy RandomForestClassifier would make of any input.
+
+Usage:
+    python3 streaming_ingest.py [animal_disease_prediction.csv] [--chunk-rows 50000] [--out DIR]
+    python3 train_model.py --chunk-rows 50000 [--matrix-dir DIR]
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import CATEGORICAL_COLUMNS
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# Values kept per numeric column for the median (exact up to this many rows)
+DEFAULT_SKETCH_SIZE = 100000
+
+# Same column lists and threshold as AnimalDiseasePredictor.preprocess_data()
+NUMERICAL_COLUMNS = ['Age', 'Weight', 'Heart_Rate']
+TEMPERATURE_COLUMN = 'Body_Temperature'
+TARGET_COLUMN = 'Disease_Prediction'
+MIN_SAMPLES_PER_CLASS = 3
+
+MANIFEST_FILE = 'matrix.json'
+LABELS_FILE = 'labels.npy'
+
+
+class MedianSketch:
+    """
+    Fixed-size uniform sample of a numeric column (reservoir sampling)
+    """
+
+    def __init__(self, capacity=DEFAULT_SKETCH_SIZE, seed=0):
+        """
+        Args:
+            capacity (int): Values kept; the median is exact up to this many values
+            seed (int): Sampling seed, so a rerun over the same file gives the same median
+        """
+        self.capacity = max(int(capacity), 1)
+        self.sample = np.empty(self.capacity, dtype=np.float64)
+        self.filled = 0
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        """Add a chunk of values (NaN is skipped)"""
+        values = values[~np.isnan(values)]
+
+        take = min(self.capacity - self.filled, len(values))
+        self.sample[self.filled:self.filled + take] = values[:take]
+        self.filled += take
+        self.seen += take
+        values = values[take:]
+
+        if len(values):
+            # The i-th value seen (0-based) replaces a random slot with probability capacity / (i + 1)
+            slots = self._rng.integers(0, self.seen + np.arange(1, len(values) + 1))
+            keep = slots < self.capacity
+            self.sample[slots[keep]] = values[keep]
+            self.seen += len(values)
+
+    def median(self) -> float:
+        """Median of the values seen (NaN if there were none)"""
+        return float(np.median(self.sample[:self.filled])) if self.filled else float('nan')
+
+
+def read_chunks(csv_path: str, chunk_rows: int):
+    """CSV chunks with text columns read as strings, so every chunk parses them alike"""
+    text_columns = CATEGORICAL_COLUMNS + [TEMPERATURE_COLUMN, TARGET_COLUMN]
+    return pd.read_csv(csv_path, chunksize=chunk_rows, dtype={col: str for col in text_columns})
+
+
+def extract_temperature(values: pd.Series) -> np.ndarray:
+    """Numeric part of Body_Temperature ('39.5°C' -> 39.5), as in preprocess_data()"""
+    return values.str.extract(r'(\d+\.?\d*)')[0].astype(float).to_numpy()
+
+
+def mode_value(counts: Counter) -> str:
+    """Most frequent category, the smallest one on ties (what Series.mode()[0] returns)"""
+    if not counts:
+        return 'Unknown'
+    top = max(counts.values())
+    return min(value for value, count in counts.items() if count == top)
+
+
+def scan_csv(csv_path: str, chunk_rows=DEFAULT_CHUNK_ROWS, sketch_size=DEFAULT_SKETCH_SIZE) -> Dict[str, Any]:
+    """
+    Pass 1: vocabularies, imputation statistics and class counts
+
+    Args:
+        csv_path (str): Training CSV
+        chunk_rows (int): Rows read at a time
+        sketch_size (int): Values sampled per numeric column for the median
+
+    Returns:
+        dict: columns, rows, missing, vocab (column -> Counter), fill_values,
+            class_counts, missing_target, chunks and seconds
+    """
+    start = time.perf_counter()
+    columns = None
+    rows = chunks = missing_target = 0
+    missing = Counter()
+    vocab = {}
+    sketches = {}
+    class_counts = Counter()
+
+    for chunk in read_chunks(csv_path, chunk_rows):
+        if columns is None:
+            columns = list(chunk.columns)
+            vocab = {col: Counter() for col in CATEGORICAL_COLUMNS if col in columns}
+            sketches = {col: MedianSketch(sketch_size) for col in NUMERICAL_COLUMNS if col in columns}
+        rows += len(chunk)
+        chunks += 1
+
+        for col, count in chunk.isnull().sum().items():
+            if count:
+                missing[col] += int(count)
+        for col, counts in vocab.items():
+            counts.update(chunk[col].value_counts(dropna=True).to_dict())
+        for col, sketch in sketches.items():
+            sketch.update(chunk[col].to_numpy(dtype=np.float64))
+
+        target = chunk[TARGET_COLUMN]
+        missing_target += int(target.isnull().sum())
+        class_counts.update(target.value_counts(dropna=True).to_dict())
+
+    if columns is None:
+        raise ValueError(f"No rows in {csv_path}")
+
+    # Recorded for every column (not just the ones with gaps) so scoring can fill like training
+    fill_values = {col: mode_value(counts) for col, counts in vocab.items()}
+    fill_values.update({col: sketch.median() for col, sketch in sketches.items()})
+
+    return {
+        'columns': columns,
+        'rows': rows,
+        'missing': dict(missing),
+        'vocab': vocab,
+        'fill_values': fill_values,
+        'class_counts': class_counts,
+        'missing_target': missing_target,
+        'chunks': chunks,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+
+def plan_features(columns: List[str]) -> List[str]:
+    """Feature columns in preprocess_data() order: numbers in CSV order, temperature, encoded categories"""
+    features = [col for col in columns if col in NUMERICAL_COLUMNS]
+    if TEMPERATURE_COLUMN in columns:
+        features.append('Body_Temperature_Numeric')
+    return features + [col + '_encoded' for col in CATEGORICAL_COLUMNS if col in columns]
+
+
+def code_dtype(size: int) -> np.dtype:
+    """Smallest unsigned integer type holding codes 0..size-1"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def write_matrix(csv_path: str, scan: Dict[str, Any], out_dir: str, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 min_samples_per_class=MIN_SAMPLES_PER_CLASS) -> Dict[str, Any]:
+    """
+    Pass 2: encode the CSV chunk by chunk into one .npy file per feature column
+
+    Args:
+        csv_path (str): The CSV scan_csv() read
+        scan (dict): scan_csv() result
+        out_dir (str): Matrix directory (created; existing column files are overwritten)
+        chunk_rows (int): Rows read at a time
+        min_samples_per_class (int): Classes with fewer rows are dropped
+
+    Returns:
+        dict: The manifest written to matrix.json
+    """
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Codes follow LabelEncoder order: the categories sorted (fill values are already in the vocabulary)
+    vocabularies = {col: sorted(set(counts) | ({scan['fill_values'][col]} if col in scan['fill_values'] else set()))
+                    for col, counts in scan['vocab'].items()}
+    rare = sorted(name for name, count in scan['class_counts'].items() if count < min_samples_per_class)
+    classes = sorted(name for name, count in scan['class_counts'].items() if count >= min_samples_per_class)
+    rows = sum(scan['class_counts'][name] for name in classes)
+    if rows == 0:
+        raise ValueError(f"No class in {csv_path} has {min_samples_per_class} or more rows")
+
+    features = plan_features(scan['columns'])
+    dtypes = {}
+    for feature in features:
+        col = feature[:-len('_encoded')] if feature.endswith('_encoded') else None
+        dtypes[feature] = code_dtype(len(vocabularies[col])) if col else np.dtype(np.float32)
+
+    # Manifest goes last, so an interrupted run leaves no loadable matrix behind
+    manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    outputs = {feature: np.lib.format.open_memmap(os.path.join(out_dir, f"{feature}.npy"), mode='w+',
+                                                  dtype=dtypes[feature], shape=(rows,))
+               for feature in features}
+    labels = np.lib.format.open_memmap(os.path.join(out_dir, LABELS_FILE), mode='w+',
+                                       dtype=code_dtype(len(classes)), shape=(rows,))
+
+    position = 0
+    for chunk in read_chunks(csv_path, chunk_rows):
+        chunk = chunk[chunk[TARGET_COLUMN].isin(classes)]
+        if chunk.empty:
+            continue
+        block = slice(position, position + len(chunk))
+
+        for feature in features:
+            if feature.endswith('_encoded'):
+                col = feature[:-len('_encoded')]
+                values = chunk[col].fillna(scan['fill_values'].get(col, 'Unknown'))
+                outputs[feature][block] = pd.Categorical(values, categories=vocabularies[col]).codes
+            elif feature == 'Body_Temperature_Numeric':
+                outputs[feature][block] = extract_temperature(chunk[TEMPERATURE_COLUMN])
+            else:
+                values = chunk[feature].to_numpy(dtype=np.float64)
+                if feature in scan['fill_values']:
+                    values = np.where(np.isnan(values), scan['fill_values'][feature], values)
+                outputs[feature][block] = values
+
+        labels[block] = pd.Categorical(chunk[TARGET_COLUMN], categories=classes).codes
+        position += len(chunk)
+
+    for array in list(outputs.values()) + [labels]:
+        array.flush()
+    del outputs, labels
+
+    stat = os.stat(csv_path)
+    manifest = {
+        'source': {'path': os.path.abspath(csv_path), 'bytes': stat.st_size, 'mtime': stat.st_mtime},
+        'rows': rows,
+        'feature_columns': features,
+        'dtypes': {feature: dtype.name for feature, dtype in dtypes.items()},
+        'vocabularies': vocabularies,
+        'fill_values': scan['fill_values'],
+        'classes': classes,
+        'rare_classes': {name: scan['class_counts'][name] for name in rare},
+        'missing_target': scan['missing_target'],
+        'chunk_rows': chunk_rows,
+        'created_at': time.time(),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(out_dir: str) -> Optional[Dict[str, Any]]:
+    """matrix.json of a completed write_matrix() (None if there is none)"""
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_matrix(out_dir: str, columns: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Assemble the training matrix from the column files
+
+    Args:
+        out_dir (str): write_matrix() output directory
+        columns (list): Feature columns to load (default: all, in manifest order)
+
+    Returns:
+        tuple: (X float32 of shape (rows, len(columns)), y class codes as int64, manifest)
+    """
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No completed matrix in {out_dir}")
+    columns = manifest['feature_columns'] if columns is None else columns
+
+    X = np.empty((manifest['rows'], len(columns)), dtype=np.float32)
+    for j, feature in enumerate(columns):
+        X[:, j] = np.load(os.path.join(out_dir, f"{feature}.npy"), mmap_mode='r')
+    y = np.load(os.path.join(out_dir, LABELS_FILE)).astype(np.int64)
+    return X, y, manifest
+
+
+def default_matrix_dir(csv_path: str) -> str:
+    """Matrix directory next to the CSV (animal_disease_prediction.csv -> animal_disease_prediction_matrix/)"""
+    return os.path.splitext(os.path.abspath(csv_path))[0] + '_matrix'
+
+
+def main():
+    """
+    Build the on-disk matrix for a CSV and print what each pass found
+    """
+    parser = argparse.ArgumentParser(description="Encode a training CSV into an on-disk columnar matrix")
+    parser.add_argument('csv', nargs='?', default='animal_disease_prediction.csv', help="Training CSV")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Rows read at a time")
+    parser.add_argument('--sketch-size', type=int, default=DEFAULT_SKETCH_SIZE,
+                        help="Values sampled per numeric column for the median")
+    parser.add_argument('--out', default=None, help="Matrix directory (default: <csv name>_matrix next to the CSV)")
+    args = parser.parse_args()
+    out_dir = args.out or default_matrix_dir(args.csv)
+
+    print("📥 STREAMING CSV INGESTION")
+    print("=" * 50)
+    scan = scan_csv(args.csv, args.chunk_rows, args.sketch_size)
+    print(f"✅ Pass 1: {scan['rows']:,} rows in {scan['chunks']} chunks ({scan['seconds']:.2f}s)")
+    print(f"  - Classes: {len(scan['class_counts'])}, rows without a diagnosis: {scan['missing_target']}")
+    for col, value in scan['fill_values'].items():
+        if scan['missing'].get(col):
+            print(f"  - {col}: {scan['missing'][col]} missing, filled with {value}")
+
+    manifest = write_matrix(args.csv, scan, out_dir, args.chunk_rows)
+    size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+    print(f"✅ Pass 2: {manifest['rows']:,} rows x {len(manifest['feature_columns'])} features "
+          f"({manifest['seconds']:.2f}s)")
+    print(f"  - Dropped {len(manifest['rare_classes'])} rare classes, kept {len(manifest['classes'])}")
+    print(f"📁 {out_dir} ({size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
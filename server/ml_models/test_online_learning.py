@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Tests for online learning (online_learning.py)
+
+Covers the feedback -> grow -> publish -> reload cycle on a small model
+trained from a synthetic CSV: new trees vote only for the confirmed
+diseases, the shipped trees survive every update while only the oldest
+grown trees are dropped, stored cases naming a disease the model lacks
+are skipped, the update lease is exclusive, POST /feedback needs the
+shared token and stores a limited number of cases per prediction, and a
+published version is picked up by the watcher and swapped in by
+flask_api.reload_predictor().
+
+Usage:
+    python3 -m pytest -q test_online_learning.py
+
+Author: PetCareHub ML Team
+Date: October 2025
+"""
+
+import contextlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from online_learning import (FeedbackStore, ModelUpdater, ModelWatcher, grow_trees, match_diagnosis,
+                             published_model_path, shipped_model_id)
+
+DISEASES = ['Arthritis', 'Bronchitis', 'Dermatitis', 'Gastroenteritis', 'Otitis', 'Parvovirus']
+
+# One characteristic symptom per disease, so every class is learnable
+SIGNATURE = {
+    'Arthritis': 'Lameness',
+    'Bronchitis': 'Coughing',
+    'Dermatitis': 'Skin Lesions',
+    'Gastroenteritis': 'Vomiting',
+    'Otitis': 'Eye Discharge',
+    'Parvovirus': 'Diarrhea'
+}
+
+YES_NO_COLUMNS = ['Appetite_Loss', 'Vomiting', 'Diarrhea', 'Coughing', 'Labored_Breathing',
+                  'Lameness', 'Skin_Lesions', 'Nasal_Discharge', 'Eye_Discharge']
+
+
+def synthetic_csv(path, rows_per_disease=8, seed=0):
+    """Write a small CSV with the training columns of animal_disease_prediction.csv"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for disease in DISEASES:
+        for _ in range(rows_per_disease):
+            symptom = SIGNATURE[disease]
+            row = {
+                'Animal_Type': rng.choice(['Dog', 'Cat']),
+                'Breed': rng.choice(['Mixed', 'Labrador', 'Siamese']),
+                'Age': int(rng.integers(1, 12)),
+                'Gender': rng.choice(['Male', 'Female']),
+                'Weight': float(rng.integers(3, 30)),
+                'Symptom_1': symptom,
+                'Symptom_2': rng.choice(['Fever', 'Lethargy']),
+                'Symptom_3': rng.choice(['Fever', 'Lethargy', 'Appetite Loss']),
+                'Symptom_4': rng.choice(['Fever', 'Lethargy', 'Sneezing']),
+                'Duration': rng.choice(['3 days', '1 week']),
+                'Body_Temperature': f"{rng.uniform(38.0, 40.5):.1f}°C",
+                'Heart_Rate': int(rng.integers(80, 160)),
+                'Disease_Prediction': disease
+            }
+            for col in YES_NO_COLUMNS:
+                row[col] = 'Yes' if col.replace('_', ' ') == symptom else 'No'
+            rows.append(row)
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+@pytest.fixture(scope='module')
+def shipped_model(tmp_path_factory):
+    """Path of a 10-tree disease_model.pkl (with lean artifacts) trained on the synthetic CSV"""
+    from train_model import AnimalDiseasePredictor
+
+    root = tmp_path_factory.mktemp('shipped')
+    csv_path = str(root / 'animal_disease_prediction.csv')
+    synthetic_csv(csv_path)
+
+    predictor = AnimalDiseasePredictor(csv_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictor.load_data()
+        X, y = predictor.preprocess_data()
+        predictor.train_model(X, y, hyperparams={'n_estimators': 10})
+        return predictor.save_model(str(root / 'disease_model.pkl'))
+
+
+@pytest.fixture
+def updater(tmp_path, shipped_model):
+    """Updater publishing into a fresh directory, growing 3 trees from any 1 new case at full speed"""
+    store = FeedbackStore(str(tmp_path / 'feedback.sqlite'))
+    return ModelUpdater(store, str(tmp_path / 'models'), shipped_model, min_cases=1,
+                        trees_per_update=3, duty_cycle=1.0, keep_versions=2)
+
+
+def confirmed(disease, classes, n=4):
+    """Confirmed cases showing a disease's signature symptom, as POST /feedback stores them"""
+    symptom = SIGNATURE.get(disease, 'Fever').lower()
+    return [{'symptoms': [symptom, 'fever'], 'animal_type': 'Dog', 'age': 3 + i, 'weight': 12.0,
+             'diagnosis': disease, 'disease': match_diagnosis(disease, classes)} for i in range(n)]
+
+
+def voted_classes(tree):
+    """Class indices with probability mass in any node of a tree"""
+    return set(np.flatnonzero(tree.tree_.value[:, 0, :].sum(axis=0)))
+
+
+def load_package(path):
+    import joblib
+    return joblib.load(path)
+
+
+def test_grown_trees_vote_only_for_feedback_classes(shipped_model):
+    package = load_package(shipped_model)
+    model = package['model']
+    wanted = [4, 5]  # Otitis, Parvovirus: not the lowest class indices
+
+    X = np.random.default_rng(1).random((12, model.n_features_in_))
+    y = np.array(wanted * 6, dtype=np.intp)
+    trees = grow_trees(model, X, y, n_trees=4, seed=7)
+
+    # A bootstrap sample may miss one of the classes, never add another
+    assert len(trees) == 4
+    for tree in trees:
+        assert tree.tree_.value.shape[2] == model.n_classes_
+        assert voted_classes(tree) <= set(wanted)
+    assert set().union(*map(voted_classes, trees)) == set(wanted)
+
+
+def test_feedback_grow_publish_reload(updater, shipped_model):
+    classes = load_package(shipped_model)['classes']
+    updater.store.add(confirmed('Otitis', classes) + confirmed('Parvovirus', classes))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        update = updater.run_once('test')
+
+    assert update is not None
+    assert update['cases'] == 8 and update['skipped_cases'] == 0
+    assert update['trees_added'] == 3 and update['trees_dropped'] == 0 and update['n_trees'] == 13
+
+    # `current` points at the new version, which descends from the shipped model
+    current = os.path.realpath(os.path.join(updater.publish_dir, 'current'))
+    assert os.path.basename(current) == update['version']
+    published = published_model_path(updater.publish_dir, shipped_model_id(shipped_model))
+    assert published == os.path.join(current, 'disease_model.pkl')
+
+    package = load_package(published)
+    assert package['online_learning']['shipped_trees'] == 10
+    new_trees = package['model'].estimators_[-3:]
+    wanted = {classes.index('Otitis'), classes.index('Parvovirus')}
+    assert all(voted_classes(tree) <= wanted for tree in new_trees)
+    assert set().union(*map(voted_classes, new_trees)) == wanted
+    assert package['online_learning']['updates'][-1]['version'] == update['version']
+
+    # Nothing new: no second update
+    assert updater.run_once('test') is None
+    assert updater.store.stats(updater.shipped_model)['pending'] == 0
+
+    # The watcher hands the published path to its callback
+    seen = []
+    watcher = ModelWatcher(updater.publish_dir, shipped_model, seen.append, interval=0)
+    assert watcher.current() == published
+
+
+def test_updates_keep_the_shipped_trees(tmp_path, shipped_model):
+    classes = load_package(shipped_model)['classes']
+    shipped = load_package(shipped_model)['model'].estimators_
+    store = FeedbackStore(str(tmp_path / 'feedback.sqlite'))
+    updater = ModelUpdater(store, str(tmp_path / 'models'), shipped_model, min_cases=1,
+                           trees_per_update=3, max_added_trees=5, duty_cycle=1.0)
+
+    updates = []
+    for disease in ['Otitis', 'Parvovirus', 'Arthritis']:
+        store.add(confirmed(disease, classes))
+        with contextlib.redirect_stdout(io.StringIO()):
+            updates.append(updater.run_once('test'))
+
+    # 3 + 3 + 3 grown trees against a cap of 5: only grown trees are dropped
+    assert [u['trees_dropped'] for u in updates] == [0, 1, 3]
+    assert [u['n_trees'] for u in updates] == [13, 15, 15]
+
+    forest = load_package(published_model_path(updater.publish_dir, updater.shipped_model))['model']
+    for original, kept in zip(shipped, forest.estimators_[:10]):
+        assert np.array_equal(original.tree_.value, kept.tree_.value)
+    fed = {classes.index(disease) for disease in ['Otitis', 'Parvovirus', 'Arthritis']}
+    assert all(voted_classes(tree) <= fed for tree in forest.estimators_[10:])
+
+
+def test_unknown_disease_is_skipped(updater, shipped_model):
+    classes = load_package(shipped_model)['classes']
+
+    # Matched against an earlier model that had a class this one lacks
+    retired = [dict(case, disease='Retired Disease') for case in confirmed('Distemper', classes, n=3)]
+    updater.store.add(retired)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert updater.run_once('test') is None
+    assert not os.path.exists(os.path.join(updater.publish_dir, 'current'))
+
+    # Those cases no longer count as pending, later ones still train
+    updater.store.add(confirmed('Bronchitis', classes))
+    with contextlib.redirect_stdout(io.StringIO()):
+        update = updater.run_once('test')
+    assert update is not None
+    assert update['cases'] == 4 and update['skipped_cases'] == 3
+    assert updater.store.last_update(updater.shipped_model)['skipped_cases'] == 3
+
+
+def test_unmatched_diagnosis_is_stored_but_not_trained(updater, shipped_model):
+    classes = load_package(shipped_model)['classes']
+    assert match_diagnosis('  otitis ', classes) == 'Otitis'
+
+    updater.store.add(confirmed('Space Flu', classes, n=2))
+    stats = updater.store.stats(updater.shipped_model)
+    assert stats['cases'] == 2 and stats['unknown_disease'] == 2 and stats['pending'] == 0
+    assert updater.run_once('test', force=True) is None
+
+
+def test_update_lease_is_exclusive(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.sqlite'))
+    assert store.acquire_lease('update', 'a')
+    assert store.acquire_lease('update', 'a')
+    assert not store.acquire_lease('update', 'b')
+
+    store.release_lease('update', 'a')
+    assert store.acquire_lease('update', 'b')
+
+    # An expired lease is taken over
+    assert store.acquire_lease('update', 'c', lease_seconds=-1)
+
+
+def test_stats_without_shipped_pickle(tmp_path):
+    store = FeedbackStore(str(tmp_path / 'feedback.sqlite'))
+    watcher = ModelWatcher(str(tmp_path / 'models'), str(tmp_path / 'missing.pkl'), lambda path: True)
+    os.makedirs(watcher.publish_dir)
+
+    assert store.stats(None)['last_update'] is None
+    assert watcher.current() is None
+
+
+def test_reload_predictor_swaps_in_published_version(updater, shipped_model, monkeypatch):
+    classes = load_package(shipped_model)['classes']
+    updater.store.add(confirmed('Dermatitis', classes))
+    with contextlib.redirect_stdout(io.StringIO()):
+        update = updater.run_once('test')
+    published = published_model_path(updater.publish_dir, updater.shipped_model)
+
+    monkeypatch.setenv('MODEL_EAGER_LOAD', '0')
+    monkeypatch.setenv('FEEDBACK_DB_PATH', updater.store.path)
+    import flask_api
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        monkeypatch.setattr(flask_api, 'predictor', flask_api.APIPredictor(model_path=shipped_model))
+        assert flask_api.reload_predictor(published)
+
+    assert flask_api.predictor.model_path == published
+    assert flask_api.predictor.model_package['training_date'] == flask_api.model_state['training_date']
+    result = flask_api.predictor.predict_uncached(['skin lesions', 'fever'])
+    assert result['status'] == 'success'
+    assert update['version'] in published
+
+    # /feedback/stats still answers when the shipped pickle cannot be hashed
+    monkeypatch.setattr(flask_api, 'model_updater', updater)
+    monkeypatch.setattr(updater, 'shipped_path', os.path.join(updater.publish_dir, 'missing.pkl'))
+    monkeypatch.setattr(updater, '_shipped_model', None)
+    response = flask_api.app.test_client().get('/feedback/stats')
+    assert response.status_code == 200
+    assert response.get_json()['shipped_model'] is None
+
+
+def test_feedback_requires_token_and_limits_each_prediction(updater, shipped_model, monkeypatch):
+    classes = load_package(shipped_model)['classes']
+    monkeypatch.setenv('MODEL_EAGER_LOAD', '0')
+    monkeypatch.setenv('FEEDBACK_DB_PATH', updater.store.path)
+    import flask_api
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        monkeypatch.setattr(flask_api, 'predictor', flask_api.APIPredictor(model_path=shipped_model))
+    monkeypatch.setattr(flask_api, 'model_updater', updater)
+    monkeypatch.setattr(flask_api, 'FEEDBACK_MAX_PER_PREDICTION', 2)
+    client = flask_api.app.test_client()
+    case = dict(confirmed('Otitis', classes, n=1)[0], prediction_id='p1', confirmed_by='vet-1')
+
+    # No token configured: feedback is refused outright
+    monkeypatch.setattr(flask_api, 'FEEDBACK_API_TOKEN', '')
+    assert client.post('/feedback', json=case).status_code == 503
+
+    monkeypatch.setattr(flask_api, 'FEEDBACK_API_TOKEN', 'secret')
+    assert client.post('/feedback', json=case).status_code == 401
+    assert client.post('/feedback', json=case, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    auth = {'Authorization': 'Bearer secret'}
+    unsigned = {key: value for key, value in case.items() if key != 'confirmed_by'}
+    assert client.post('/feedback', json=unsigned, headers=auth).status_code == 400
+
+    responses = [client.post('/feedback', json=case, headers=auth) for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert updater.store.stats(updater.shipped_model)['cases'] == 2
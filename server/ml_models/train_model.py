@@ -22,27 +22,63 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import os
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
+from feature_engine import build_encoder_tables, save_encoder_tables
+from forest_engine import FlatForest, forest_path, top_k_rows
+from lean_predictor import write_lean_manifest
+from streaming_ingest import default_matrix_dir, load_matrix, scan_csv, write_matrix
+
+# RandomForestClassifier settings used by train_model() unless overridden
+# (hyperparam_search.py explores alternatives)
+DEFAULT_HYPERPARAMS = {
+    'n_estimators': 100,
+    'max_depth': 15,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'max_features': 'sqrt'
+}
+
+# Incremental growth (train_model(growth=...) / --grow): add `step` trees at a
+# time, up to n_estimators, until `patience` increments in a row improve
+# neither OOB accuracy nor OOB top-3 accuracy by at least `min_gain`
+DEFAULT_GROWTH = {
+    'step': 10,
+    'min_gain': 0.005,
+    'patience': 2
+}
+
 class AnimalDiseasePredictor:
     """
     A comprehensive machine learning pipeline for animal disease prediction
     """
     
-    def __init__(self, csv_path='animal_disease_prediction.csv'):
+    def __init__(self, csv_path='animal_disease_prediction.csv', chunk_rows=None, matrix_dir=None):
         """
         Initialize the predictor with dataset path
         
         Args:
             csv_path (str): Path to the CSV dataset
+            chunk_rows (int): Stream the CSV this many rows at a time instead of
+                loading it whole (see streaming_ingest.py)
+            matrix_dir (str): Where streaming writes the encoded matrix
+                (default: <csv name>_matrix next to the CSV)
         """
         self.csv_path = csv_path
+        self.chunk_rows = chunk_rows
+        self.matrix_dir = matrix_dir or default_matrix_dir(csv_path)
+        self.df = None
+        self.scan = None
         self.model = None
         self.label_encoders = {}
+        self.fill_values = {}
         self.scaler = StandardScaler()
         self.feature_columns = []
         self.target_column = 'Disease_Prediction'
+        self.hyperparams = dict(DEFAULT_HYPERPARAMS)
+        self.growth_curve = None
         
     def load_data(self):
         """
@@ -51,6 +87,9 @@ class AnimalDiseasePredictor:
         Returns:
             pd.DataFrame: Loaded dataset
         """
+        if self.chunk_rows:
+            return self._scan_data()
+        
         print("📊 Loading dataset...")
         try:
             self.df = pd.read_csv(self.csv_path)
@@ -65,6 +104,25 @@ class AnimalDiseasePredictor:
             print(f"❌ Error loading dataset: {str(e)}")
             raise
     
+    def _scan_data(self):
+        """
+        Streaming pass 1: vocabularies, fill values and class counts, chunk by chunk
+        
+        Returns:
+            dict: scan_csv() result (self.df stays None)
+        """
+        print(f"📊 Scanning dataset in chunks of {self.chunk_rows:,} rows...")
+        try:
+            self.scan = scan_csv(self.csv_path, self.chunk_rows)
+        except FileNotFoundError:
+            print(f"❌ Error: Dataset file '{self.csv_path}' not found!")
+            raise
+        print(f"✅ Dataset scanned successfully!")
+        print(f"📈 Dataset shape: ({self.scan['rows']}, {len(self.scan['columns'])}) "
+              f"in {self.scan['chunks']} chunks, {self.scan['seconds']:.2f}s")
+        print(f"🔍 Columns: {self.scan['columns']}")
+        return self.scan
+    
     def explore_data(self):
         """
         Perform exploratory data analysis
@@ -72,6 +130,9 @@ class AnimalDiseasePredictor:
         print("\n🔍 EXPLORATORY DATA ANALYSIS")
         print("=" * 50)
         
+        if self.df is None:
+            return self._explore_scan()
+        
         # Basic info
         print(f"Dataset Info:")
         print(f"- Total Records: {len(self.df)}")
@@ -96,6 +157,32 @@ class AnimalDiseasePredictor:
         
         return self.df.describe()
     
+    def _explore_scan(self):
+        """
+        The same summary from the streaming scan's counters
+        """
+        scan = self.scan
+        print(f"Dataset Info:")
+        print(f"- Total Records: {scan['rows']}")
+        print(f"- Total Features: {len(scan['columns'])}")
+        print(f"- Missing Values: {sum(scan['missing'].values())}")
+        
+        print(f"\n🎯 Disease Distribution:")
+        for disease, count in scan['class_counts'].most_common(10):
+            print(f"  {disease}: {count}")
+        
+        if 'Animal_Type' in scan['vocab']:
+            print(f"\n🐾 Animal Type Distribution:")
+            for animal, count in scan['vocab']['Animal_Type'].most_common():
+                print(f"  {animal}: {count}")
+        
+        if scan['missing']:
+            print(f"\n⚠️  Missing Values by Column:")
+            for col, count in scan['missing'].items():
+                print(f"  {col}: {count}")
+        
+        return None
+    
     def preprocess_data(self):
         """
         Comprehensive data preprocessing pipeline
@@ -106,6 +193,9 @@ class AnimalDiseasePredictor:
         print("\n🔧 PREPROCESSING DATA")
         print("=" * 50)
         
+        if self.df is None:
+            return self._preprocess_streaming()
+        
         # Make a copy for processing
         df_processed = self.df.copy()
         
@@ -121,19 +211,26 @@ class AnimalDiseasePredictor:
         # Numerical columns
         numerical_cols = ['Age', 'Weight', 'Heart_Rate']
         
+        # Fill values are kept for every column so scoring can fill gaps the same way
+        self.fill_values = {}
+        
         # Handle categorical missing values with mode
         for col in categorical_cols:
-            if col in df_processed.columns and df_processed[col].isnull().any():
+            if col in df_processed.columns:
                 mode_value = df_processed[col].mode()[0] if len(df_processed[col].mode()) > 0 else 'Unknown'
-                df_processed[col].fillna(mode_value, inplace=True)
-                print(f"  ✅ Filled {col} missing values with: {mode_value}")
+                self.fill_values[col] = str(mode_value)
+                if df_processed[col].isnull().any():
+                    df_processed[col].fillna(mode_value, inplace=True)
+                    print(f"  ✅ Filled {col} missing values with: {mode_value}")
         
         # Handle numerical missing values with median
         for col in numerical_cols:
-            if col in df_processed.columns and df_processed[col].isnull().any():
+            if col in df_processed.columns:
                 median_value = df_processed[col].median()
-                df_processed[col].fillna(median_value, inplace=True)
-                print(f"  ✅ Filled {col} missing values with median: {median_value}")
+                self.fill_values[col] = float(median_value)
+                if df_processed[col].isnull().any():
+                    df_processed[col].fillna(median_value, inplace=True)
+                    print(f"  ✅ Filled {col} missing values with median: {median_value}")
         
         # Process temperature and extract numerical value
         if 'Body_Temperature' in df_processed.columns:
@@ -199,7 +296,50 @@ class AnimalDiseasePredictor:
         
         return X, y_encoded
     
-    def train_model(self, X, y, test_size=0.2, random_state=42):
+    def _preprocess_streaming(self):
+        """
+        Streaming pass 2: encode the CSV chunk by chunk into the on-disk matrix
+        
+        Produces the same features, encoders and rows as preprocess_data();
+        only the final float32 matrix is held in memory.
+        
+        Returns:
+            tuple: (X_processed, y_processed)
+        """
+        for col, value in self.scan['fill_values'].items():
+            if self.scan['missing'].get(col):
+                print(f"  ✅ Filled {col} missing values with: {value}")
+        self.fill_values = dict(self.scan['fill_values'])
+        
+        print(f"\n🏷️  Encoding categorical variables into {self.matrix_dir}...")
+        manifest = write_matrix(self.csv_path, self.scan, self.matrix_dir, self.chunk_rows)
+        for col, vocabulary in manifest['vocabularies'].items():
+            le = LabelEncoder()
+            le.classes_ = np.array(vocabulary, dtype=object)
+            self.label_encoders[col] = le
+            print(f"  ✅ Encoded {col} ({len(vocabulary)} unique values)")
+        
+        if manifest['rare_classes']:
+            print(f"⚠️  Found {len(manifest['rare_classes'])} rare classes, "
+                  f"{sum(manifest['rare_classes'].values())} samples removed")
+        if manifest['missing_target']:
+            print(f"⚠️  Skipped {manifest['missing_target']} rows without a {self.target_column}")
+        
+        X, y, manifest = load_matrix(self.matrix_dir)
+        self.feature_columns = manifest['feature_columns']
+        self.target_encoder = LabelEncoder()
+        self.target_encoder.classes_ = np.array(manifest['classes'], dtype=object)
+        X = pd.DataFrame(X, columns=self.feature_columns, copy=False)
+        
+        print(f"\n📊 Final feature set:")
+        print(f"  - Features: {len(X.columns)}")
+        print(f"  - Samples: {len(X)} ({X.values.nbytes / 1e6:.1f} MB float32, "
+              f"matrix written in {manifest['seconds']:.2f}s)")
+        print(f"  - Classes: {len(self.target_encoder.classes_)}")
+        
+        return X, y
+    
+    def train_model(self, X, y, test_size=0.2, random_state=42, hyperparams=None, growth=None):
         """
         Train Random Forest Classifier
         
@@ -208,6 +348,9 @@ class AnimalDiseasePredictor:
             y: Target vector
             test_size: Proportion of test set
             random_state: Random seed for reproducibility
+            hyperparams: RandomForestClassifier settings overriding DEFAULT_HYPERPARAMS
+            growth: Grow the forest incrementally until the OOB score plateaus
+                (dict overriding DEFAULT_GROWTH; n_estimators becomes the cap)
             
         Returns:
             tuple: (X_train, X_test, y_train, y_test)
@@ -226,21 +369,107 @@ class AnimalDiseasePredictor:
         
         # Initialize and train Random Forest
         print("\n🌲 Training Random Forest Classifier...")
+        self.hyperparams = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+        print(f"  - Hyperparameters: {self.hyperparams}")
         self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=15,
-            min_samples_split=5,
-            min_samples_leaf=2,
+            **self.hyperparams,
             random_state=random_state,
             n_jobs=-1
         )
         
         # Train the model
-        self.model.fit(X_train, y_train)
+        self.growth_curve = None
+        if growth is not None:
+            self.growth_curve = self._grow_forest(X_train, y_train, **{**DEFAULT_GROWTH, **growth})
+        else:
+            self.model.fit(X_train, y_train)
         print("✅ Model training completed!")
         
         return X_train, X_test, y_train, y_test
     
+    def _grow_forest(self, X_train, y_train, step, min_gain, patience):
+        """
+        Add trees in increments with warm_start, tracking the out-of-bag score
+
+        warm_start draws tree seeds in sequence, so the first k trees are the
+        same trees a k-tree fit would build. Growth stops at n_estimators or
+        after `patience` increments that gain less than min_gain on both
+        OOB accuracy and OOB top-3 accuracy; the forest is then cut back to
+        the last size that still gained.
+        
+        Args:
+            X_train, y_train: Training split
+            step (int): Trees added per increment
+            min_gain (float): Smallest OOB improvement that counts as progress
+            patience (int): Increments without progress before stopping
+            
+        Returns:
+            list: Growth curve, one dict per increment
+        """
+        max_trees = self.hyperparams['n_estimators']
+        self.model.set_params(warm_start=True, oob_score=True)
+        print(f"  - Growing by {step} trees up to {max_trees} (min OOB gain {min_gain}, patience {patience})")
+        
+        curve = []
+        best_trees, best_accuracy, best_top3 = 0, -1.0, -1.0
+        previous = None
+        stalled = 0
+        
+        for n_trees in range(step, max_trees + step, step):
+            n_trees = min(n_trees, max_trees)
+            start = datetime.now()
+            self.model.set_params(n_estimators=n_trees)
+            self.model.fit(X_train, y_train)
+            seconds = (datetime.now() - start).total_seconds()
+            
+            # Rows no tree has left out yet have no OOB vote (NaN) and are skipped
+            oob = self.model.oob_decision_function_
+            covered = ~np.isnan(oob).any(axis=1)
+            top3 = top_k_rows(np.nan_to_num(oob), 3)
+            expected = np.asarray(y_train)
+            point = {
+                'trees': n_trees,
+                'oob_accuracy': float(np.mean(top3[covered, 0] == expected[covered])),
+                'oob_top3_accuracy': float(np.mean(np.any(top3[covered] == expected[covered, None], axis=1))),
+                'oob_rows': int(covered.sum()),
+                'seconds': seconds
+            }
+            # Share of rows whose OOB top-3 set is unchanged since the previous increment
+            top3_sets = np.sort(top3, axis=1)
+            if previous is not None:
+                both = covered & previous[0]
+                point['top3_agreement'] = float(np.mean(np.all(top3_sets[both] == previous[1][both], axis=1)))
+            previous = (covered, top3_sets)
+            curve.append(point)
+            
+            agreement = point.get('top3_agreement')
+            print(f"    🌲 {n_trees:>4} trees: OOB accuracy {point['oob_accuracy']:.4f}, "
+                  f"top-3 {point['oob_top3_accuracy']:.4f}"
+                  + (f", top-3 unchanged {agreement:.2%}" if agreement is not None else ""))
+            
+            if (point['oob_accuracy'] >= best_accuracy + min_gain
+                    or point['oob_top3_accuracy'] >= best_top3 + min_gain):
+                best_trees = n_trees
+                stalled = 0
+            else:
+                stalled += 1
+            best_accuracy = max(best_accuracy, point['oob_accuracy'])
+            best_top3 = max(best_top3, point['oob_top3_accuracy'])
+            if stalled >= patience:
+                print(f"  ⏹️  OOB plateau: no gain >= {min_gain} in {patience} increments")
+                break
+        
+        # Drop the increments that did not pay for their inference cost
+        self.model.estimators_ = self.model.estimators_[:best_trees]
+        self.model.set_params(n_estimators=best_trees, warm_start=False, oob_score=False)
+        for attr in ('oob_score_', 'oob_decision_function_'):
+            if hasattr(self.model, attr):
+                delattr(self.model, attr)
+        self.hyperparams['n_estimators'] = best_trees
+        print(f"  ✅ Kept {best_trees} trees")
+        
+        return curve
+    
     def evaluate_model(self, X_train, X_test, y_train, y_test):
         """
         Comprehensive model evaluation
@@ -359,9 +588,12 @@ class AnimalDiseasePredictor:
             'label_encoders': self.label_encoders,
             'target_encoder': self.target_encoder,
             'feature_columns': self.feature_columns,
+            'fill_values': self.fill_values,
             'scaler': self.scaler,
             'training_date': datetime.now().isoformat(),
             'model_type': 'RandomForestClassifier',
+            'hyperparameters': self.hyperparams,
+            'growth_curve': self.growth_curve,
             'classes': list(self.target_encoder.classes_)
         }
         
@@ -369,6 +601,22 @@ class AnimalDiseasePredictor:
         joblib.dump(model_package, model_path)
         print(f"✅ Model saved successfully to: {model_path}")
         
+        # Save category -> code lookup tables so inference skips the LabelEncoders
+        tables_path = save_encoder_tables(model_path, build_encoder_tables(self.label_encoders),
+                                          self.feature_columns, model_package['training_date'],
+                                          self.fill_values)
+        print(f"✅ Encoder lookup tables saved to: {tables_path}")
+        
+        # Save the flattened forest used by the NumPy inference engine
+        forest = FlatForest.from_sklearn(self.model, classes=model_package['classes'],
+                                         training_date=model_package['training_date'])
+        flat_path = forest.save(forest_path(model_path))
+        print(f"✅ Flattened forest saved to: {flat_path}")
+        
+        # Tie both artifacts to this pickle so the API can start without sklearn
+        manifest_path = write_lean_manifest(model_path, model_package['training_date'])
+        print(f"✅ Lean inference manifest saved to: {manifest_path}")
+        
         # Save model info
         info_path = model_path.replace('.pkl', '_info.txt')
         with open(info_path, 'w') as f:
@@ -376,6 +624,11 @@ class AnimalDiseasePredictor:
             f.write(f"================================\n")
             f.write(f"Training Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write(f"Model Type: Random Forest Classifier\n")
+            f.write(f"Hyperparameters: {self.hyperparams}\n")
+            if self.growth_curve:
+                f.write(f"Growth Curve (trees: OOB accuracy / OOB top-3):\n")
+                for point in self.growth_curve:
+                    f.write(f"  {point['trees']:>4}: {point['oob_accuracy']:.4f} / {point['oob_top3_accuracy']:.4f}\n")
             f.write(f"Features: {len(self.feature_columns)}\n")
             f.write(f"Classes: {len(self.target_encoder.classes_)}\n")
             f.write(f"Disease Classes: {', '.join(self.target_encoder.classes_)}\n")
@@ -401,17 +654,38 @@ class AnimalDiseasePredictor:
         # Implementation would depend on the exact format of input data
         pass
 
-def main():
+def main(argv=None):
     """
     Main training pipeline
+    
+    Usage:
+        python3 train_model.py                       # fixed n_estimators trees
+        python3 train_model.py --grow [--step 10] [--min-gain 0.005] [--patience 2] [--max-trees 200]
+        python3 train_model.py --chunk-rows 50000 [--matrix-dir DIR]   # stream a CSV larger than memory
     """
+    parser = argparse.ArgumentParser(description="Train the animal disease prediction model")
+    parser.add_argument('--grow', action='store_true',
+                        help="Add trees incrementally and stop once the OOB score plateaus")
+    parser.add_argument('--step', type=int, default=DEFAULT_GROWTH['step'], help="Trees per increment")
+    parser.add_argument('--min-gain', type=float, default=DEFAULT_GROWTH['min_gain'],
+                        help="Smallest OOB accuracy / top-3 gain that counts as progress")
+    parser.add_argument('--patience', type=int, default=DEFAULT_GROWTH['patience'],
+                        help="Increments without progress before growth stops")
+    parser.add_argument('--max-trees', type=int, default=DEFAULT_HYPERPARAMS['n_estimators'],
+                        help="Tree cap when growing")
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help="Stream the CSV this many rows at a time through an on-disk matrix")
+    parser.add_argument('--matrix-dir', default=None,
+                        help="Encoded matrix directory for --chunk-rows (default: next to the CSV)")
+    args = parser.parse_args(argv)
+    
     print("🐾 ANIMAL DISEASE PREDICTION MODEL TRAINING")
     print("=" * 60)
     print(f"🕐 Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
         # Initialize predictor
-        predictor = AnimalDiseasePredictor()
+        predictor = AnimalDiseasePredictor(chunk_rows=args.chunk_rows, matrix_dir=args.matrix_dir)
         
         # Load and explore data
         predictor.load_data()
@@ -421,7 +695,12 @@ def main():
         X, y = predictor.preprocess_data()
         
         # Train model
-        X_train, X_test, y_train, y_test = predictor.train_model(X, y)
+        if args.grow:
+            growth = {'step': args.step, 'min_gain': args.min_gain, 'patience': args.patience}
+            X_train, X_test, y_train, y_test = predictor.train_model(
+                X, y, hyperparams={'n_estimators': args.max_trees}, growth=growth)
+        else:
+            X_train, X_test, y_train, y_test = predictor.train_model(X, y)
         
         # Evaluate model
         evaluation_results = predictor.evaluate_model(X_train, X_test, y_train, y_test)